@@ -0,0 +1,319 @@
+"""Inspelning och uppspelning av kassetter från riktiga konton.
+
+En kassett spelas in mot melcloudhome.com (eller i Home Assistant med
+tjänsten melcloud_home.set_recording) och spelas sedan upp offline, så att
+prestanda och resultat kan jämföras mellan versioner med ett riktigt kontos
+nyttolaster:
+
+    python -m benchmarks.replay record --username ... --password ... -o konto.json
+    python -m benchmarks.replay replay konto.json --timing --dump resultat.json
+    python -m benchmarks.replay replay konto.json --expect resultat.json
+    python -m benchmarks.replay serve konto.json
+
+Kassetten är anonymiserad och innehåller inga inloggningsuppgifter eller
+cookies. Vid uppspelning emuleras inloggningen av stand-in-servern, medan
+user context, enhetsläsningar och PUT:ar besvaras med de inspelade svaren i
+ordning; det sista svaret för en sökväg upprepas. Sökvägar som saknas i
+kassetten besvaras som av stand-in-servern.
+
+Läget replay driver bara API-klienten och snapshot-bygget. Coordinator och
+plattformar körs mot en kassett i tests/test_replay.py, som sätter upp en
+config entry mot ReplayServer och kontrollerar entiteternas state. Manuellt
+går det att starta servern med serve och peka en config entry dit med
+``base_url`` i dess data; IP-adressen går bra eftersom integrationen då
+använder en cookie-jar som tar emot cookies från IP-adresser.
+
+Kräver en utvecklingsmiljö med Home Assistant installerat, eftersom
+integrationens paket importeras.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import Counter, deque
+from typing import Any
+
+import aiohttp
+from aiohttp import web
+
+from custom_components.melcloud_home.api import (
+    BASE_URL,
+    USER_CONTEXT_UNCHANGED,
+    MelCloudHomeCookieAPI,
+)
+from custom_components.melcloud_home.cassette import CASSETTE_VERSION, CassetteRecorder
+from custom_components.melcloud_home.metrics import (
+    ENDPOINT_LOGIN_PAGE,
+    ENDPOINT_LOGIN_SUBMIT,
+    ENDPOINT_UNIT_GET,
+    ENDPOINT_USER_CONTEXT,
+)
+from custom_components.melcloud_home.snapshot import (
+    UNIT_TYPE_ATW,
+    build_unit_index,
+    diff_unit_indexes,
+    serialize_unit_index,
+)
+
+from .run import PASSWORD, USERNAME, report
+from .standin_server import StandInServer
+
+# Inspelning: antal hämtningar av user context och väntetid mellan dem
+RECORD_REFRESHES = 5
+RECORD_INTERVAL = 10.0
+
+
+def load_cassette(path: str) -> dict[str, Any]:
+    """Läs en kassett och kontrollera versionen."""
+    with open(path, encoding="utf-8") as file:
+        cassette = json.load(file)
+    if cassette.get("version") != CASSETTE_VERSION:
+        raise SystemExit(f"{path}: kassettversion {cassette.get('version')} stöds inte")
+    return cassette
+
+
+def _first_user_context(cassette: dict[str, Any]) -> dict[str, Any]:
+    """Returnera första inspelade user context med kropp."""
+    for interaction in cassette["interactions"]:
+        if interaction["endpoint"] == ENDPOINT_USER_CONTEXT and "json" in interaction:
+            return interaction["json"]
+    raise SystemExit("kassetten saknar user context")
+
+
+class ReplayServer(StandInServer):
+    """Stand-in-server som besvarar API-anrop med en kassetts svar."""
+
+    def __init__(self, cassette: dict[str, Any], timing: bool = False) -> None:
+        """Initiera servern.
+
+        Args:
+            cassette: Kassetten som spelas upp, se load_cassette()
+            timing: Vänta lika länge som vid inspelningen innan varje svar
+        """
+        super().__init__(_first_user_context(cassette), USERNAME, PASSWORD)
+        self.timing = timing
+        # (metod, sökväg) -> inspelade svar i ordning
+        self._recorded: dict[tuple[str, str], deque[dict[str, Any]]] = {}
+        # Senaste svar med kropp per sökväg, för 304 som klienten inte kan ta emot
+        self._last_body: dict[str, dict[str, Any]] = {}
+        for interaction in cassette["interactions"]:
+            if interaction["path"].startswith("/api/"):
+                key = (interaction["method"], interaction["path"])
+                self._recorded.setdefault(key, deque()).append(interaction)
+        self.replayed: Counter[str] = Counter()
+
+    async def _replay(self, request: web.Request) -> web.Response | None:
+        """Besvara en förfrågan med nästa inspelade svar, eller None om inget finns."""
+        queue = self._recorded.get((request.method, request.path))
+        if not queue:
+            return None
+        self._check_api_request(request)
+        interaction = queue.popleft() if len(queue) > 1 else queue[0]
+        if self.timing:
+            await asyncio.sleep(interaction["elapsed"])
+        self.replayed[interaction["endpoint"]] += 1
+        headers = interaction.get("headers", {})
+        if interaction["status"] == 304 and request.headers.get(
+            "If-None-Match"
+        ) != headers.get("ETag"):
+            interaction = self._last_body.get(request.path, interaction)
+            headers = interaction.get("headers", {})
+        if "json" in interaction:
+            self._last_body[request.path] = interaction
+            return web.json_response(
+                interaction["json"],
+                status=interaction["status"],
+                headers={k: v for k, v in headers.items() if k != "Content-Type"},
+            )
+        return web.Response(status=interaction["status"], headers=headers)
+
+    # web.Response är en mapping och därmed falsk när den är tom; jämför med None
+
+    async def _handle_user_context(self, request: web.Request) -> web.Response:
+        response = await self._replay(request)
+        return response if response is not None else await super()._handle_user_context(request)
+
+    async def _handle_unit_get(self, request: web.Request) -> web.Response:
+        response = await self._replay(request)
+        return response if response is not None else await super()._handle_unit_get(request)
+
+    async def _handle_unit_put(self, request: web.Request) -> web.Response:
+        response = await self._replay(request)
+        return response if response is not None else await super()._handle_unit_put(request)
+
+
+async def _async_api(base_url: str, username: str, password: str) -> MelCloudHomeCookieAPI:
+    """Skapa en API-klient utan rate limit, ännu inte inloggad."""
+    api = MelCloudHomeCookieAPI(base_url=base_url, rate_limit=None)
+    # Cookies för IP-adresser kräver en "unsafe" cookie-jar
+    await api.async_setup(aiohttp.ClientSession(cookie_jar=aiohttp.CookieJar(unsafe=True)))
+    api.set_credentials(username, password)
+    return api
+
+
+async def async_record(args: argparse.Namespace) -> None:
+    """Spela in en kassett mot ett riktigt konto."""
+    api = await _async_api(args.base_url, args.username, args.password)
+    api.recorder = recorder = CassetteRecorder()
+    try:
+        if not await api.async_login():
+            raise SystemExit("inloggningen misslyckades")
+        context = None
+        for refresh in range(args.refreshes):
+            if refresh:
+                await asyncio.sleep(args.interval)
+            result = await api.get_user_context(conditional=context is not None)
+            if result is not USER_CONTEXT_UNCHANGED and result is not None:
+                context = result
+        if context is None:
+            raise SystemExit("kunde inte hämta user context")
+        for unit in build_unit_index(context).values():
+            if unit.type == UNIT_TYPE_ATW:
+                await api.get_atw_unit(unit.id)
+            else:
+                await api.get_ata_unit(unit.id)
+    finally:
+        await api.async_close()
+    recorder.write(args.output)
+    print(f"{len(recorder.interactions)} utbyten sparade i {args.output}")
+
+
+async def async_replay(args: argparse.Namespace) -> None:
+    """Spela upp en kassett och mät uppdateringarna."""
+    cassette = load_cassette(args.cassette)
+    interactions = cassette["interactions"]
+    refreshes = sum(1 for i in interactions if i["endpoint"] == ENDPOINT_USER_CONTEXT)
+    unit_paths = [i["path"] for i in interactions if i["endpoint"] == ENDPOINT_UNIT_GET]
+
+    async with ReplayServer(cassette, timing=args.timing) as server:
+        api = await _async_api(server.base_url, USERNAME, PASSWORD)
+        try:
+            start = time.perf_counter()
+            if not await api.async_login():
+                raise SystemExit("inloggningen mot uppspelningsservern misslyckades")
+            login = time.perf_counter() - start
+
+            units: dict[str, Any] = {}
+            fetch = cpu = 0.0
+            changed: list[int] = []
+            for _ in range(refreshes):
+                start = time.perf_counter()
+                context = await api.get_user_context(conditional=bool(units))
+                fetch += time.perf_counter() - start
+                if context is None:
+                    raise SystemExit(f"user context misslyckades, status {api.last_status}")
+                if context is USER_CONTEXT_UNCHANGED:
+                    changed.append(0)
+                    continue
+                # Allt nedan körs synkront på event-loopen
+                start = time.process_time()
+                new_units = build_unit_index(context)
+                changes = diff_unit_indexes(units, new_units)
+                cpu += time.process_time() - start
+                changed.append(len(changes))
+                units = new_units
+
+            start = time.perf_counter()
+            for path in unit_paths:
+                # /api/{atw|ata}unit/{id}
+                _, _, kind, unit_id = path.split("/", 3)
+                if kind == "atwunit":
+                    await api.get_atw_unit(unit_id)
+                else:
+                    await api.get_ata_unit(unit_id)
+            unit_reads = time.perf_counter() - start
+        finally:
+            await api.async_close()
+
+    def _recorded(endpoint: str) -> float:
+        return sum(i["elapsed"] for i in interactions if i["endpoint"] == endpoint)
+
+    report(
+        "replay (ms)",
+        [
+            (
+                "login",
+                1,
+                f"{(_recorded(ENDPOINT_LOGIN_PAGE) + _recorded(ENDPOINT_LOGIN_SUBMIT)) * 1000:.0f}",
+                f"{login * 1000:.0f}",
+            ),
+            (
+                "user_context",
+                refreshes,
+                f"{_recorded(ENDPOINT_USER_CONTEXT) * 1000:.0f}",
+                f"{fetch * 1000:.0f}",
+            ),
+            (
+                "unit_get",
+                len(unit_paths),
+                f"{_recorded(ENDPOINT_UNIT_GET) * 1000:.0f}",
+                f"{unit_reads * 1000:.0f}",
+            ),
+            ("snapshot CPU", refreshes, "-", f"{cpu * 1000:.2f}"),
+        ],
+        ("step", "count", "recorded", "replayed"),
+    )
+
+    result = {
+        "units": len(units),
+        "changed_per_refresh": changed,
+        "snapshot": sorted(serialize_unit_index(units), key=lambda unit: unit["id"]),
+    }
+    if args.dump:
+        with open(args.dump, "w", encoding="utf-8") as file:
+            json.dump(result, file, ensure_ascii=False, indent=1, sort_keys=True)
+    if args.expect:
+        with open(args.expect, encoding="utf-8") as file:
+            expected = json.load(file)
+        # Samma normalisering som vid --dump
+        result = json.loads(json.dumps(result, sort_keys=True))
+        if differing := sorted(key for key in result if result[key] != expected.get(key)):
+            print(f"Avviker från {args.expect}: {', '.join(differing)}")
+            sys.exit(1)
+        print(f"Samma resultat som {args.expect}")
+
+
+async def async_serve(args: argparse.Namespace) -> None:
+    """Kör uppspelningsservern tills den avbryts.
+
+    Peka en config entry mot servern genom att sätta ``base_url`` i dess data.
+    """
+    async with ReplayServer(load_cassette(args.cassette), timing=args.timing) as server:
+        print(f"{server.base_url} (användare {USERNAME}, lösenord {PASSWORD})")
+        await asyncio.Event().wait()
+
+
+def main() -> None:
+    """Tolka argumenten och kör valt läge."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    modes = parser.add_subparsers(dest="mode", required=True)
+
+    record = modes.add_parser("record", help="spela in en kassett")
+    record.add_argument("--username", required=True)
+    record.add_argument("--password", required=True)
+    record.add_argument("--base-url", default=BASE_URL)
+    record.add_argument("--refreshes", type=int, default=RECORD_REFRESHES)
+    record.add_argument("--interval", type=float, default=RECORD_INTERVAL, help="sekunder")
+    record.add_argument("-o", "--output", required=True)
+
+    for name, help_text in (("replay", "spela upp och mät"), ("serve", "kör servern")):
+        mode = modes.add_parser(name, help=help_text)
+        mode.add_argument("cassette")
+        mode.add_argument("--timing", action="store_true", help="inspelade svarstider")
+    replay = modes.choices["replay"]
+    replay.add_argument("--dump", help="spara resultatet för senare jämförelse")
+    replay.add_argument("--expect", help="jämför med ett sparat resultat")
+
+    args = parser.parse_args()
+    runner = {"record": async_record, "replay": async_replay, "serve": async_serve}[args.mode]
+    try:
+        asyncio.run(runner(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,562 @@
+"""Prestandasvit för MELCloud Home-integrationen.
+
+Kör mot den lokala stand-in-servern (standin_server.py), utan nätverk:
+
+    python -m benchmarks.run --units 1,10,100,1000
+
+Mäter per antal enheter:
+
+* refresh: latens för hämtning av user context (nätverk + avkodning) och
+  CPU-tid på event-loopen för att bygga och diffa snapshotet
+* unit_polling: bytes per uppdatering, hela user context mot läsning per enhet
+* property_reads: kostnad per entitetsuppslag, linjär sökning mot index
+* memory: topp- och kvarvarande minne per uppdatering
+* login: inloggningslatens, CSRF-extraktion och importtid för bs4
+* startup: tid tills entiteter kan skapas, med och utan sparat snapshot
+* scheduler: latens för en skrivning som kommer mitt i en skur av pollning
+* poll_rate: förfrågningar per dygn med det adaptiva pollintervallet
+
+Kräver en utvecklingsmiljö med Home Assistant installerat, eftersom
+integrationens paket importeras.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import json
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+from collections.abc import Awaitable, Callable
+from datetime import timedelta
+from typing import Any
+from unittest.mock import patch
+
+import aiohttp
+
+from custom_components.melcloud_home.api import (
+    USER_CONTEXT_UNCHANGED,
+    MelCloudHomeCookieAPI,
+    _CsrfExtractor,
+    _CsrfFound,
+)
+from custom_components.melcloud_home.polling import AdaptivePollInterval
+from custom_components.melcloud_home.scheduler import (
+    PRIORITY_INTERACTIVE,
+    PRIORITY_POLL,
+    PrioritySemaphore,
+)
+from custom_components.melcloud_home.snapshot import (
+    build_unit_index,
+    diff_unit_indexes,
+    restore_unit_index,
+    serialize_unit_index,
+)
+
+from .standin_server import StandInServer, generate_account
+
+# Simulerad molnlatens per förfrågan i startup-benchmarken
+STARTUP_LATENCY = 0.1
+
+USERNAME = "test@example.com"
+PASSWORD = "secret"
+
+BENCHMARKS: dict[str, Callable[[list[int]], Awaitable[None]]] = {}
+
+
+def benchmark(func: Callable[[list[int]], Awaitable[None]]):
+    """Registrera en benchmark under funktionens namn utan prefix."""
+    BENCHMARKS[func.__name__.removeprefix("bench_")] = func
+    return func
+
+
+def account_for(units: int, **kwargs: Any) -> dict[str, Any]:
+    """Ett konto med hälften ATW och hälften ATA, tio enheter per byggnad."""
+    return generate_account(
+        buildings=max(1, units // 10),
+        atw_units=(units + 1) // 2,
+        ata_units=units // 2,
+        **kwargs,
+    )
+
+
+async def logged_in_api(server: StandInServer, **kwargs: Any) -> MelCloudHomeCookieAPI:
+    """Skapa en inloggad API-klient mot stand-in-servern.
+
+    Utan argument är kontots rate limit avstängd, så att benchmarks mäter
+    själva förfrågningarna.
+    """
+    api = MelCloudHomeCookieAPI(base_url=server.base_url, **{"rate_limit": None, **kwargs})
+    # Cookies för IP-adresser kräver en "unsafe" cookie-jar
+    await api.async_setup(aiohttp.ClientSession(cookie_jar=aiohttp.CookieJar(unsafe=True)))
+    api.set_credentials(USERNAME, PASSWORD)
+    if not await api.async_login():
+        raise RuntimeError("Inloggning mot stand-in-servern misslyckades")
+    return api
+
+
+def report(name: str, rows: list[tuple[Any, ...]], headers: tuple[str, ...]) -> None:
+    """Skriv ut en enkel tabell."""
+    widths = [max(len(str(v)) for v in col) for col in zip(headers, *rows)]
+    print(f"\n== {name} ==")
+    print("  ".join(h.rjust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(v).rjust(w) for v, w in zip(row, widths)))
+
+
+def _legacy_get_setting(devices: list[dict[str, Any]], unit_id: str, name: str) -> Any:
+    """Uppslag som entiteterna gjorde före det indexerade snapshotet."""
+    for device in devices:
+        if device["id"] == unit_id:
+            for setting in device.get("settings", []):
+                if setting.get("name") == name:
+                    value = setting.get("value")
+                    if value in ("True", "False"):
+                        return value == "True"
+                    try:
+                        return float(value)
+                    except (ValueError, TypeError):
+                        return value
+    return None
+
+
+@benchmark
+async def bench_property_reads(unit_counts: list[int]) -> None:
+    """Kostnad per entitetsuppslag som funktion av antal enheter."""
+    rows = []
+    for count in unit_counts:
+        context = account_for(count)
+        devices = [
+            unit
+            for building in context["buildings"]
+            for unit in building["airToWaterUnits"] + building["airToAirUnits"]
+        ]
+        units = build_unit_index(context)
+        # Sista enheten är värsta fallet för den linjära sökningen
+        unit_id = devices[-1]["id"]
+        name = "Power"
+        number = max(1000, 200_000 // count)
+        legacy = timeit.timeit(lambda: _legacy_get_setting(devices, unit_id, name), number=number)
+        indexed = timeit.timeit(lambda: units[unit_id].settings.get(name), number=number)
+        rows.append(
+            (
+                count,
+                f"{legacy / number * 1e9:.0f}",
+                f"{indexed / number * 1e9:.0f}",
+                f"{legacy / indexed:.0f}x",
+            )
+        )
+    report("property_reads (ns per read)", rows, ("units", "linear", "indexed", "speedup"))
+
+
+@benchmark
+async def bench_refresh(unit_counts: list[int]) -> None:
+    """Latens per uppdatering och tid på event-loopen."""
+    rows = []
+    for count in unit_counts:
+        async with StandInServer(account_for(count), USERNAME, PASSWORD) as server:
+            api = await logged_in_api(server)
+            try:
+                previous = build_unit_index(await api.get_user_context())
+                runs = 5
+                network = cpu = 0.0
+                for _ in range(runs):
+                    start = time.perf_counter()
+                    context = await api.get_user_context()
+                    network += time.perf_counter() - start
+                    # Allt nedan körs synkront på event-loopen
+                    start = time.process_time()
+                    units = build_unit_index(context)
+                    diff_unit_indexes(previous, units)
+                    cpu += time.process_time() - start
+                    previous = units
+                payload = server.stats.bytes_sent["GET /api/user/context"] / (runs + 1)
+            finally:
+                await api.async_close()
+        rows.append(
+            (
+                count,
+                f"{payload / 1024:.1f}",
+                f"{network / runs * 1000:.1f}",
+                f"{cpu / runs * 1000:.2f}",
+            )
+        )
+    report(
+        "refresh",
+        rows,
+        ("units", "payload KiB", "fetch+decode ms", "loop CPU ms"),
+    )
+
+
+@benchmark
+async def bench_conditional(unit_counts: list[int]) -> None:
+    """Oförändrad user context: full behandling mot body-hash och ETag/304.
+
+    Servern körs i samma process, så CPU-tiden inkluderar dess json.dumps.
+    """
+    rows = []
+    runs = 5
+    for count in unit_counts:
+        results = {}
+        for mode in ("full", "hash", "etag"):
+            async with StandInServer(
+                account_for(count), USERNAME, PASSWORD, etag=mode == "etag"
+            ) as server:
+                api = await logged_in_api(server)
+                try:
+                    previous = build_unit_index(await api.get_user_context())
+                    server.stats.reset()
+                    wall = cpu = 0.0
+                    for _ in range(runs):
+                        start, start_cpu = time.perf_counter(), time.process_time()
+                        context = await api.get_user_context(conditional=mode != "full")
+                        if context is not USER_CONTEXT_UNCHANGED:
+                            diff_unit_indexes(previous, build_unit_index(context))
+                        wall += time.perf_counter() - start
+                        cpu += time.process_time() - start_cpu
+                    received = server.stats.bytes_sent["GET /api/user/context"] / runs
+                finally:
+                    await api.async_close()
+            results[mode] = (wall / runs * 1000, cpu / runs * 1000, received / 1024)
+        rows.append(
+            (
+                count,
+                *(f"{results[mode][0]:.1f}" for mode in results),
+                *(f"{results[mode][1]:.2f}" for mode in results),
+                *(f"{results[mode][2]:.1f}" for mode in results),
+            )
+        )
+    report(
+        "conditional (per oförändrad poll)",
+        rows,
+        (
+            "units",
+            "full ms", "hash ms", "etag ms",
+            "full CPU ms", "hash CPU ms", "etag CPU ms",
+            "full KiB", "hash KiB", "etag KiB",
+        ),
+    )
+
+
+@benchmark
+async def bench_unit_polling(unit_counts: list[int]) -> None:
+    """Bytes och latens: hela user context mot läsning per enhet."""
+    rows = []
+    for count in unit_counts:
+        async with StandInServer(account_for(count), USERNAME, PASSWORD, latency=0.005) as server:
+            api = await logged_in_api(server)
+            try:
+                start = time.perf_counter()
+                context = await api.get_user_context()
+                full_time = time.perf_counter() - start
+                full_bytes = server.stats.bytes_sent["GET /api/user/context"]
+                units = build_unit_index(context)
+
+                semaphore = asyncio.Semaphore(4)
+
+                async def _fetch(unit) -> None:
+                    async with semaphore:
+                        if unit.type == "air_to_air":
+                            await api.get_ata_unit(unit.id)
+                        else:
+                            await api.get_atw_unit(unit.id)
+
+                start = time.perf_counter()
+                await asyncio.gather(*(_fetch(unit) for unit in units.values()))
+                unit_time = time.perf_counter() - start
+                unit_bytes = sum(
+                    value
+                    for key, value in server.stats.bytes_sent.items()
+                    if key.startswith("GET /api/{kind")
+                )
+            finally:
+                await api.async_close()
+        rows.append(
+            (
+                count,
+                f"{full_bytes / 1024:.1f}",
+                f"{unit_bytes / 1024:.1f}",
+                f"{full_time * 1000:.1f}",
+                f"{unit_time * 1000:.1f}",
+            )
+        )
+    report(
+        "unit_polling",
+        rows,
+        ("units", "context KiB", "per-unit KiB", "context ms", "per-unit ms"),
+    )
+
+
+@benchmark
+async def bench_memory(unit_counts: list[int]) -> None:
+    """Topp- och kvarvarande minne för en uppdatering."""
+    rows = []
+    for count in unit_counts:
+        async with StandInServer(account_for(count), USERNAME, PASSWORD) as server:
+            api = await logged_in_api(server)
+            try:
+                gc.collect()
+                tracemalloc.start()
+                context = await api.get_user_context()
+                units = build_unit_index(context)
+                _, peak = tracemalloc.get_traced_memory()
+                raw_and_index, _ = tracemalloc.get_traced_memory()
+                del context
+                gc.collect()
+                index_only, _ = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                del units
+            finally:
+                await api.async_close()
+        rows.append(
+            (
+                count,
+                f"{peak / 1024:.0f}",
+                f"{raw_and_index / 1024:.0f}",
+                f"{index_only / 1024:.0f}",
+            )
+        )
+    report(
+        "memory (KiB)",
+        rows,
+        ("units", "peak", "raw+index retained", "index retained"),
+    )
+
+
+@benchmark
+async def bench_login(unit_counts: list[int]) -> None:
+    """Inloggningslatens, CSRF-extraktion och importtid."""
+    async with StandInServer(account_for(1), USERNAME, PASSWORD) as server:
+        runs = 20
+        start = time.perf_counter()
+        for _ in range(runs):
+            api = await logged_in_api(server)
+            await api.async_close()
+        login_ms = (time.perf_counter() - start) / runs * 1000
+
+        # Återanvänd sparad session i stället för inloggning
+        api = await logged_in_api(server)
+        saved = api.export_session()
+        await api.async_close()
+        start = time.perf_counter()
+        for _ in range(runs):
+            api = MelCloudHomeCookieAPI(base_url=server.base_url, rate_limit=None)
+            await api.async_setup(aiohttp.ClientSession(cookie_jar=aiohttp.CookieJar(unsafe=True)))
+            api.restore_session(saved)
+            assert await api.get_user_context()
+            await api.async_close()
+        reuse_ms = (time.perf_counter() - start) / runs * 1000
+
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"{server.base_url}/amazoncognito.com/login") as resp:
+                html = await resp.text()
+
+    def _stream_extract() -> None:
+        parser = _CsrfExtractor()
+        try:
+            for i in range(0, len(html), 8192):
+                parser.feed(html[i : i + 8192])
+        except _CsrfFound:
+            pass
+
+    rows = [
+        ("login (GET/parse/POST)", f"{login_ms:.2f}"),
+        ("restored session", f"{reuse_ms:.2f}"),
+        ("csrf stream extractor", f"{timeit.timeit(_stream_extract, number=200) / 200 * 1000:.3f}"),
+    ]
+    try:
+        from bs4 import BeautifulSoup
+    except ImportError:
+        rows.append(("csrf BeautifulSoup", "n/a (bs4 saknas)"))
+    else:
+        def _bs4_extract() -> None:
+            BeautifulSoup(html, "html.parser").find("input", {"name": "_csrf"})
+
+        rows.append(
+            ("csrf BeautifulSoup", f"{timeit.timeit(_bs4_extract, number=200) / 200 * 1000:.3f}")
+        )
+        rows.append(("import bs4", f"{_import_time('bs4'):.1f}"))
+    rows.append(("import html.parser", f"{_import_time('html.parser'):.1f}"))
+    report("login (ms)", rows, ("step", "ms"))
+
+
+@benchmark
+async def bench_startup(unit_counts: list[int]) -> None:
+    """Tid tills entiteter kan skapas vid start, med simulerad molnlatens.
+
+    legacy: inloggning, valideringshämtning och en andra hämtning i första
+    uppdateringen. cold: inloggning och en hämtning. snapshot: sparat
+    snapshot läses från disk; inloggning och hämtning sker i bakgrunden.
+    """
+    rows = []
+    for count in unit_counts:
+        async with StandInServer(
+            account_for(count), USERNAME, PASSWORD, latency=STARTUP_LATENCY
+        ) as server:
+            start = time.perf_counter()
+            api = await logged_in_api(server)
+            assert await api.get_user_context()
+            units = build_unit_index(await api.get_user_context())
+            legacy = time.perf_counter() - start
+            await api.async_close()
+
+            start = time.perf_counter()
+            api = await logged_in_api(server)
+            units = build_unit_index(await api.get_user_context())
+            cold = time.perf_counter() - start
+            await api.async_close()
+
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as file:
+            json.dump({"units": serialize_unit_index(units)}, file)
+            file.flush()
+            start = time.perf_counter()
+            with open(file.name, encoding="utf-8") as stored:
+                restored = restore_unit_index(json.load(stored)["units"])
+            snapshot = time.perf_counter() - start
+        assert restored.keys() == units.keys()
+        rows.append(
+            (
+                count,
+                f"{legacy * 1000:.0f}",
+                f"{cold * 1000:.0f}",
+                f"{snapshot * 1000:.1f}",
+                f"{(legacy - snapshot) * 1000:.0f}",
+            )
+        )
+    report(
+        f"startup (ms, {STARTUP_LATENCY * 1000:.0f} ms latens per förfrågan)",
+        rows,
+        ("units", "legacy", "cold", "snapshot", "saved"),
+    )
+
+
+@benchmark
+async def bench_scheduler(unit_counts: list[int]) -> None:
+    """Latens för en interaktiv skrivning som köas bakom en skur av pollning.
+
+    Alla enheter läses samtidigt (som vid pollning per enhet), och strax
+    efter skickas en PUT. fifo: skrivningen har samma prioritet som
+    pollningen. priority: skrivningen går före väntande läsningar.
+    """
+    rows = []
+    for count in unit_counts:
+        latencies = {}
+        async with StandInServer(account_for(count), USERNAME, PASSWORD, latency=0.05) as server:
+            unit = next(iter(build_unit_index(server.user_context).values()))
+            for label, write_priority in (("fifo", PRIORITY_POLL), ("priority", PRIORITY_INTERACTIVE)):
+                api = await logged_in_api(
+                    server, request_semaphore=PrioritySemaphore(4), rate_limit=20.0, burst=10
+                )
+                try:
+                    polls = [
+                        asyncio.create_task(api.get_atw_unit(unit_id))
+                        for unit_id in build_unit_index(server.user_context)
+                    ]
+                    await asyncio.sleep(0)
+                    start = time.perf_counter()
+                    await api.set_atw_state(unit.id, {"power": True}, write_priority)
+                    latencies[label] = time.perf_counter() - start
+                    await asyncio.gather(*polls)
+                    waits = api.metrics.as_dict()["waits"]
+                finally:
+                    await api.async_close()
+        rows.append(
+            (
+                count,
+                f"{latencies['fifo'] * 1000:.0f}",
+                f"{latencies['priority'] * 1000:.0f}",
+                f"{waits['poll']['max_wait'] * 1000:.0f}",
+            )
+        )
+    report(
+        "scheduler (ms, 50 ms latens, 20 req/s, 4 samtidiga)",
+        rows,
+        ("units", "write fifo", "write priority", "max poll wait"),
+    )
+
+
+def _polls_per_day(
+    count_measured: bool, app_changes: list[float], writes: list[float]
+) -> int:
+    """Simulera ett dygn av pollning och räkna hämtningarna av user context.
+
+    Uppmätta temperaturer antas ändras vid varje hämtning.
+
+    Args:
+        count_measured: Låt ändrade mätvärden räknas som ändringar, som
+            pollningen gjorde tidigare
+        app_changes: Tider (sekunder) då börvärden ändras utanför Home Assistant
+        writes: Tider (sekunder) då ändringar görs från Home Assistant
+    """
+    day = timedelta(days=1).total_seconds()
+    app_changes, writes = sorted(app_changes), sorted(writes)
+    clock = [0.0]
+    with patch("custom_components.melcloud_home.polling.time.monotonic", lambda: clock[0]):
+        poll = AdaptivePollInterval()
+        polls = 0
+        while clock[0] < day:
+            polls += 1
+            control = False
+            while app_changes and app_changes[0] <= clock[0]:
+                app_changes.pop(0)
+                control = True
+            next_poll = clock[0] + poll.note_success(control or count_measured).total_seconds()
+            if writes and writes[0] < next_poll:
+                clock[0] = writes.pop(0)
+                next_poll = clock[0] + poll.note_write().total_seconds()
+            clock[0] = next_poll
+    return polls
+
+
+@benchmark
+async def bench_poll_rate(unit_counts: list[int]) -> None:
+    """Förfrågningar per dygn, oberoende av antal enheter.
+
+    typisk: börvärdet ändras fyra gånger i appen och två gånger från Home
+    Assistant. stilla: inget styrs under dygnet. Jämförs med det gamla
+    fasta intervallet på 15 minuter.
+    """
+    hour = 3600.0
+    typical = ([6 * hour, 8 * hour, 17 * hour, 22 * hour], [7 * hour, 19 * hour])
+    rows = [("fast 15 min", 24 * 4, 24 * 4)]
+    for label, count_measured in (("alla ändringar", True), ("styrändringar", False)):
+        rows.append(
+            (
+                label,
+                _polls_per_day(count_measured, *typical),
+                _polls_per_day(count_measured, [], []),
+            )
+        )
+    report("poll_rate (user context per dygn)", rows, ("changed-signal", "typisk", "stilla"))
+
+
+def _import_time(module: str) -> float:
+    """Mät importtid i en ny tolk, i millisekunder."""
+    code = f"import time; s = time.perf_counter(); import {module}; print(time.perf_counter() - s)"
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    return float(output) * 1000
+
+
+async def main() -> None:
+    """Kör valda benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--units", default="1,10,100,1000", help="kommaseparerade enhetsantal")
+    parser.add_argument(
+        "benchmarks", nargs="*", help=f"benchmarks att köra: {', '.join(BENCHMARKS)} (standard: alla)"
+    )
+    args = parser.parse_args()
+    if unknown := set(args.benchmarks) - BENCHMARKS.keys():
+        parser.error(f"okända benchmarks: {', '.join(sorted(unknown))}")
+    unit_counts = [int(n) for n in args.units.split(",")]
+    for name in args.benchmarks or BENCHMARKS:
+        await BENCHMARKS[name](unit_counts)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
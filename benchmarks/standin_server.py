@@ -0,0 +1,427 @@
+"""Lokal stand-in för melcloudhome.com.
+
+Implementerar det som MelCloudHomeCookieAPI använder:
+
+* Cognito-liknande inloggning: /bff/login omdirigerar till ett formulär med
+  ett dolt ``_csrf``-fält och en POST som sätter sessionscookien. API-klienten
+  känner igen Cognito på att URL:en innehåller "amazoncognito.com", så
+  formuläret ligger under en sökväg som innehåller den strängen.
+* GET /api/user/context, valfritt med ETag och 304 Not Modified
+* GET och PUT /api/atwunit/{id} och /api/ataunit/{id}
+* GET /api/telemetry/energy/{id} och /api/telemetry/actual/{id} med
+  syntetisk historik: energi i Wh per timme och ett mätvärde var tionde minut
+* Valfritt en websocket på PUSH_PATH som skickar enhetsdeltor när
+  settings ändras via PUT eller set_setting()
+
+Konton genereras syntetiskt med valfritt antal byggnader, ATW/ATA-enheter
+och extra settings, så att nyttolasten kan skalas från 1 till 1000 enheter.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+import secrets
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from aiohttp import web
+
+SESSION_COOKIE = "melcloudhome_session"
+PUSH_PATH = "/ws/unit-updates"
+COGNITO_PATH = "/amazoncognito.com/login"
+TELEMETRY_TIME_FORMAT = "%Y-%m-%d %H:%M"
+# Intervall mellan mätvärden i historiken
+TELEMETRY_SAMPLE_INTERVAL = timedelta(minutes=10)
+
+ATW_SETTINGS = {
+    "Power": "True",
+    "OperationMode": "Heating",
+    "OperationModeZone1": "HeatRoomTemperature",
+    "RoomTemperatureZone1": "21.5",
+    "SetTemperatureZone1": "22",
+    "TankWaterTemperature": "48.5",
+    "SetTankWaterTemperature": "50",
+    "ForcedHotWaterMode": "False",
+}
+ATA_SETTINGS = {
+    "Power": "True",
+    "OperationMode": "Heat",
+    "RoomTemperature": "20.5",
+    "SetTemperature": "21",
+    "FanSpeed": "Auto",
+    "VaneHorizontal": "Auto",
+    "VaneVertical": "Auto",
+}
+
+
+def _setting_value(value: Any) -> str:
+    """Serialisera ett värde som API:t gör (allt är strängar)."""
+    if isinstance(value, bool):
+        return "True" if value else "False"
+    return str(value)
+
+
+def _unit(unit_type: str, index: int, extra_settings: int, rng: random.Random) -> dict[str, Any]:
+    """Skapa en enhet i API-format."""
+    base = ATW_SETTINGS if unit_type == "atw" else ATA_SETTINGS
+    settings = [{"name": name, "value": value} for name, value in base.items()]
+    settings.extend(
+        {"name": f"Extra{n}", "value": str(rng.randint(0, 100))} for n in range(extra_settings)
+    )
+    capabilities = {
+        "minSetTemperature": 10 if unit_type == "atw" else 16,
+        "maxSetTemperature": 30 if unit_type == "atw" else 31,
+        "hasHalfDegrees": True,
+        "temperatureIncrement": 0.5,
+        "hasHotWater": unit_type == "atw",
+        "minSetTankTemperature": 30,
+        "maxSetTankTemperature": 60,
+        # Fält som integrationen inte läser, för realistisk storlek
+        "ftcModel": 3,
+        "hasZone2": False,
+        "refridgerentAddress": 0,
+        "hasEnergyConsumedMeter": True,
+    }
+    return {
+        "id": str(uuid.UUID(int=rng.getrandbits(128))),
+        "givenDisplayName": f"{unit_type.upper()} {index}",
+        "displayIcon": "Lounge",
+        "macAddress": ":".join(f"{rng.randint(0, 255):02x}" for _ in range(6)),
+        "timeZone": "Europe/Stockholm",
+        "rssi": -rng.randint(40, 80),
+        "isConnected": True,
+        "connectedInterfaceIdentifier": secrets.token_hex(8),
+        "systemId": str(uuid.UUID(int=rng.getrandbits(128))),
+        "capabilities": capabilities,
+        "settings": settings,
+        "schedule": [],
+        "scheduleEnabled": False,
+        "holidayMode": {"enabled": False, "startDate": None, "endDate": None},
+        "frostProtection": {"enabled": False, "min": 10, "max": 12},
+    }
+
+
+def generate_account(
+    buildings: int = 1,
+    atw_units: int = 1,
+    ata_units: int = 0,
+    extra_settings: int = 20,
+    seed: int = 0,
+) -> dict[str, Any]:
+    """Generera en syntetisk user context.
+
+    Enheterna fördelas jämnt över byggnaderna.
+    """
+    rng = random.Random(seed)
+    context: dict[str, Any] = {
+        "id": str(uuid.UUID(int=rng.getrandbits(128))),
+        "firstname": "Test",
+        "lastname": "User",
+        "email": "test@example.com",
+        "language": "sv",
+        "buildings": [
+            {
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "name": f"Building {b}",
+                "timezone": "Europe/Stockholm",
+                "airToWaterUnits": [],
+                "airToAirUnits": [],
+            }
+            for b in range(max(1, buildings))
+        ],
+    }
+    building_list = context["buildings"]
+    for n in range(atw_units):
+        building_list[n % len(building_list)]["airToWaterUnits"].append(
+            _unit("atw", n, extra_settings, rng)
+        )
+    for n in range(ata_units):
+        building_list[n % len(building_list)]["airToAirUnits"].append(
+            _unit("ata", n, extra_settings, rng)
+        )
+    return context
+
+
+def _telemetry_value(unit_id: str, measure: str, when: datetime) -> float:
+    """Deterministiskt historiskt värde, så att samma tid alltid ger samma värde."""
+    hours = when.timestamp() / 3600
+    if measure.startswith("cumulative_energy"):
+        return float(random.Random(f"{unit_id}{measure}{int(hours)}").randint(200, 1500))
+    base = 48.0 if measure == "tank_water_temperature" else 21.0
+    return round(base + 1.5 * math.sin(hours / 24 * 2 * math.pi), 1)
+
+
+@dataclass
+class StandInStats:
+    """Räknare för vad servern har tagit emot och skickat."""
+
+    requests: Counter = field(default_factory=Counter)
+    bytes_sent: Counter = field(default_factory=Counter)
+    logins: int = 0
+
+    def reset(self) -> None:
+        """Nollställ räknarna."""
+        self.requests.clear()
+        self.bytes_sent.clear()
+        self.logins = 0
+
+
+class StandInServer:
+    """En aiohttp-server som beter sig som melcloudhome.com."""
+
+    def __init__(
+        self,
+        user_context: dict[str, Any],
+        username: str = "test@example.com",
+        password: str = "secret",
+        latency: float = 0.0,
+        login_page_padding: int = 30_000,
+        session_max_age: int = 8 * 3600,
+        etag: bool = False,
+        push: bool = False,
+    ) -> None:
+        """Initiera servern.
+
+        Args:
+            user_context: Kontot som serveras, se generate_account()
+            username: Giltigt användarnamn
+            password: Giltigt lösenord
+            latency: Fördröjning i sekunder per förfrågan
+            login_page_padding: Ungefärlig storlek på inloggningssidan före formuläret
+            session_max_age: Sessionens livslängd i sekunder, både i cookien och på servern
+            etag: Skicka ETag för user context och svara 304 på If-None-Match
+            push: Erbjud push-kanalen; annars svarar PUSH_PATH 404
+        """
+        self.user_context = user_context
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.login_page_padding = login_page_padding
+        self.session_max_age = session_max_age
+        self.etag = etag
+        self.push = push
+        self._push_clients: set[web.WebSocketResponse] = set()
+        self._push_tasks: set[asyncio.Task[None]] = set()
+        self.stats = StandInStats()
+        # Statuskoder att svara med för de närmaste API-anropen, för fel-scenarier
+        self.fail_with: list[int] = []
+        # Session -> utgångstid (time.monotonic())
+        self._sessions: dict[str, float] = {}
+        self._csrf_tokens: set[str] = set()
+        self._units = self._index_units()
+        self._runner: web.AppRunner | None = None
+        self.base_url = ""
+
+    def _index_units(self) -> dict[str, dict[str, Any]]:
+        units = {}
+        for building in self.user_context.get("buildings", []):
+            for unit in building.get("airToWaterUnits", []) + building.get("airToAirUnits", []):
+                units[unit["id"]] = unit
+        return units
+
+    def expire_sessions(self) -> None:
+        """Ogiltigförklara alla sessioner så att nästa anrop får 401."""
+        self._sessions.clear()
+
+    async def start(self) -> str:
+        """Starta servern på en ledig port och returnera bas-URL:en."""
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get("/bff/login", self._handle_login_start)
+        app.router.add_get(COGNITO_PATH, self._handle_login_form)
+        app.router.add_post(COGNITO_PATH, self._handle_login_post)
+        app.router.add_get("/dashboard", self._handle_dashboard)
+        app.router.add_get("/api/user/context", self._handle_user_context)
+        app.router.add_get("/api/{kind:(atw|ata)unit}/{unit_id}", self._handle_unit_get)
+        app.router.add_put("/api/{kind:(atw|ata)unit}/{unit_id}", self._handle_unit_put)
+        app.router.add_get(
+            "/api/telemetry/{telemetry:(energy|actual)}/{unit_id}", self._handle_telemetry
+        )
+        if self.push:
+            app.router.add_get(PUSH_PATH, self._handle_push)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        """Stoppa servern."""
+        await self.drop_push_clients()
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> StandInServer:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_: Any) -> None:
+        await self.stop()
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler) -> web.StreamResponse:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        route = request.match_info.route.resource.canonical if request.match_info.route.resource else request.path
+        self.stats.requests[f"{request.method} {route}"] += 1
+        if self.fail_with and request.path.startswith("/api/"):
+            status = self.fail_with.pop(0)
+            return web.Response(status=status, headers={"Retry-After": "1"} if status == 429 else None)
+        response = await handler(request)
+        if isinstance(response, web.Response) and response.body is not None:
+            self.stats.bytes_sent[f"{request.method} {route}"] += len(response.body)
+        return response
+
+    def _authenticated(self, request: web.Request) -> bool:
+        expires = self._sessions.get(request.cookies.get(SESSION_COOKIE, ""))
+        return expires is not None and expires > time.monotonic()
+
+    async def _handle_login_start(self, request: web.Request) -> web.Response:
+        if self._authenticated(request):
+            raise web.HTTPFound("/dashboard")
+        raise web.HTTPFound(f"{COGNITO_PATH}?client_id=standin&state={secrets.token_hex(8)}")
+
+    async def _handle_login_form(self, request: web.Request) -> web.Response:
+        token = secrets.token_urlsafe(32)
+        self._csrf_tokens.add(token)
+        padding = "<script>/* " + "x" * self.login_page_padding + " */</script>"
+        html = (
+            "<!DOCTYPE html><html><head><title>Signin</title>"
+            f"{padding}</head><body><div class='modal-content'>"
+            "<form name='cognitoSignInForm' method='post'>"
+            f"<input name=\"_csrf\" type=\"hidden\" value=\"{token}\"/>"
+            "<input name='username' type='text'/><input name='password' type='password'/>"
+            "<input name='signInSubmitButton' type='submit' value='Sign in'/>"
+            "</form></div>" + "<div class='footer'></div>" * 200 + "</body></html>"
+        )
+        return web.Response(text=html, content_type="text/html")
+
+    async def _handle_login_post(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        if (
+            form.get("_csrf") not in self._csrf_tokens
+            or form.get("username") != self.username
+            or form.get("password") != self.password
+        ):
+            return web.Response(status=401, text="Incorrect username or password.")
+        self._csrf_tokens.discard(form["_csrf"])
+        session = secrets.token_urlsafe(32)
+        self._sessions[session] = time.monotonic() + self.session_max_age
+        self.stats.logins += 1
+        response = web.HTTPFound("/dashboard")
+        response.set_cookie(SESSION_COOKIE, session, httponly=True, max_age=self.session_max_age)
+        raise response
+
+    async def _handle_dashboard(self, request: web.Request) -> web.Response:
+        return web.Response(text="<html><body>dashboard</body></html>", content_type="text/html")
+
+    def _check_api_request(self, request: web.Request) -> None:
+        if request.headers.get("x-csrf") != "1" or not self._authenticated(request):
+            raise web.HTTPUnauthorized()
+
+    async def _handle_user_context(self, request: web.Request) -> web.Response:
+        self._check_api_request(request)
+        body = json.dumps(self.user_context).encode()
+        if not self.etag:
+            return web.Response(body=body, content_type="application/json")
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(body=body, content_type="application/json", headers={"ETag": etag})
+
+    async def _handle_unit_get(self, request: web.Request) -> web.Response:
+        self._check_api_request(request)
+        unit = self._units.get(request.match_info["unit_id"])
+        if unit is None:
+            raise web.HTTPNotFound()
+        return web.Response(body=json.dumps(unit).encode(), content_type="application/json")
+
+    async def _handle_unit_put(self, request: web.Request) -> web.Response:
+        self._check_api_request(request)
+        unit = self._units.get(request.match_info["unit_id"])
+        if unit is None:
+            raise web.HTTPNotFound()
+        changes = await request.json()
+        settings = {s["name"]: s for s in unit["settings"]}
+        delta = []
+        for field_name, value in changes.items():
+            name = field_name[:1].upper() + field_name[1:]
+            if name in settings:
+                settings[name]["value"] = _setting_value(value)
+            else:
+                unit["settings"].append({"name": name, "value": _setting_value(value)})
+            delta.append({"name": name, "value": _setting_value(value)})
+        self._publish(unit["id"], delta)
+        return web.Response(status=200)
+
+    async def _handle_telemetry(self, request: web.Request) -> web.Response:
+        self._check_api_request(request)
+        unit_id = request.match_info["unit_id"]
+        if unit_id not in self._units:
+            raise web.HTTPNotFound()
+        try:
+            start = datetime.strptime(request.query["from"], TELEMETRY_TIME_FORMAT)
+            end = datetime.strptime(request.query["to"], TELEMETRY_TIME_FORMAT)
+            measure = request.query["measure"]
+        except (KeyError, ValueError):
+            raise web.HTTPBadRequest()
+        energy = request.match_info["telemetry"] == "energy"
+        step = timedelta(hours=1) if energy else TELEMETRY_SAMPLE_INTERVAL
+        values = []
+        when = start.replace(tzinfo=timezone.utc)
+        end = end.replace(tzinfo=timezone.utc)
+        while when < end:
+            values.append(
+                {
+                    "time": when.strftime("%Y-%m-%d %H:%M:%S.000000000"),
+                    "value": str(_telemetry_value(unit_id, measure, when)),
+                }
+            )
+            when += step
+        body = {"measureData": [{"deviceId": unit_id, "type": measure, "values": values}]}
+        return web.Response(body=json.dumps(body).encode(), content_type="application/json")
+
+    async def _handle_push(self, request: web.Request) -> web.WebSocketResponse:
+        if not self._authenticated(request):
+            raise web.HTTPUnauthorized()
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        self._push_clients.add(ws)
+        try:
+            async for _ in ws:
+                pass
+        finally:
+            self._push_clients.discard(ws)
+        return ws
+
+    def _publish(self, unit_id: str, settings: list[dict[str, str]]) -> None:
+        """Skicka en enhetsdelta till alla anslutna push-klienter."""
+        message = json.dumps({"unitId": unit_id, "settings": settings})
+        for ws in list(self._push_clients):
+            task = asyncio.get_running_loop().create_task(ws.send_str(message))
+            self._push_tasks.add(task)
+            task.add_done_callback(self._push_tasks.discard)
+
+    async def drop_push_clients(self) -> None:
+        """Stäng alla push-anslutningar, som vid ett avbrott."""
+        for ws in list(self._push_clients):
+            await ws.close()
+
+    def set_setting(self, unit_id: str, name: str, value: Any) -> None:
+        """Ändra en setting på serversidan, som om den ändrats i appen."""
+        delta = [{"name": name, "value": _setting_value(value)}]
+        self._publish(unit_id, delta)
+        for setting in self._units[unit_id]["settings"]:
+            if setting["name"] == name:
+                setting["value"] = _setting_value(value)
+                return
+        self._units[unit_id]["settings"].append(dict(delta[0]))
@@ -1,29 +1,95 @@
 """MELCloud Home integration för Home Assistant."""
 from __future__ import annotations
 
+import asyncio
+import contextlib
 import logging
-from datetime import timedelta
+import time
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Any
+
+import aiohttp
+from yarl import URL
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_PASSWORD, CONF_USERNAME, Platform
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.exceptions import ConfigEntryAuthFailed, ConfigEntryNotReady
+from homeassistant.helpers import aiohttp_client, device_registry as dr
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
+from homeassistant.util.network import is_ip_address
 
-from .api import MelCloudHomeCookieAPI
-from .const import DOMAIN
+from .api import BASE_URL, USER_CONTEXT_UNCHANGED, MelCloudHomeCookieAPI
+from .const import (
+    CONF_BASE_URL,
+    CONF_PUSH,
+    CONF_UNIT_POLLING,
+    DATA_HUB,
+    DOMAIN,
+    SIGNAL_UNITS_CHANGED,
+    STORAGE_VERSION,
+)
+from .history import HISTORY_IMPORT_INTERVAL, HistoryImporter, history_storage_key
+from .hub import MELCloudHomeHub, async_get_hub
+from .metrics import ConditionalFetchMetrics, RefreshMetrics, WriteMetrics
+from .polling import AdaptivePollInterval
+from .profiling import RefreshProfiler
+from .push import PushChannel
+from .scheduler import PRIORITY_AUTOMATION, PRIORITY_INTERACTIVE
+from .services import async_setup_services, async_unload_services
+from .snapshot import (
+    ALL_KEYS,
+    META_KEY,
+    UNIT_TYPE_ATA,
+    UnitSnapshot,
+    apply_state,
+    apply_unit_delta,
+    build_unit_index,
+    coerce_setting_value,
+    diff_unit_indexes,
+    has_control_changes,
+    merge_unit_state,
+    restore_unit_index,
+    serialize_unit_index,
+    setting_name,
+    topology_signature,
+)
+from .trends import UnitTrends
 
 _LOGGER = logging.getLogger(__name__)
 
 PLATFORMS = [Platform.CLIMATE, Platform.SENSOR, Platform.NUMBER, Platform.SWITCH, Platform.SELECT]
-SCAN_INTERVAL = timedelta(minutes=15)
+# Fönster inom vilket ändringar för samma enhet slås ihop till en PUT
+WRITE_DEBOUNCE_SECONDS = 1.5
+# Hur ofta hela user context hämtas när enheter pollas var för sig (topologi)
+FULL_CONTEXT_INTERVAL = timedelta(hours=1)
+# Pollintervall för avstämning medan push-kanalen är uppe
+PUSH_VERIFY_INTERVAL = timedelta(hours=1)
+# Hur länge senast kända snapshot visas under ett avbrott innan entiteterna blir otillgängliga
+MAX_STALE_AGE = timedelta(hours=3)
+# Max antal samtidiga läsningar per enhet
+UNIT_POLL_CONCURRENCY = 4
+# Antal fullständiga hämtningar i rad som en enhet ska saknas i innan den tas bort
+UNIT_RETIRE_AFTER = 3
+# Max antal samtidiga PUT:ar när en tjänst skriver till flera enheter
+BULK_WRITE_CONCURRENCY = 4
+# Fördröjning innan en förnyad session skrivs till disk
+SESSION_SAVE_DELAY = 10
+# Fördröjning innan ett ändrat snapshot skrivs till disk
+SNAPSHOT_SAVE_DELAY = 60
+# Baslinje för fält som saknades i snapshotet före skrivningen
+_NO_BASELINE = object()
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Konfigurera MELCloud Home från en config entry."""
-    api = MelCloudHomeCookieAPI()
-    await api.async_setup()
-    
     # Hämta användarnamn/lösenord
     username = entry.data.get(CONF_USERNAME)
     password = entry.data.get(CONF_PASSWORD)
@@ -32,23 +98,54 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         _LOGGER.error("Användarnamn eller lösenord saknas i konfigurationen")
         raise ConfigEntryNotReady("Ingen inloggningsinformation konfigurerad")
     
-    # Automatisk inloggning
-    _LOGGER.debug("Använder automatisk inloggning med användarnamn/lösenord")
+    hub = async_get_hub(hass)
+    api = MelCloudHomeCookieAPI(
+        request_semaphore=hub.request_semaphore,
+        base_url=entry.data.get(CONF_BASE_URL, BASE_URL),
+    )
+    await api.async_setup(async_create_api_session(hass, api))
     api.set_credentials(username, password)
     
-    if not await api.async_login():
-        _LOGGER.error("Kunde inte logga in med användarnamn och lösenord")
-        raise ConfigEntryAuthFailed("Inloggning misslyckades")
-    
-    # Testa anslutningen
-    user_context = await api.get_user_context()
-    if not user_context:
-        _LOGGER.error("Kunde inte verifiera autentisering")
-        raise ConfigEntryAuthFailed("Autentisering misslyckades")
+    # Återanvänd sparad session om den fortfarande är giltig
+    session_store = Store(hass, STORAGE_VERSION, _session_storage_key(entry))
+    if stored_session := await session_store.async_load():
+        api.restore_session(stored_session)
+    api.set_session_listener(
+        lambda session: session_store.async_delay_save(lambda: session, SESSION_SAVE_DELAY)
+    )
     
-    # Skapa coordinator
-    coordinator = MELCloudHomeCoordinator(hass, api, entry)
-    await coordinator.async_config_entry_first_refresh()
+    # Skapa coordinator, med pollschemat förskjutet mot andra konton
+    stagger = hub.register_entry(entry.entry_id)
+    coordinator = MELCloudHomeCoordinator(hass, api, entry, hub, stagger)
+    try:
+        if await coordinator.async_restore_snapshot():
+            # Entiteterna skapas direkt från senast sparade snapshot; inloggning
+            # och första riktiga uppdatering sker i bakgrunden
+            _LOGGER.debug("Startar från sparat snapshot")
+            entry.async_create_background_task(
+                hass,
+                _async_refresh_restored(hass, entry, coordinator),
+                f"{DOMAIN} första uppdatering",
+            )
+        else:
+            if not api.has_session:
+                # Automatisk inloggning
+                _LOGGER.debug("Använder automatisk inloggning med användarnamn/lösenord")
+                if not await api.async_login():
+                    _LOGGER.error("Kunde inte logga in med användarnamn och lösenord")
+                    raise ConfigEntryAuthFailed("Inloggning misslyckades")
+            # Första uppdateringen validerar också sessionen; en utgången
+            # sparad session förnyas av API-klienten vid 401
+            await coordinator.async_config_entry_first_refresh()
+    except Exception:
+        # Även vid misslyckad inloggning: stoppa sessionsförnyelsen och stäng sessionen
+        hub.unregister_entry(entry.entry_id)
+        await api.async_close()
+        raise
+    hub.attach_coordinator(entry.entry_id, coordinator)
+    if entry.options.get(CONF_PUSH, False):
+        coordinator.async_start_push()
+    coordinator.async_start_history_import()
     
     # Spara i hass.data
     hass.data.setdefault(DOMAIN, {})
@@ -60,51 +157,31 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # Ladda plattformar
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
-    async def _call_set_state(unit_id: str, state: dict) -> None:
-        await coordinator.api.set_atw_state(unit_id, state)
-        await coordinator.async_request_refresh()
+    async_setup_services(hass)
+    
+    # Nya inställningar eller inloggningsuppgifter gäller från en omladdning
+    entry.async_on_unload(entry.add_update_listener(_async_entry_updated))
+    
+    return True
 
-    async def handle_set_tank_temperature(call):
-        unit_id = call.data.get("unit_id")
-        temperature = call.data.get("temperature")
-        if unit_id is None or temperature is None:
-            _LOGGER.error("set_tank_water_temperature requires unit_id and temperature")
-            return
-        await _call_set_state(unit_id, {"setTankWaterTemperature": int(temperature)})
 
-    async def handle_set_forced_hot_water(call):
-        unit_id = call.data.get("unit_id")
-        enabled = call.data.get("enabled")
-        if unit_id is None or enabled is None:
-            _LOGGER.error("set_forced_hot_water requires unit_id and enabled")
-            return
-        await _call_set_state(unit_id, {"forcedHotWaterMode": bool(enabled)})
+async def _async_refresh_restored(
+    hass: HomeAssistant, entry: ConfigEntry, coordinator: MELCloudHomeCoordinator
+) -> None:
+    """Gör första uppdateringen efter start från snapshot.
 
-    async def handle_set_operation_mode_zone1(call):
-        unit_id = call.data.get("unit_id")
-        mode = call.data.get("mode")
-        if unit_id is None or mode is None:
-            _LOGGER.error("set_operation_mode_zone1 requires unit_id and mode")
-            return
-        await _call_set_state(unit_id, {"operationModeZone1": str(mode)})
+    Setup har redan lyckats, så ConfigEntryAuthFailed kan inte längre
+    starta omautentiseringen; nekas inloggningen startas den här i stället.
+    """
+    await coordinator.async_refresh()
+    if coordinator.api.credentials_rejected:
+        _LOGGER.error("Inloggningen nekades, ange nya inloggningsuppgifter")
+        entry.async_start_reauth(hass)
 
-    hass.services.async_register(
-        DOMAIN,
-        "set_tank_water_temperature",
-        handle_set_tank_temperature,
-    )
-    hass.services.async_register(
-        DOMAIN,
-        "set_forced_hot_water",
-        handle_set_forced_hot_water,
-    )
-    hass.services.async_register(
-        DOMAIN,
-        "set_operation_mode_zone1",
-        handle_set_operation_mode_zone1,
-    )
-    
-    return True
+
+async def _async_entry_updated(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Ladda om entryn när options eller data ändrats."""
+    await hass.config_entries.async_reload(entry.entry_id)
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
@@ -113,49 +190,172 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     
     if unload_ok:
         data = hass.data[DOMAIN].pop(entry.entry_id)
+        await data["coordinator"].async_shutdown()
         await data["api"].async_close()
-        # Services remain available while any entry is loaded; no per-entry unload needed here.
+        
+        hub = async_get_hub(hass)
+        hub.unregister_entry(entry.entry_id)
+        if not hub.entry_count:
+            hass.data.pop(DATA_HUB)
+            async_unload_services(hass)
     
     return unload_ok
 
 
+def async_create_api_session(
+    hass: HomeAssistant, api: MelCloudHomeCookieAPI, auto_cleanup: bool = True
+) -> aiohttp.ClientSession:
+    """Skapa en session med egen cookie-jar ovanpå Home Assistants delade connector.
+
+    Varje konto behöver en egen cookie-jar, men DNS-cache, TLS-sessioner
+    och keep-alive-anslutningar delas med resten av Home Assistant. En
+    vanlig cookie-jar släpper cookies från IP-adresser, så en ``base_url``
+    som pekar mot t.ex. en lokal testserver på 127.0.0.1 kräver en "unsafe".
+    """
+    host = URL(api.base_url).host or ""
+    return aiohttp_client.async_create_clientsession(
+        hass,
+        auto_cleanup=auto_cleanup,
+        cookie_jar=aiohttp.CookieJar(unsafe=is_ip_address(host)),
+        trace_configs=[api.connection_stats.create_trace_config()],
+    )
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Ta bort sparad session och sparat snapshot när en config entry tas bort."""
+    await Store(hass, STORAGE_VERSION, _session_storage_key(entry)).async_remove()
+    await Store(hass, STORAGE_VERSION, _snapshot_storage_key(entry)).async_remove()
+    await Store(hass, STORAGE_VERSION, history_storage_key(entry)).async_remove()
+
+
+def _session_storage_key(entry: ConfigEntry) -> str:
+    """Returnera lagringsnyckeln för en entrys session."""
+    return f"{DOMAIN}.{entry.entry_id}.session"
+
+
+def _snapshot_storage_key(entry: ConfigEntry) -> str:
+    """Returnera lagringsnyckeln för en entrys senaste snapshot."""
+    return f"{DOMAIN}.{entry.entry_id}.snapshot"
+
+
 class MELCloudHomeCoordinator(DataUpdateCoordinator):
     """Coordinator för att hantera datauppdateringar."""
 
-    def __init__(self, hass: HomeAssistant, api: MelCloudHomeCookieAPI, entry: ConfigEntry) -> None:
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        api: MelCloudHomeCookieAPI,
+        entry: ConfigEntry,
+        hub: MELCloudHomeHub,
+        stagger: timedelta = timedelta(0),
+    ) -> None:
         """Initiera coordinatorn."""
+        self._poll = AdaptivePollInterval()
         super().__init__(
             hass,
             _LOGGER,
             name=DOMAIN,
-            update_interval=SCAN_INTERVAL,
+            update_interval=self._poll.current,
         )
         self.api = api
         self.entry = entry
+        self.hub = hub
+        # Läggs på första schemalagda intervallet så att konton inte pollar samtidigt
+        self._stagger = stagger
         self._failed_updates = 0
         self._cookie_invalid_notified = False
+        # Ändrade nycklar per enhet sedan förra uppdateringen; None = skriv allt
+        self._changes: dict[str, frozenset[str]] | None = None
+        self.suppressed_writes = 0
+        self.total_suppressed_writes = 0
+        # Skrivkö per enhet: väntande ändringar, ändringar under PUT och debouncers
+        self._pending_writes: dict[str, dict[str, Any]] = {}
+        self._inflight_writes: dict[str, dict[str, Any]] = {}
+        self._write_debouncers: dict[str, Debouncer] = {}
+        # Högsta prioritet bland väntande ändringar per enhet
+        self._pending_priority: dict[str, int] = {}
+        # Molnets värden (PascalCase) innan väntande ändringar applicerades optimistiskt
+        self._write_baselines: dict[str, dict[str, Any]] = {}
+        # Molnets värden för fälten i pågående PUT:ar, tills molnet bekräftat dem
+        self._inflight_baselines: dict[str, dict[str, Any]] = {}
+        # En PUT i taget per enhet, både från skrivkön och från tjänsteanrop
+        self._write_locks: dict[str, asyncio.Lock] = {}
+        self.write_metrics = WriteMetrics()
+        # Polla enheter var för sig mellan fullständiga hämtningar av user context.
+        # Av som standard: en läsning per enhet för över ungefär lika många bytes
+        # som hela user context, och tar en token per enhet ur kontots rate limit.
+        # Lönar sig bara när entryn hanterar en liten del av enheterna i sin user
+        # context, t.ex. när de flesta hanteras av ett annat konto (se hub).
+        self.unit_polling: bool = entry.options.get(CONF_UNIT_POLLING, False)
+        self._last_full_refresh: float | None = None
+        # Tider per uppdatering; fan-out mäts bara för uppdateringar, inte skrivningar
+        self.refresh_metrics = RefreshMetrics()
+        self._measure_fan_out = False
+        # Oförändrade user context som hoppats över, och vad en full behandling senast kostade
+        self.conditional_metrics = ConditionalFetchMetrics()
+        self._full_refresh_cost = 0.0
+        # Profilering på begäran, se tjänsten set_profiling
+        self.profiler = RefreshProfiler()
+        # Senaste lyckade synk mot molnet (epoch) och enheter som visas inaktuella sedan dess
+        self._synced_at: float | None = None
+        self._stale_since: dict[str, datetime] = {}
+        # Live-uppdateringar; pollningen glesas ut medan kanalen är uppe
+        self.push = PushChannel(
+            api, self.async_apply_push_delta, self._async_push_connection_changed
+        )
+        self._push_task: asyncio.Task[None] | None = None
+        # Historik från molnet till långtidsstatistiken
+        self.history = HistoryImporter(hass, api, entry)
+        # Rullande medelvärde, lutning och tid till börvärdet per enhet och temperatur
+        self.trends = UnitTrends()
+        # Senast kända snapshot, så att entiteter kan skapas direkt vid start
+        self._snapshot_store: Store = Store(hass, STORAGE_VERSION, _snapshot_storage_key(entry))
+        # Topologi-signatur per enhet, och tillkomna/borttagna enheter som ännu inte meddelats
+        self._topology: dict[str, tuple[Any, ...]] | None = None
+        self._topology_changes: tuple[list[str], list[str]] | None = None
+        # Enheter som saknats i user context och hur många hämtningar i rad
+        self._missing_units: dict[str, int] = {}
+
+    async def _async_refresh(self, *args: Any, **kwargs: Any) -> None:
+        """Uppdatera, under cProfile när profileringen tar stickprov."""
+        with self.profiler.profile_refresh():
+            await super()._async_refresh(*args, **kwargs)
 
     async def _async_update_data(self) -> dict:
         """Hämta data från API."""
+        self._changes = None
+        started = time.monotonic()
+        decode_before = self.api.metrics.decode_time
         try:
-            # Om vi har användarnamn/lösenord, försök logga in igen vid behov
-            username = self.entry.data.get(CONF_USERNAME)
-            password = self.entry.data.get(CONF_PASSWORD)
+            if not self.api.has_session:
+                # Ingen session ännu, t.ex. vid start från sparat snapshot
+                await self.api.async_login()
             
-            # Hämta användarkontext
-            user_context = await self.api.get_user_context()
+            units = None
+            # (status, Retry-After) för en misslyckad läsning per enhet
+            poll_failure: tuple[int | None, float | None] | None = None
+            if self._use_unit_polling():
+                units, poll_failure = await self._async_fetch_unit_states()
             
-            # Om vi fick 401 och har credentials, försök logga in igen
-            if not user_context and username and password:
-                _LOGGER.info("Session utgången, försöker logga in igen...")
-                if await self.api.async_login():
-                    user_context = await self.api.get_user_context()
+            user_context = None
+            if units is None and poll_failure is None:
+                # Hämta användarkontext; API-klienten loggar in igen vid 401.
+                # Villkorligt bara när datan vi har bygger på förra hämtningen.
+                user_context = await self.api.get_user_context(
+                    conditional=bool(self.units) and self.last_update_success
+                )
             
-            if not user_context:
+            if units is None and not user_context:
                 self._failed_updates += 1
+                self.refresh_metrics.failures += 1
                 
-                # Efter 3 misslyckade försök, skicka notifikation
-                if self._failed_updates >= 3 and not self._cookie_invalid_notified:
+                # Efter 3 misslyckade försök på grund av sessionen, skicka notifikation
+                auth_failed = self.api.last_status == 401 or not self.api.has_session
+                if (
+                    self._failed_updates >= 3
+                    and auth_failed
+                    and not self._cookie_invalid_notified
+                ):
                     self._cookie_invalid_notified = True
                     
                     message = (
@@ -180,11 +380,17 @@ class MELCloudHomeCoordinator(DataUpdateCoordinator):
                         self._failed_updates
                     )
                 
-                raise UpdateFailed("Kunde inte hämta användarkontext - session ogiltig?")
+                self.update_interval = self._poll.note_error(
+                    *(poll_failure or (self.api.last_status, self.api.last_retry_after))
+                )
+                return self._serve_stale(
+                    UpdateFailed("Kunde inte hämta användarkontext - session ogiltig?")
+                )
             
             # Reset räknare vid lyckad uppdatering
             if self._failed_updates > 0:
                 _LOGGER.info("Anslutning återställd efter %d misslyckade försök", self._failed_updates)
+            if self._cookie_invalid_notified:
                 # Rensa notifikation
                 await self.hass.services.async_call(
                     "persistent_notification",
@@ -194,30 +400,681 @@ class MELCloudHomeCoordinator(DataUpdateCoordinator):
             self._failed_updates = 0
             self._cookie_invalid_notified = False
             
-            # Extrahera enheter från buildings
-            devices = []
-            for building in user_context.get("buildings", []):
-                building_id = building["id"]
-                building_name = building["name"]
-                
-                # Air-to-Water enheter (värmepumpar)
-                for atw in building.get("airToWaterUnits", []):
-                    atw["type"] = "air_to_water"
-                    atw["building_id"] = building_id
-                    atw["building_name"] = building_name
-                    devices.append(atw)
-                
-                # Air-to-Air enheter (AC)
-                for ata in building.get("airToAirUnits", []):
-                    ata["type"] = "air_to_air"
-                    ata["building_id"] = building_id
-                    ata["building_name"] = building_name
-                    devices.append(ata)
+            if user_context is USER_CONTEXT_UNCHANGED:
+                return self._context_unchanged(started)
+            
+            fetched = time.monotonic()
+            if user_context is not None:
+                # Bygg ett indexerat snapshot en gång per uppdatering. Bara de
+                # fält plattformarna läser tas med; rå user context behålls inte.
+                units = self._retain_missing_units(build_unit_index(user_context))
+                self._last_full_refresh = time.monotonic()
+                # Enheter delade med flera konton hanteras bara av ett av dem
+                units = self.hub.claim_units(self.entry.entry_id, units)
+            
+            self._detect_topology_changes(units)
+            
+            # Nya molnvärden blir baslinje för ändringar som väntar i skrivkön
+            for unit_id, baseline in self._write_baselines.items():
+                if unit := units.get(unit_id):
+                    baseline.update((name, unit.settings.get(name)) for name in baseline)
+            
+            # Behåll optimistiska värden för skrivningar som ännu inte nått molnet
+            for pending in (self._inflight_writes, self._pending_writes):
+                for unit_id, state in pending.items():
+                    if unit := units.get(unit_id):
+                        apply_state(unit, state)
+            
+            # Diffa mot förra lyckade snapshotet så att bara berörda entiteter skriver state
+            if self.data and self.last_update_success:
+                self._changes = diff_unit_indexes(self.units, units)
+            self._mark_synced()
+            self._sample_trends(units.values())
             
-            return {
-                "user_context": user_context,
-                "devices": devices,
-            }
+            # Nätverkstid = hämtning minus JSON-avkodning; avkodning inkluderar indexbygget
+            json_decode = self.api.metrics.decode_time - decode_before
+            decode = json_decode + time.monotonic() - fetched
+            self.refresh_metrics.record_fetch(
+                network=fetched - started - json_decode, decode=decode
+            )
+            if user_context is not None:
+                self._full_refresh_cost = decode
+            self._measure_fan_out = True
+            
+            if self._changes is None or self._changes:
+                self._snapshot_store.async_delay_save(self._snapshot_data, SNAPSHOT_SAVE_DELAY)
+            
+            # Polla tätare när enheterna styrs och glesare när de står still.
+            # Uppmätta temperaturer ändras nästan varje gång och räknas inte.
+            self.update_interval = self._with_push(
+                self._poll.note_success(
+                    changed=self._changes is None or has_control_changes(self._changes)
+                )
+            ) + self._stagger
+            self._stagger = timedelta(0)
+            
+            return {"units": units}
+        except UpdateFailed:
+            raise
         except Exception as err:
             self._failed_updates += 1
-            raise UpdateFailed(f"Fel vid uppdatering av data: {err}") from err
+            self.refresh_metrics.failures += 1
+            self.update_interval = self._poll.note_error(
+                self.api.last_status, self.api.last_retry_after
+            )
+            return self._serve_stale(UpdateFailed(f"Fel vid uppdatering av data: {err}"))
+
+    def _context_unchanged(self, started: float) -> dict[str, Any]:
+        """Avsluta en uppdatering där user context inte ändrats.
+
+        Avkodning, indexbygge, diff och snapshot-sparning hoppas över;
+        datan och skrivköns baslinjer gäller som de är.
+        """
+        self._last_full_refresh = time.monotonic()
+        not_modified = self.api.last_status == 304
+        self.conditional_metrics.record(
+            not_modified,
+            self.api.user_context_size if not_modified else 0,
+            self._full_refresh_cost,
+        )
+        self.refresh_metrics.record_fetch(network=time.monotonic() - started, decode=0.0)
+        self._changes = {}
+        self._mark_synced()
+        self._sample_trends(self.units.values())
+        self._measure_fan_out = True
+        self.update_interval = self._with_push(self._poll.note_success(changed=False)) + self._stagger
+        self._stagger = timedelta(0)
+        return self.data
+
+    def _mark_synced(self) -> None:
+        """Registrera en lyckad synk; inaktuella enheter skriver state igen."""
+        self._synced_at = time.time()
+        if not self._stale_since:
+            return
+        _LOGGER.info("Molnet svarar igen, %d enheter är aktuella", len(self._stale_since))
+        recovered, self._stale_since = self._stale_since, {}
+        if self._changes is not None:
+            for unit_id in recovered:
+                self._changes[unit_id] = self._changes.get(unit_id, frozenset()) | {META_KEY}
+
+    def _sample_trends(self, units: Iterable[UnitSnapshot]) -> None:
+        """Lägg till färska temperaturer i trenderna.
+
+        Sensorer vars avrundade trendattribut ändrats skriver state även om
+        temperaturen är oförändrad.
+        """
+        changed = self.trends.sample(units, time.time())
+        if self._changes is None:
+            return
+        for unit_id, keys in changed.items():
+            self._changes[unit_id] = self._changes.get(unit_id, frozenset()) | keys
+
+    def unit_trend(self, unit_id: str, name: str) -> dict[str, Any]:
+        """Returnera trendattribut för en temperatur (O(1))."""
+        if (unit := self.units.get(unit_id)) is None:
+            return {}
+        return self.trends.attributes(unit, name)
+
+    def _serve_stale(self, error: UpdateFailed) -> dict[str, Any]:
+        """Fortsätt visa senast kända snapshot under ett avbrott.
+
+        Entiteterna förblir tillgängliga och får attributet stale_since, så
+        att ett avbrott inte ger en våg av unavailable/available i
+        recordern. Saknas snapshot, eller är det äldre än MAX_STALE_AGE,
+        kastas felet och entiteterna blir otillgängliga.
+        """
+        if (
+            not self.units
+            or self._synced_at is None
+            or time.time() - self._synced_at > MAX_STALE_AGE.total_seconds()
+        ):
+            raise error
+        if not self._stale_since:
+            _LOGGER.warning("%s; visar senast kända värden", error)
+        else:
+            _LOGGER.debug("%s; visar fortfarande senast kända värden", error)
+        since = dt_util.utc_from_timestamp(self._synced_at)
+        newly_stale = [unit_id for unit_id in self.units if unit_id not in self._stale_since]
+        for unit_id in newly_stale:
+            self._stale_since[unit_id] = since
+        self._changes = {unit_id: frozenset((META_KEY,)) for unit_id in newly_stale}
+        return self.data
+
+    def unit_stale_since(self, unit_id: str) -> datetime | None:
+        """Returnera när enhetens data senast var aktuell, om den nu är inaktuell."""
+        return self._stale_since.get(unit_id)
+
+    async def async_restore_snapshot(self) -> bool:
+        """Läs in senast sparade snapshot som coordinatorns data.
+
+        Returns:
+            True om ett användbart snapshot fanns
+        """
+        stored = await self._snapshot_store.async_load()
+        if not stored:
+            return False
+        try:
+            units = restore_unit_index(stored["units"])
+        except (KeyError, TypeError) as err:
+            _LOGGER.debug("Ignorerar ogiltigt sparat snapshot: %s", err)
+            return False
+        if not units:
+            return False
+        self.data = {"units": self.hub.claim_units(self.entry.entry_id, units)}
+        self._synced_at = stored.get("synced_at")
+        self._detect_topology_changes(self.units)
+        return True
+
+    def _retain_missing_units(self, units: dict[str, UnitSnapshot]) -> dict[str, UnitSnapshot]:
+        """Behåll enheter som saknas i user context tills de saknats flera gånger i rad.
+
+        Molnet kan tillfälligt svara utan vissa enheter. En enhet tas därför
+        bort först när den saknats i UNIT_RETIRE_AFTER fullständiga hämtningar
+        i rad, och ett svar där alla kontots enheter saknas räknas inte alls.
+        Till dess visas senast kända värden.
+        """
+        previous = self.units
+        missing = [unit_id for unit_id in previous if unit_id not in units]
+        if not missing:
+            self._missing_units = {}
+            return units
+        if len(missing) == len(previous):
+            _LOGGER.warning(
+                "User context saknar alla %d enheter; behåller dem tills vidare", len(missing)
+            )
+            self.api.invalidate_user_context()
+            return {**units, **previous}
+        retained = {}
+        for unit_id in missing:
+            count = self._missing_units.get(unit_id, 0) + 1
+            if count < UNIT_RETIRE_AFTER:
+                _LOGGER.debug(
+                    "Enhet %s saknas i user context (%d/%d)", unit_id, count, UNIT_RETIRE_AFTER
+                )
+                retained[unit_id] = count
+                units[unit_id] = previous[unit_id]
+        self._missing_units = retained
+        if retained:
+            # Nästa hämtning ska behandlas fullt ut även om user context är oförändrad
+            self.api.invalidate_user_context()
+        return units
+
+    def _detect_topology_changes(self, units: dict[str, UnitSnapshot]) -> None:
+        """Jämför enheternas topologi med förra uppdateringen.
+
+        Nya enheter och enheter med ändrade settings eller capabilities
+        meddelas plattformarna efter att datan uppdaterats.
+        """
+        topology = {unit_id: topology_signature(unit) for unit_id, unit in units.items()}
+        previous, self._topology = self._topology, topology
+        if previous is None or topology == previous:
+            return
+        added = [unit_id for unit_id, sig in topology.items() if previous.get(unit_id) != sig]
+        removed = [unit_id for unit_id in previous if unit_id not in topology]
+        if self._topology_changes is not None:
+            # Föregående ändring har inte meddelats än; slå ihop
+            added = list(dict.fromkeys([*self._topology_changes[0], *added]))
+            removed = list(dict.fromkeys([*self._topology_changes[1], *removed]))
+        self._topology_changes = (
+            [unit_id for unit_id in added if unit_id in topology],
+            [unit_id for unit_id in removed if unit_id not in topology],
+        )
+
+    @callback
+    def _async_apply_topology_changes(self) -> None:
+        """Ta bort enheter som försvunnit och be plattformarna lägga till nya."""
+        added, removed = self._topology_changes
+        self._topology_changes = None
+        _LOGGER.info("Enheter har ändrats: %d nya/ändrade, %d borttagna", len(added), len(removed))
+        device_registry = dr.async_get(self.hass)
+        for unit_id in removed:
+            self.trends.discard(unit_id)
+            # Entiteterna tas bort tillsammans med enheten i registret
+            if device := device_registry.async_get_device(identifiers={(DOMAIN, unit_id)}):
+                device_registry.async_update_device(
+                    device.id, remove_config_entry_id=self.entry.entry_id
+                )
+        async_dispatcher_send(
+            self.hass, SIGNAL_UNITS_CHANGED.format(self.entry.entry_id), added, removed
+        )
+
+    @callback
+    def _snapshot_data(self) -> dict[str, Any]:
+        """Returnera snapshotet i lagringsformat."""
+        return {"units": serialize_unit_index(self.units), "synced_at": self._synced_at}
+
+    @property
+    def poll_interval(self) -> timedelta:
+        """Returnera nuvarande pollintervall."""
+        return self._with_push(self._poll.current)
+
+    def _with_push(self, interval: timedelta) -> timedelta:
+        """Glesa ut pollningen till avstämning när push-kanalen är uppe.
+
+        Snabbpollningen efter en skrivning behålls.
+        """
+        if self.push.connected and not self._poll.fast_polling:
+            return max(interval, PUSH_VERIFY_INTERVAL)
+        return interval
+
+    @callback
+    def async_start_push(self) -> None:
+        """Starta push-kanalen i bakgrunden."""
+        self._push_task = self.entry.async_create_background_task(
+            self.hass, self.push.async_run(), f"{DOMAIN} push {self.entry.entry_id}"
+        )
+
+    @callback
+    def async_start_history_import(self) -> None:
+        """Importera historik nu och sedan varje HISTORY_IMPORT_INTERVAL.
+
+        Kräver recorder; utan den finns ingen långtidsstatistik att fylla på.
+        """
+        if "recorder" not in self.hass.config.components:
+            return
+        self.entry.async_on_unload(
+            async_track_time_interval(
+                self.hass, self._async_import_history, HISTORY_IMPORT_INTERVAL
+            )
+        )
+        self.entry.async_create_background_task(
+            self.hass, self._async_import_history(), f"{DOMAIN} historik {self.entry.entry_id}"
+        )
+
+    async def _async_import_history(self, _now: datetime | None = None) -> None:
+        """Importera ny historik för kontots enheter."""
+        if self.units:
+            await self.history.async_import(self.units.values())
+
+    @callback
+    def _async_push_connection_changed(self, connected: bool) -> None:
+        """Stäm av mot molnet när kanalen kommer upp, och polla som vanligt när den bryts."""
+        if connected:
+            # Deltor kan ha missats innan anslutningen; nästa intervall blir avstämning
+            self.hass.async_create_task(self.async_request_refresh())
+            return
+        self.update_interval = self._poll.current
+        self._schedule_refresh()
+
+    @callback
+    def async_apply_push_delta(self, delta: dict[str, Any]) -> None:
+        """Applicera en enhetsdelta från push-kanalen på snapshotet.
+
+        Skrivningar som väntar eller pågår behåller sina optimistiska
+        värden, och molnets värden blir deras nya baslinje.
+        """
+        unit = self.units.get(delta["unitId"])
+        if unit is None:
+            # Nya enheter plockas upp vid nästa fullständiga uppdatering
+            return
+        changed = apply_unit_delta(unit, delta)
+        if not changed:
+            return
+        if baseline := self._write_baselines.get(unit.id):
+            baseline.update((name, unit.settings.get(name)) for name in baseline)
+        for pending in (self._inflight_writes, self._pending_writes):
+            if state := pending.get(unit.id):
+                changed |= apply_state(unit, state)
+        # Datan avviker nu från senast hämtade user context
+        self.api.invalidate_user_context()
+        self._changes = {unit.id: changed}
+        self._sample_trends((unit,))
+        self.async_update_listeners()
+        self._snapshot_store.async_delay_save(self._snapshot_data, SNAPSHOT_SAVE_DELAY)
+
+    def _use_unit_polling(self) -> bool:
+        """Returnera om denna uppdatering kan läsa enheter var för sig."""
+        return (
+            self.unit_polling
+            and self.api.unit_state_supported is not False
+            and bool(self.units)
+            and self._last_full_refresh is not None
+            and time.monotonic() - self._last_full_refresh
+            < FULL_CONTEXT_INTERVAL.total_seconds()
+        )
+
+    async def _async_fetch_unit_states(
+        self,
+    ) -> tuple[dict[str, UnitSnapshot] | None, tuple[int | None, float | None] | None]:
+        """Läs alla kända enheter var för sig med begränsad samtidighet.
+
+        Returns:
+            (enheter, None) om alla läsningar lyckades. (None, None) om
+            servern saknar läsning per enhet, så att hela user context
+            hämtas i stället. (None, (status, Retry-After)) om en läsning
+            misslyckades av annan anledning, t.ex. 429 eller 5xx; då hämtas
+            inget mer i denna uppdatering och pollningen backar.
+        """
+        semaphore = asyncio.Semaphore(UNIT_POLL_CONCURRENCY)
+        failure: list[tuple[int | None, float | None]] = []
+
+        async def _fetch(unit: UnitSnapshot) -> UnitSnapshot | None:
+            async with semaphore:
+                if failure:
+                    # Resten av läsningarna skulle bara förbruka fler tokens
+                    return None
+                if unit.type == UNIT_TYPE_ATA:
+                    state = await self.api.get_ata_unit(unit.id)
+                else:
+                    state = await self.api.get_atw_unit(unit.id)
+                if not state:
+                    # Status för enhetens förfrågan; avgör hur pollningen backar
+                    failure.append((self.api.last_status, self.api.last_retry_after))
+            return merge_unit_state(unit, state) if state else None
+
+        previous = list(self.units.values())
+        results = await asyncio.gather(*(_fetch(unit) for unit in previous))
+        if not failure:
+            return {unit.id: unit for unit in results}, None
+        if any(status in (404, 405) for status, _ in failure):
+            # Stöds inte, eller så finns enheten inte längre; user context avgör
+            _LOGGER.debug("Läsning per enhet gav %s, hämtar hela user context", failure[0][0])
+            return None, None
+        _LOGGER.debug("Läsning per enhet misslyckades (%s), väntar till nästa poll", failure[0][0])
+        return None, failure[0]
+
+    @property
+    def units(self) -> dict[str, UnitSnapshot]:
+        """Returnera indexet över enheter från senaste uppdateringen."""
+        if not self.data:
+            return {}
+        return self.data.get("units", {})
+
+    def get_unit(self, unit_id: str) -> UnitSnapshot | None:
+        """Hämta en enhet ur snapshotet (O(1))."""
+        return self.units.get(unit_id)
+
+    def get_setting(self, unit_id: str, name: str) -> Any:
+        """Hämta ett konverterat setting-värde för en enhet (O(1))."""
+        unit = self.units.get(unit_id)
+        if unit is None:
+            return None
+        return unit.settings.get(name)
+
+    def unit_changed(self, unit_id: str, keys: tuple[str, ...]) -> bool:
+        """Returnera om någon av nycklarna ändrats för enheten i senaste uppdateringen."""
+        if self._changes is None:
+            return True
+        changed = self._changes.get(unit_id)
+        if not changed:
+            return False
+        if not keys or ALL_KEYS in changed or META_KEY in changed:
+            return True
+        return not changed.isdisjoint(keys)
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Meddela lyssnare och räkna undertryckta state-skrivningar."""
+        self.suppressed_writes = 0
+        started = time.monotonic()
+        if self.profiler.enabled:
+            # Mät varje lyssnare för sig; samma ordning som i DataUpdateCoordinator
+            self.profiler.run_listeners(
+                [update_callback for update_callback, _ in list(self._listeners.values())]
+            )
+        else:
+            super().async_update_listeners()
+        if self._measure_fan_out:
+            self._measure_fan_out = False
+            self.refresh_metrics.record_fan_out(time.monotonic() - started)
+        self._changes = None
+        if self._topology_changes is not None:
+            self._async_apply_topology_changes()
+        self.total_suppressed_writes += self.suppressed_writes
+        if self.suppressed_writes:
+            _LOGGER.debug(
+                "Undertryckte %d oförändrade state-skrivningar (totalt %d)",
+                self.suppressed_writes,
+                self.total_suppressed_writes,
+            )
+
+    async def async_queue_write(
+        self, unit_id: str, state: dict[str, Any], priority: int = PRIORITY_INTERACTIVE
+    ) -> None:
+        """Köa en ändring för en enhet och applicera den optimistiskt.
+
+        Fält som redan har det begärda värdet släpps. Ändringar inom
+        WRITE_DEBOUNCE_SECONDS slås ihop till en PUT, som skickas med den
+        högsta prioriteten bland ändringarna. Ingen omedelbar hämtning av
+        user context görs; nästa schemalagda uppdatering stämmer av
+        snapshotet mot molnet.
+        """
+        unit = self.get_unit(unit_id)
+        if unit is None:
+            _LOGGER.error("Okänd enhet %s, ignorerar ändring %s", unit_id, state)
+            return
+        
+        if not (state := self._drop_unchanged(unit, state)):
+            return
+        self._record_baseline(unit, state)
+        self._pending_writes.setdefault(unit_id, {}).update(state)
+        self._pending_priority[unit_id] = min(
+            priority, self._pending_priority.get(unit_id, priority)
+        )
+        
+        if changed := apply_state(unit, state):
+            self._changes = {unit_id: changed}
+            self.async_update_listeners()
+        
+        if (debouncer := self._write_debouncers.get(unit_id)) is None:
+            debouncer = Debouncer(
+                self.hass,
+                _LOGGER,
+                cooldown=WRITE_DEBOUNCE_SECONDS,
+                immediate=False,
+                function=partial(self._async_flush_writes, unit_id),
+            )
+            self._write_debouncers[unit_id] = debouncer
+        await debouncer.async_call()
+
+    async def async_write_units(
+        self, states: dict[str, dict[str, Any]], priority: int = PRIORITY_AUTOMATION
+    ) -> list[str]:
+        """Skriv ändringar till flera enheter direkt, utan debounce.
+
+        Ändringarna appliceras optimistiskt, PUT:arna skickas parallellt med
+        begränsad samtidighet och följs av en gemensam uppdatering för kontot.
+        Enheter som redan har de begärda värdena hoppas över.
+
+        Returns:
+            Id:n för enheter som inte kunde skrivas
+        """
+        writes: dict[str, dict[str, Any]] = {}
+        changes: dict[str, frozenset[str]] = {}
+        for unit_id, state in states.items():
+            if (unit := self.get_unit(unit_id)) is None:
+                continue
+            state = self._drop_unchanged(unit, state)
+            if not state and unit_id not in self._pending_writes:
+                continue
+            self._record_baseline(unit, state)
+            # Via skrivkön, så att en pågående PUT inte återställer fälten
+            self._pending_writes.setdefault(unit_id, {}).update(state)
+            if changed := apply_state(unit, state):
+                changes[unit_id] = changed
+            writes[unit_id] = state
+        if changes:
+            self._changes = changes
+            self.async_update_listeners()
+        
+        semaphore = asyncio.Semaphore(BULK_WRITE_CONCURRENCY)
+
+        async def _write(unit_id: str) -> bool | None:
+            async with self._write_lock(unit_id), semaphore:
+                # Ändringar som väntar i skrivkön följer med i samma PUT
+                if debouncer := self._write_debouncers.get(unit_id):
+                    debouncer.async_cancel()
+                if not (state := self._pending_writes.pop(unit_id, None)):
+                    # Redan skickade av skrivkön medan vi väntade
+                    return None
+                unit_priority = min(priority, self._pending_priority.pop(unit_id, priority))
+                return await self._async_send_write(unit_id, state, unit_priority)
+
+        results = await asyncio.gather(*(_write(unit_id) for unit_id in writes))
+        failed = [unit_id for unit_id, result in zip(writes, results) if result is False]
+        if any(result is not None for result in results):
+            await self._async_after_write(success=not failed)
+        return failed
+
+    async def _async_flush_writes(self, unit_id: str) -> None:
+        """Skicka ihopslagna ändringar för en enhet i en PUT.
+
+        Ändringar som köas medan PUT:en pågår skickas direkt efteråt, eftersom
+        debouncern släpper anrop som kommer under en pågående körning.
+        """
+        while True:
+            async with self._write_lock(unit_id):
+                if not (state := self._pending_writes.pop(unit_id, None)):
+                    break
+                priority = self._pending_priority.pop(unit_id, PRIORITY_INTERACTIVE)
+                result = await self._async_send_write(unit_id, state, priority)
+            if result is not None:
+                await self._async_after_write(result)
+        self._pending_priority.pop(unit_id, None)
+
+    def _write_lock(self, unit_id: str) -> asyncio.Lock:
+        """Returnera enhetens lås, som håller en PUT i taget per enhet."""
+        if (lock := self._write_locks.get(unit_id)) is None:
+            lock = self._write_locks[unit_id] = asyncio.Lock()
+        return lock
+
+    def _drop_unchanged(self, unit: UnitSnapshot, state: dict[str, Any]) -> dict[str, Any]:
+        """Släpp fält som redan har det begärda värdet i snapshotet.
+
+        Fält som väntar i skrivkön eller ingår i en pågående PUT behålls,
+        eftersom snapshotet då visar det optimistiska värdet och inte molnets.
+        Misslyckas PUT:en får ändringen inte ha försvunnit.
+        """
+        pending = self._pending_writes.get(unit.id, {})
+        inflight = self._inflight_writes.get(unit.id, {})
+        kept = {
+            field: value
+            for field, value in state.items()
+            if field in pending
+            or field in inflight
+            or unit.settings.get(setting_name(field))
+            != coerce_setting_value(setting_name(field), value)
+        }
+        self.write_metrics.requested_fields += len(state)
+        if dropped := len(state) - len(kept):
+            self.write_metrics.dropped_fields += dropped
+            if not kept:
+                self.write_metrics.skipped_writes += 1
+            _LOGGER.debug(
+                "Släppte %d oförändrade fält för enhet %s (kvar: %s)", dropped, unit.id, kept
+            )
+        return kept
+
+    def _record_baseline(self, unit: UnitSnapshot, state: dict[str, Any]) -> None:
+        """Spara molnets värden för fälten innan de skrivs över optimistiskt.
+
+        För fält i en pågående PUT visar snapshotet det optimistiska värdet,
+        så där används den PUT:ens baslinje.
+        """
+        baseline = self._write_baselines.setdefault(unit.id, {})
+        inflight = self._inflight_baselines.get(unit.id, {})
+        for field in state:
+            name = setting_name(field)
+            baseline.setdefault(name, inflight.get(name, unit.settings.get(name)))
+
+    async def _async_send_write(
+        self, unit_id: str, state: dict[str, Any], priority: int
+    ) -> bool | None:
+        """Skicka en PUT med de fält som skiljer sig från baslinjen.
+
+        Returns:
+            True om PUT:en lyckades, False om den misslyckades och None om
+            inget behövde skickas
+        """
+        baseline = self._write_baselines.pop(unit_id, {})
+        sent = {
+            field: value
+            for field, value in state.items()
+            if baseline.get(setting_name(field), _NO_BASELINE)
+            != coerce_setting_value(setting_name(field), value)
+        }
+        if not sent:
+            # Ändringarna tog ut varandra, t.ex. av och på igen inom debounce-fönstret
+            self.write_metrics.dropped_fields += len(state)
+            self.write_metrics.skipped_writes += 1
+            _LOGGER.debug("Hoppar över skrivning till enhet %s, inget har ändrats", unit_id)
+            return None
+        self.write_metrics.dropped_fields += len(state) - len(sent)
+        
+        unit = self.get_unit(unit_id)
+        if unit is not None and unit.type == UNIT_TYPE_ATA:
+            set_state = self.api.set_ata_state
+        else:
+            set_state = self.api.set_atw_state
+        
+        self._inflight_writes[unit_id] = sent
+        self._inflight_baselines[unit_id] = baseline
+        try:
+            result = await set_state(unit_id, sent, priority)
+        finally:
+            self._inflight_writes.pop(unit_id, None)
+            self._inflight_baselines.pop(unit_id, None)
+        
+        if result is None:
+            _LOGGER.warning("Kunde inte skriva %s till enhet %s", sent, unit_id)
+            self.write_metrics.failed_writes += 1
+            self._revert_write(unit_id, sent, baseline)
+            return False
+        self.write_metrics.sent_writes += 1
+        # Molnet har nu de skickade värdena; ändringar som köats under PUT:en
+        # med samma värden blir då no-ops när de skickas
+        if queued := self._write_baselines.get(unit_id):
+            for field, value in sent.items():
+                if (name := setting_name(field)) in queued:
+                    queued[name] = coerce_setting_value(name, value)
+        return True
+
+    @callback
+    def _revert_write(
+        self, unit_id: str, state: dict[str, Any], baseline: dict[str, Any]
+    ) -> None:
+        """Återställ optimistiska värden efter en misslyckad skrivning.
+
+        Fält som fått en ny ändring i skrivkön under tiden lämnas orörda.
+        """
+        if (unit := self.get_unit(unit_id)) is None:
+            return
+        pending = self._pending_writes.get(unit_id, {})
+        changed = set()
+        for field in state:
+            name = setting_name(field)
+            if field in pending or name not in baseline:
+                continue
+            if (value := baseline[name]) is None:
+                unit.settings.pop(name, None)
+            else:
+                unit.settings[name] = value
+            changed.add(name)
+        if changed:
+            self.write_metrics.reverted_fields += len(changed)
+            self._changes = {unit_id: frozenset(changed)}
+            self.async_update_listeners()
+
+    async def _async_after_write(self, success: bool) -> None:
+        """Planera uppdateringen som stämmer av skrivningar mot molnet."""
+        if not success:
+            # Det optimistiska värdet stämmer inte längre, stäm av direkt
+            await self.async_request_refresh()
+            return
+        
+        # Polla snabbt en stund så att molnets bekräftelse syns tidigt
+        self.update_interval = self._poll.note_write()
+        self._schedule_refresh()
+
+    async def async_shutdown(self) -> None:
+        """Stäng push-kanalen, skicka väntande skrivningar och stäng coordinatorn."""
+        if self._push_task is not None:
+            self._push_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._push_task
+            self._push_task = None
+        for debouncer in self._write_debouncers.values():
+            debouncer.async_cancel()
+        for unit_id in list(self._pending_writes):
+            await self._async_flush_writes(unit_id)
+        await super().async_shutdown()
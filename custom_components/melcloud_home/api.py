@@ -1,40 +1,252 @@
 """Cookie-baserad MELCloud Home API-klient."""
 from __future__ import annotations
 
+import asyncio
+import codecs
+import contextlib
+import hashlib
+import json
 import logging
-from typing import Any
+import time
+from collections.abc import Callable, Mapping
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from html.parser import HTMLParser
+from http.cookies import SimpleCookie
+from typing import Any, Final
 
 import aiohttp
-from bs4 import BeautifulSoup
+from yarl import URL
+
+from .breaker import CircuitBreaker
+from .cassette import CassetteRecorder
+from .metrics import (
+    ENDPOINT_LOGIN_PAGE,
+    ENDPOINT_LOGIN_SUBMIT,
+    ENDPOINT_TELEMETRY,
+    ENDPOINT_UNIT_GET,
+    ENDPOINT_UNIT_PUT,
+    ENDPOINT_USER_CONTEXT,
+    RequestMetrics,
+)
+from .scheduler import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_NAMES,
+    PRIORITY_POLL,
+    REQUEST_BURST,
+    REQUEST_RATE,
+    PrioritySemaphore,
+    RequestScheduler,
+)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson följer med Home Assistant
+    orjson = None
 
 _LOGGER = logging.getLogger(__name__)
 
 BASE_URL = "https://melcloudhome.com"
-LOGIN_START_URL = f"{BASE_URL}/bff/login?returnUrl=/dashboard"
+LOGIN_START_PATH = "/bff/login?returnUrl=/dashboard"
+# Websocket för live-uppdateringar; finns den inte pollar integrationen som vanligt
+PUSH_PATH = "/ws/unit-updates"
+PUSH_CONNECT_TIMEOUT = 10
+PUSH_HEARTBEAT = 30
+# Historik per enhet: energi per timme och uppmätta värden, som i appens grafer
+TELEMETRY_ENERGY = "energy"
+TELEMETRY_ACTUAL = "actual"
+# Tidsformat för from/to och i svarens tidsstämplar (UTC)
+TELEMETRY_TIME_FORMAT = "%Y-%m-%d %H:%M"
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+# Skickas med varje förfrågan eftersom Home Assistants delade session
+# inte tillåter egna standardheaders
+BROWSER_HEADERS = {
+    "User-Agent": USER_AGENT,
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "sv-SE,sv;q=0.9,en-US;q=0.8,en;q=0.7",
+}
+
+# Cookie-attribut som sparas mellan omstarter
+_COOKIE_ATTRIBUTES = ("domain", "path", "expires", "max-age", "secure", "httponly")
+
+# Sessionen förnyas i bakgrunden så här långt före utgång (högst halva
+# återstående tiden), och ett misslyckat försök görs om efter en stund
+SESSION_REFRESH_MARGIN = 15 * 60
+SESSION_REFRESH_RETRY = 5 * 60
+
+# Returneras av get_user_context(conditional=True) när innehållet är oförändrat
+USER_CONTEXT_UNCHANGED: Final = object()
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    """Tolka en Retry-After-header angiven i sekunder."""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def _json_loads(body: bytes) -> Any:
+    """Avkoda JSON, med orjson om det finns."""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+class _CsrfFound(Exception):
+    """Avbryter parsningen när CSRF-token hittats."""
+
+
+class _CsrfExtractor(HTMLParser):
+    """Strömmande parser som bara letar efter <input name="_csrf">.
+
+    Bygger inget DOM och slutar så fort token hittats.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.token: str | None = None
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag != "input":
+            return
+        attributes = dict(attrs)
+        if attributes.get("name") == "_csrf":
+            self.token = attributes.get("value") or ""
+            raise _CsrfFound
+
+    handle_startendtag = handle_starttag
+
+
+async def _async_extract_csrf(response: aiohttp.ClientResponse) -> str | None:
+    """Läs inloggningssidan i bitar och returnera CSRF-token så fort den dyker upp."""
+    parser = _CsrfExtractor()
+    decoder = codecs.getincrementaldecoder(response.charset or "utf-8")(errors="replace")
+    try:
+        async for chunk in response.content.iter_chunked(8192):
+            parser.feed(decoder.decode(chunk))
+        parser.feed(decoder.decode(b"", final=True))
+    except _CsrfFound:
+        pass
+    return parser.token
+
+
+@dataclass
+class ConnectionStats:
+    """Räknare för anslutningar, fyllda via aiohttp:s trace-signaler."""
+
+    connections_created: int = 0
+    connections_reused: int = 0
+    dns_cache_hits: int = 0
+    dns_cache_misses: int = 0
+
+    def create_trace_config(self) -> aiohttp.TraceConfig:
+        """Skapa en TraceConfig som uppdaterar räknarna."""
+        trace_config = aiohttp.TraceConfig()
+
+        def _counter(attr: str):
+            async def _increment(*_: Any) -> None:
+                setattr(self, attr, getattr(self, attr) + 1)
+            return _increment
+
+        trace_config.on_connection_create_end.append(_counter("connections_created"))
+        trace_config.on_connection_reuseconn.append(_counter("connections_reused"))
+        trace_config.on_dns_cache_hit.append(_counter("dns_cache_hits"))
+        trace_config.on_dns_cache_miss.append(_counter("dns_cache_misses"))
+        return trace_config
+
+    def as_dict(self) -> dict[str, int]:
+        """Returnera räknarna som en dict."""
+        return asdict(self)
 
 
 class MelCloudHomeCookieAPI:
     """Cookie-baserad API-klient för MELCloud Home."""
 
-    def __init__(self) -> None:
-        """Initiera API-klienten."""
+    def __init__(
+        self,
+        request_semaphore: PrioritySemaphore | None = None,
+        base_url: str = BASE_URL,
+        rate_limit: float | None = REQUEST_RATE,
+        burst: int = REQUEST_BURST,
+    ) -> None:
+        """Initiera API-klienten.
+        
+        Args:
+            request_semaphore: Valfri semafor som begränsar samtidiga
+                förfrågningar, delad mellan flera konton
+            base_url: Serverns adress, kan pekas om mot en lokal testserver
+            rate_limit: Förfrågningar per sekund för kontot, None för obegränsat
+            burst: Största antal förfrågningar i en skur
+        """
+        self._base_url = base_url
         self._session: aiohttp.ClientSession | None = None
+        self._request_semaphore = request_semaphore
+        self.scheduler = RequestScheduler(rate_limit, burst)
+        self.breaker = CircuitBreaker()
+        # Inspelning av trafiken till en kassett, se tjänsten set_recording
+        self.recorder: CassetteRecorder | None = None
+        self.connection_stats = ConnectionStats()
+        self.metrics = RequestMetrics()
         self._cookie: str | None = None
         self._username: str | None = None
         self._password: str | None = None
+        self._session_listener: Callable[[dict[str, Any]], None] | None = None
+        # True när senaste inloggningen nekades av Cognito; nya försök hjälper inte
+        self.credentials_rejected = False
+        # Single-flight-inloggning: ett lås och en räknare för lyckade inloggningar
+        self._login_lock = asyncio.Lock()
+        self._login_generation = 0
+        # När sessionens cookies går ut (epoch-sekunder) och planerad förnyelse
+        self._session_expires_at: float | None = None
+        self._refresh_handle: asyncio.TimerHandle | None = None
+        self._refresh_task: asyncio.Task[None] | None = None
+        # None tills vi vet om servern stöder GET /api/<typ>unit/<id>
+        self.unit_state_supported: bool | None = None
+        # None tills vi vet om servern har push-kanalen
+        self.push_supported: bool | None = None
+        # None tills vi vet om servern har historik per enhet
+        self.telemetry_supported: bool | None = None
+        # Status, Retry-After och headers från senaste förfrågan, för backoff i coordinatorn
+        self.last_status: int | None = None
+        self.last_retry_after: float | None = None
+        self.last_headers: Mapping[str, str] = {}
+        # Validatorer och hash för senaste user context, för villkorliga hämtningar
+        self._context_etag: str | None = None
+        self._context_last_modified: str | None = None
+        self._context_digest: bytes | None = None
+        # Storlek i byte på senast hämtade user context
+        self.user_context_size = 0
 
-    async def async_setup(self) -> None:
-        """Sätt upp aiohttp-sessionen."""
+    async def async_setup(self, session: aiohttp.ClientSession | None = None) -> None:
+        """Sätt upp aiohttp-sessionen.
+        
+        Args:
+            session: Session att använda, helst skapad med en egen cookie-jar
+                ovanpå Home Assistants delade connector. Utan session skapas
+                en fristående session med egen connector.
+        """
         if self._session is None:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Accept-Language': 'sv-SE,sv;q=0.9,en-US;q=0.8,en;q=0.7',
-            }
-            self._session = aiohttp.ClientSession(headers=headers)
+            self._session = session or aiohttp.ClientSession(
+                headers=BROWSER_HEADERS,
+                trace_configs=[self.connection_stats.create_trace_config()],
+            )
 
     async def async_close(self) -> None:
-        """Stäng sessionen."""
+        """Stäng sessionen (en delad connector lämnas öppen)."""
+        if self._refresh_handle is not None:
+            self._refresh_handle.cancel()
+            self._refresh_handle = None
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._refresh_task
+            self._refresh_task = None
         if self._session:
             await self._session.close()
             self._session = None
@@ -43,6 +255,120 @@ class MelCloudHomeCookieAPI:
         """Sätt cookie för autentisering."""
         self._cookie = cookie
 
+    @property
+    def base_url(self) -> str:
+        """Returnera serverns adress."""
+        return self._base_url
+
+    @property
+    def has_session(self) -> bool:
+        """Returnera om det finns en (möjligen utgången) session."""
+        return self._cookie is not None
+
+    def set_session_listener(self, listener: Callable[[dict[str, Any]], None] | None) -> None:
+        """Registrera en callback som får den exporterade sessionen efter inloggning."""
+        self._session_listener = listener
+
+    def export_session(self) -> dict[str, Any]:
+        """Exportera cookie-jarens innehåll så att sessionen kan sparas."""
+        cookies = []
+        if self._session:
+            for morsel in self._session.cookie_jar:
+                cookie = {"key": morsel.key, "value": morsel.value}
+                cookie.update(
+                    (attr, morsel[attr]) for attr in _COOKIE_ATTRIBUTES if morsel[attr]
+                )
+                cookies.append(cookie)
+        return {"cookies": cookies, "expires_at": self._session_expires_at}
+
+    def restore_session(self, data: dict[str, Any]) -> None:
+        """Återställ en sparad session till cookie-jaren."""
+        if not self._session:
+            return
+        expires_at = data.get("expires_at")
+        if expires_at is not None and expires_at <= time.time():
+            _LOGGER.debug("Sparad session har gått ut, loggar in på nytt")
+            return
+        simple_cookie: SimpleCookie = SimpleCookie()
+        for cookie in data.get("cookies", []):
+            key = cookie["key"]
+            simple_cookie[key] = cookie["value"]
+            for attr in _COOKIE_ATTRIBUTES:
+                if attr in cookie:
+                    simple_cookie[key][attr] = cookie[attr]
+        self._session.cookie_jar.update_cookies(simple_cookie, URL(self._base_url))
+        self._update_cookie_header()
+        self._session_expires_at = expires_at
+        self._schedule_session_refresh()
+        _LOGGER.debug("Återställde %d sparade cookies", len(simple_cookie))
+
+    def _update_cookie_header(self) -> None:
+        """Bygg Cookie-headern från sessionens cookie-jar."""
+        cookies = self._session.cookie_jar.filter_cookies(URL(self._base_url))
+        self._cookie = "; ".join(f"{cookie.key}={cookie.value}" for cookie in cookies.values()) or None
+
+    def _cookie_expiry(self) -> float | None:
+        """Returnera när första cookien för servern går ut, i epoch-sekunder.
+
+        Anropas direkt efter inloggning, så max-age räknas från nu.
+        filter_cookies tappar cookie-attributen, så jaren gås igenom direkt.
+        """
+        host = URL(self._base_url).host or ""
+        now = time.time()
+        expiries = []
+        for morsel in self._session.cookie_jar:
+            domain = morsel["domain"].lstrip(".")
+            if domain and host != domain and not host.endswith(f".{domain}"):
+                continue
+            with contextlib.suppress(ValueError):
+                if morsel["max-age"]:
+                    expiries.append(now + int(morsel["max-age"]))
+                elif morsel["expires"]:
+                    expiries.append(parsedate_to_datetime(morsel["expires"]).timestamp())
+        return min(expiries, default=None)
+
+    def _schedule_session_refresh(self, retry: bool = False) -> None:
+        """Planera förnyelse av sessionen innan den går ut.
+
+        Utan känd utgångstid, eller när sessionen redan gått ut, planeras
+        inget; då får nästa förfrågan logga in vid 401 som tidigare.
+        """
+        if self._refresh_handle is not None:
+            self._refresh_handle.cancel()
+            self._refresh_handle = None
+        if self._session_expires_at is None:
+            return
+        remaining = self._session_expires_at - time.time()
+        if remaining <= 0:
+            return
+        if retry:
+            delay = min(SESSION_REFRESH_RETRY, remaining / 2)
+        else:
+            delay = remaining - min(SESSION_REFRESH_MARGIN, remaining / 2)
+        self._refresh_handle = asyncio.get_running_loop().call_later(
+            delay, self._start_session_refresh
+        )
+
+    def _start_session_refresh(self) -> None:
+        """Starta förnyelsen som en bakgrundsuppgift."""
+        self._refresh_handle = None
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.get_running_loop().create_task(
+                self._async_refresh_session()
+            )
+
+    async def _async_refresh_session(self) -> None:
+        """Logga in på nytt innan sessionen går ut.
+
+        Förfrågningar som pågår under tiden använder den gamla cookien
+        tills den nya är på plats, så ingen av dem väntar på inloggningen.
+        """
+        _LOGGER.debug("Förnyar sessionen innan den går ut")
+        if await self._async_reauthenticate(self._login_generation, proactive=True):
+            return
+        _LOGGER.warning("Kunde inte förnya sessionen, försöker igen senare")
+        self._schedule_session_refresh(retry=True)
+
     def set_credentials(self, username: str, password: str) -> None:
         """Sätt användarnamn och lösenord för automatisk inloggning."""
         self._username = username
@@ -51,40 +377,81 @@ class MelCloudHomeCookieAPI:
     async def async_login(self) -> bool:
         """Logga in med användarnamn och lösenord.
         
+        Samtidiga anrop väntar på samma inloggning i stället för att starta egna.
+        
         Returns:
             True om inloggningen lyckades, annars False
         """
+        return await self._async_reauthenticate(self._login_generation)
+
+    async def _async_reauthenticate(
+        self, generation: int, relogin: bool = False, proactive: bool = False
+    ) -> bool:
+        """Logga in igen om ingen annan redan gjort det sedan `generation`.
+        
+        `relogin` anger att inloggningen utlöstes av en utgången session,
+        `proactive` att den är en förnyelse före utgång. Vid förnyelse
+        rensas serverns cookies ur jaren så att en ny session skapas; den
+        gamla ligger kvar i Cookie-headern tills inloggningen lyckats.
+        """
+        async with self._login_lock:
+            if generation != self._login_generation:
+                # En annan anropare loggade in medan vi väntade på låset
+                return self._cookie is not None
+            if relogin:
+                self.metrics.relogins += 1
+            if proactive and self._session:
+                self._session.cookie_jar.clear_domain(URL(self._base_url).host or "")
+            success = await self._async_do_login()
+            self.metrics.record_login(success)
+            if success and proactive:
+                self.metrics.proactive_logins += 1
+            return success
+
+    async def _async_do_login(self) -> bool:
+        """Genomför inloggningsflödet mot Cognito (anropas under inloggningslåset)."""
         if not self._session or not self._username or not self._password:
             _LOGGER.error("Session, användarnamn eller lösenord saknas")
             return False
+        if self.breaker.is_open:
+            _LOGGER.debug("Servern svarar inte, hoppar över inloggning")
+            return False
 
         try:
             # 1. Hämta inloggningssidan för att få CSRF-token
             _LOGGER.debug("Hämtar inloggningssida...")
-            async with self._session.get(LOGIN_START_URL) as resp:
+            started = time.monotonic()
+            async with self._session.get(
+                f"{self._base_url}{LOGIN_START_PATH}", headers=BROWSER_HEADERS
+            ) as resp:
+                elapsed = time.monotonic() - started
+                self.metrics.record(ENDPOINT_LOGIN_PAGE, resp.status, elapsed)
+                if self.recorder is not None:
+                    self.recorder.record(
+                        ENDPOINT_LOGIN_PAGE, "GET", LOGIN_START_PATH, resp.status, elapsed,
+                        size=resp.content_length,
+                    )
                 if resp.status != 200:
                     _LOGGER.error("Kunde inte hämta inloggningssida: %s", resp.status)
                     return False
                 
-                text = await resp.text()
                 final_url = str(resp.url)
                 
                 if "amazoncognito.com" not in final_url:
                     _LOGGER.warning("Landade inte på Amazon Cognito: %s", final_url)
                     if "dashboard" in final_url:
                         _LOGGER.info("Redan inloggad")
+                        self._on_login()
                         return True
                     return False
 
-            # 2. Extrahera CSRF-token
-            soup = BeautifulSoup(text, 'html.parser')
-            csrf_input = soup.find('input', {'name': '_csrf'})
+                # 2. Extrahera CSRF-token utan att läsa in hela sidan
+                csrf_token = await _async_extract_csrf(resp)
             
-            if not csrf_input:
+            if csrf_token is None:
                 _LOGGER.error("Kunde inte hitta CSRF-token")
                 return False
             
-            csrf_token = csrf_input.get('value')
             _LOGGER.debug("Hittade CSRF-token")
 
             # 3. Skicka inloggningsuppgifter
@@ -95,131 +462,397 @@ class MelCloudHomeCookieAPI:
             }
             
             post_headers = {
+                **BROWSER_HEADERS,
                 'Content-Type': 'application/x-www-form-urlencoded',
             }
             
+            started = time.monotonic()
             async with self._session.post(final_url, data=payload, headers=post_headers) as post_resp:
+                elapsed = time.monotonic() - started
+                self.metrics.record(ENDPOINT_LOGIN_SUBMIT, post_resp.status, elapsed)
+                if self.recorder is not None:
+                    # Bara status och tid; formuläret innehåller inloggningsuppgifterna
+                    self.recorder.record(
+                        ENDPOINT_LOGIN_SUBMIT, "POST", URL(final_url).path, post_resp.status,
+                        elapsed,
+                    )
                 final_post_url = str(post_resp.url)
                 
                 if "dashboard" in final_post_url or post_resp.status == 200:
                     _LOGGER.info("Inloggning lyckades")
-                    
-                    # Extrahera cookies från sessionen
-                    cookies = self._session.cookie_jar.filter_cookies(BASE_URL)
-                    cookie_parts = []
-                    for cookie in cookies.values():
-                        cookie_parts.append(f"{cookie.key}={cookie.value}")
-                    
-                    self._cookie = "; ".join(cookie_parts)
-                    _LOGGER.debug("Sparade %d cookies", len(cookies))
+                    self._on_login()
                     return True
                 else:
                     _LOGGER.error("Inloggning misslyckades, landade på: %s", final_post_url)
+                    self.credentials_rejected = True
                     return False
 
         except Exception as err:
             _LOGGER.exception("Fel vid inloggning: %s", err)
             return False
 
-    async def get_user_context(self) -> dict[str, Any] | None:
-        """Hämta användarkontext."""
-        if not self._session or not self._cookie:
-            return None
+    def _on_login(self) -> None:
+        """Ta hand om sessionen efter en lyckad inloggning."""
+        self.credentials_rejected = False
+        # Extrahera cookies från sessionen
+        self._update_cookie_header()
+        self._login_generation += 1
+        self._session_expires_at = self._cookie_expiry()
+        self._schedule_session_refresh()
+        _LOGGER.debug("Sparade sessionscookies")
+        if self._session_listener:
+            self._session_listener(self.export_session())
 
-        headers = {
-            "x-csrf": "1",
-            "Cookie": self._cookie,
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    async def _async_request(
+        self,
+        method: str,
+        path: str,
+        endpoint: str,
+        priority: int = PRIORITY_POLL,
+        headers: Mapping[str, str] | None = None,
+        **kwargs: Any,
+    ) -> tuple[int, bytes] | None:
+        """Skicka en autentiserad förfrågan och returnera (status, body).
+        
+        Förfrågan avvisas direkt (None) när brytaren är öppen. Annars köas
+        den först i kontots schemaläggare och sedan för en global plats,
+        båda i prioritetsordning. Vid 401 loggar klienten in
+        igen (en gemensam inloggning för alla samtidiga anropare) och gör
+        om förfrågan en gång. Varje försök registreras i mätvärdena under
+        `endpoint`. Svarets headers finns i `last_headers`.
+        """
+        self.last_status = None
+        self.last_retry_after = None
+        self.last_headers = {}
+        for attempt in range(2):
+            if not self._session or not self._cookie:
+                return None
+            if not self.breaker.allow():
+                return None
+            generation = self._login_generation
+            request_headers = {
+                "x-csrf": "1",
+                "Cookie": self._cookie,
+                "User-Agent": USER_AGENT,
+                **(headers or {}),
+            }
+            queued = time.monotonic()
+            await self.scheduler.acquire(priority)
+            async with self._limit_concurrency(priority):
+                started = time.monotonic()
+                self.metrics.record_wait(PRIORITY_NAMES[priority], started - queued)
+                try:
+                    async with self._session.request(
+                        method,
+                        f"{self._base_url}{path}",
+                        headers=request_headers,
+                        timeout=aiohttp.ClientTimeout(total=10),
+                        **kwargs,
+                    ) as response:
+                        status = response.status
+                        body = await response.read()
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    self.metrics.record(endpoint, None, time.monotonic() - started)
+                    self.breaker.record_failure()
+                    raise
+                elapsed = time.monotonic() - started
+                self.metrics.record(endpoint, status, elapsed, len(body))
+                if self.recorder is not None:
+                    self.recorder.record(
+                        endpoint, method, path, status, elapsed,
+                        response.headers, kwargs.get("json"), body,
+                    )
+                if status >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                self.last_status = status
+                self.last_retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+                self.last_headers = response.headers
+            
+            if status != 401 or attempt or not self._username or not self._password:
+                return status, body
+            
+            _LOGGER.info("Session utgången, loggar in igen...")
+            if not await self._async_reauthenticate(generation, relogin=True):
+                return status, body
+        return None
+
+    async def async_connect_push(self) -> aiohttp.ClientWebSocketResponse | None:
+        """Öppna push-kanalen.
+        
+        Vid 401 loggar klienten in igen och försöker en gång till. Alla andra
+        svar än 101 på handskakningen (404, en SPA-sida med 200, 400, 403,
+        5xx) tolkas som att servern saknar kanalen, så att klienten inte
+        försöker ansluta till en sökväg som inte finns i all evighet.
+        
+        Returns:
+            Websocketen, eller None om ingen session finns eller servern
+            saknar kanalen (då sätts push_supported till False)
+        """
+        for attempt in range(2):
+            if not self._session or not self._cookie:
+                return None
+            generation = self._login_generation
+            try:
+                async with asyncio.timeout(PUSH_CONNECT_TIMEOUT):
+                    ws = await self._session.ws_connect(
+                        f"{self._base_url}{PUSH_PATH}",
+                        headers={"Cookie": self._cookie, "User-Agent": USER_AGENT},
+                        heartbeat=PUSH_HEARTBEAT,
+                    )
+            except aiohttp.WSServerHandshakeError as err:
+                if err.status != 401:
+                    _LOGGER.debug("Push-kanalen svarade %s på handskakningen", err.status)
+                    self.push_supported = False
+                    return None
+                if attempt or not await self._async_reauthenticate(generation, relogin=True):
+                    raise
+                continue
+            self.push_supported = True
+            return ws
+        return None
+
+    def _decode(self, body: bytes) -> Any:
+        """Avkoda ett JSON-svar och mät tiden det tar."""
+        started = time.monotonic()
+        try:
+            return _json_loads(body)
+        finally:
+            self.metrics.decode_time += time.monotonic() - started
+
+    def diagnostics(self) -> dict[str, Any]:
+        """Returnera klientens tillstånd och mätvärden, utan hemligheter."""
+        return {
+            "base_url": self._base_url,
+            # Bara namnen; cookie-värden är sessionshemligheter
+            "cookies": sorted(
+                {morsel.key for morsel in self._session.cookie_jar} if self._session else ()
+            ),
+            "login_generation": self._login_generation,
+            "session_expires_in": (
+                round(self._session_expires_at - time.time())
+                if self._session_expires_at is not None
+                else None
+            ),
+            "unit_state_supported": self.unit_state_supported,
+            "push_supported": self.push_supported,
+            "telemetry_supported": self.telemetry_supported,
+            "recording": len(self.recorder.interactions) if self.recorder else None,
+            "last_status": self.last_status,
+            "last_retry_after": self.last_retry_after,
+            "requests": self.metrics.as_dict(),
+            "scheduler": self.scheduler.as_dict(),
+            "circuit": self.breaker.as_dict(),
         }
 
+    def _limit_concurrency(self, priority: int) -> contextlib.AbstractAsyncContextManager:
+        """Returnera en plats i den delade semaforen, eller en tom context manager."""
+        if self._request_semaphore is None:
+            return contextlib.nullcontext()
+        return self._request_semaphore.hold(priority)
+
+    def invalidate_user_context(self) -> None:
+        """Glöm validatorer och hash så att nästa user context behandlas fullt ut.
+
+        Anropas när coordinatorns data kan ha avvikit från senast hämtade
+        user context, t.ex. efter en skrivning eller läsning per enhet.
+        """
+        self._context_etag = None
+        self._context_last_modified = None
+        self._context_digest = None
+
+    async def get_user_context(
+        self, conditional: bool = False
+    ) -> dict[str, Any] | object | None:
+        """Hämta användarkontext.
+        
+        Args:
+            conditional: Skicka If-None-Match/If-Modified-Since om servern
+                gett validatorer, och jämför annars bodyns hash med förra
+                hämtningen. Oförändrat innehåll avkodas inte utan ger
+                USER_CONTEXT_UNCHANGED.
+        """
+        headers = {}
+        if conditional:
+            if self._context_etag:
+                headers["If-None-Match"] = self._context_etag
+            if self._context_last_modified:
+                headers["If-Modified-Since"] = self._context_last_modified
         try:
-            async with self._session.get(
-                f"{BASE_URL}/api/user/context", headers=headers, timeout=aiohttp.ClientTimeout(total=10)
-            ) as response:
-                if response.status == 200:
-                    return await response.json()
-                elif response.status == 401:
-                    _LOGGER.error("Cookie ogiltig - behöver ny inloggning")
-                    return None
-                else:
-                    _LOGGER.error("API-fel: %s", response.status)
-                    return None
+            result = await self._async_request(
+                "GET", "/api/user/context", ENDPOINT_USER_CONTEXT, headers=headers
+            )
+            if result is None:
+                return None
+            status, body = result
+            if status == 304 and conditional:
+                return USER_CONTEXT_UNCHANGED
+            if status == 200:
+                digest = hashlib.blake2b(body, digest_size=16).digest()
+                unchanged = conditional and digest == self._context_digest
+                self._context_digest = digest
+                self._context_etag = self.last_headers.get("ETag")
+                self._context_last_modified = self.last_headers.get("Last-Modified")
+                self.user_context_size = len(body)
+                if unchanged:
+                    return USER_CONTEXT_UNCHANGED
+                return self._decode(body)
+            elif status == 401:
+                _LOGGER.error("Cookie ogiltig - behöver ny inloggning")
+                return None
+            else:
+                _LOGGER.error("API-fel: %s", status)
+                return None
         except Exception as err:
             _LOGGER.exception("Fel vid hämtning av användarkontext: %s", err)
             return None
 
-    async def set_atw_state(
-        self, unit_id: str, state: dict[str, Any]
+    async def get_atw_unit(self, unit_id: str) -> dict[str, Any] | None:
+        """Hämta aktuellt tillstånd för en ATW-enhet."""
+        return await self._async_get_unit_state("atwunit", "ATW", unit_id)
+
+    async def get_ata_unit(self, unit_id: str) -> dict[str, Any] | None:
+        """Hämta aktuellt tillstånd för en ATA-enhet."""
+        return await self._async_get_unit_state("ataunit", "ATA", unit_id)
+
+    async def _async_get_unit_state(
+        self, endpoint: str, label: str, unit_id: str
     ) -> dict[str, Any] | None:
-        """Uppdatera inställningar för en ATW-enhet.
-        
+        """Läs en enhet via samma sökväg som används för PUT."""
+        try:
+            result = await self._async_request(
+                "GET", f"/api/{endpoint}/{unit_id}", ENDPOINT_UNIT_GET
+            )
+            if result is None:
+                return None
+            status, body = result
+            if status == 200:
+                self.unit_state_supported = True
+                self.invalidate_user_context()
+                return self._decode(body)
+            elif status in (404, 405):
+                # Servern saknar läsning per enhet; coordinatorn faller tillbaka på user context
+                _LOGGER.info("Läsning per enhet stöds inte (%s), använder user context", status)
+                self.unit_state_supported = False
+                return None
+            else:
+                _LOGGER.error("Kunde inte läsa %s-enhet %s: %s", label, unit_id, status)
+                return None
+        except Exception as err:
+            _LOGGER.exception("Fel vid läsning av %s-enhet %s: %s", label, unit_id, err)
+            return None
+
+    async def get_telemetry(
+        self,
+        unit_id: str,
+        telemetry: str,
+        measure: str,
+        start: datetime,
+        end: datetime,
+        priority: int = PRIORITY_BACKGROUND,
+    ) -> dict[str, Any] | None:
+        """Hämta historik för en enhet.
+
         Args:
             unit_id: ID för enheten
-            state: Flat dictionary med camelCase-nycklar, ex: {"power": true, "setTemperatureZone1": 22}
-        """
-        if not self._session or not self._cookie:
-            return None
+            telemetry: TELEMETRY_ENERGY (summa per timme) eller TELEMETRY_ACTUAL (mätvärden)
+            measure: Mätvärdets namn, t.ex. "room_temperature"
+            start: Början på intervallet (UTC)
+            end: Slutet på intervallet (UTC)
+            priority: Schemaläggningsprioritet; som standard efter pollning och skrivningar
 
-        headers = {
-            "x-csrf": "1",
-            "Cookie": self._cookie,
-            "Content-Type": "application/json",
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+        Returns:
+            Svaret, ``{"measureData": [{"values": [{"time": ..., "value": ...}]}]}``,
+            eller None vid fel
+        """
+        params = {
+            "from": start.strftime(TELEMETRY_TIME_FORMAT),
+            "to": end.strftime(TELEMETRY_TIME_FORMAT),
+            "measure": measure,
         }
-
+        if telemetry == TELEMETRY_ENERGY:
+            params["interval"] = "Hour"
         try:
-            async with self._session.put(
-                f"{BASE_URL}/api/atwunit/{unit_id}",
-                json=state,
-                headers=headers,
-                timeout=aiohttp.ClientTimeout(total=10),
-            ) as response:
-                if response.status in (200, 204):
-                    return {"success": True}
-                else:
-                    text = await response.text()
-                    _LOGGER.error(
-                        "Kunde inte uppdatera ATW-enhet %s: %s - %s", unit_id, response.status, text
-                    )
-                    return None
+            result = await self._async_request(
+                "GET",
+                f"/api/telemetry/{telemetry}/{unit_id}",
+                ENDPOINT_TELEMETRY,
+                priority,
+                params=params,
+            )
+            if result is None:
+                return None
+            status, body = result
+            if status == 200:
+                self.telemetry_supported = True
+                return self._decode(body)
+            elif status == 204:
+                # Ingen data i intervallet
+                return {"measureData": []}
+            elif status in (404, 405):
+                _LOGGER.info("Historik per enhet stöds inte (%s)", status)
+                self.telemetry_supported = False
+                return None
+            else:
+                _LOGGER.error("Kunde inte hämta historik %s för %s: %s", measure, unit_id, status)
+                return None
         except Exception as err:
-            _LOGGER.exception("Fel vid uppdatering av ATW-enhet %s: %s", unit_id, err)
+            _LOGGER.exception("Fel vid hämtning av historik för %s: %s", unit_id, err)
             return None
 
+    async def set_atw_state(
+        self, unit_id: str, state: dict[str, Any], priority: int = PRIORITY_INTERACTIVE
+    ) -> dict[str, Any] | None:
+        """Uppdatera inställningar för en ATW-enhet.
+        
+        Args:
+            unit_id: ID för enheten
+            state: Flat dictionary med camelCase-nycklar, ex: {"power": true, "setTemperatureZone1": 22}
+            priority: Prioritetsklass i schemaläggaren
+        """
+        return await self._async_set_unit_state("atwunit", "ATW", unit_id, state, priority)
+
     async def set_ata_state(
-        self, unit_id: str, state: dict[str, Any]
+        self, unit_id: str, state: dict[str, Any], priority: int = PRIORITY_INTERACTIVE
     ) -> dict[str, Any] | None:
         """Uppdatera inställningar för en ATA-enhet (Air-to-Air).
         
         Args:
             unit_id: ID för enheten
             state: Flat dictionary med camelCase-nycklar, ex: {"power": true, "setTemperature": 22}
+            priority: Prioritetsklass i schemaläggaren
         """
-        if not self._session or not self._cookie:
-            return None
-
-        headers = {
-            "x-csrf": "1",
-            "Cookie": self._cookie,
-            "Content-Type": "application/json",
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-        }
+        return await self._async_set_unit_state("ataunit", "ATA", unit_id, state, priority)
 
+    async def _async_set_unit_state(
+        self,
+        endpoint: str,
+        label: str,
+        unit_id: str,
+        state: dict[str, Any],
+        priority: int,
+    ) -> dict[str, Any] | None:
+        """Skicka en PUT med ändringar till en enhet."""
         try:
-            async with self._session.put(
-                f"{BASE_URL}/api/ataunit/{unit_id}",
-                json=state,
-                headers=headers,
-                timeout=aiohttp.ClientTimeout(total=10),
-            ) as response:
-                if response.status in (200, 204):
-                    return {"success": True}
-                else:
-                    text = await response.text()
-                    _LOGGER.error(
-                        "Kunde inte uppdatera ATA-enhet %s: %s - %s", unit_id, response.status, text
-                    )
-                    return None
+            result = await self._async_request(
+                "PUT", f"/api/{endpoint}/{unit_id}", ENDPOINT_UNIT_PUT, priority, json=state
+            )
+            if result is None:
+                return None
+            status, body = result
+            if status in (200, 204):
+                self.invalidate_user_context()
+                return {"success": True}
+            else:
+                _LOGGER.error(
+                    "Kunde inte uppdatera %s-enhet %s: %s - %s",
+                    label,
+                    unit_id,
+                    status,
+                    body.decode(errors="replace"),
+                )
+                return None
         except Exception as err:
-            _LOGGER.exception("Fel vid uppdatering av ATA-enhet %s: %s", unit_id, err)
+            _LOGGER.exception("Fel vid uppdatering av %s-enhet %s: %s", label, unit_id, err)
             return None
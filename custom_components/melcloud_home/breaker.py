@@ -0,0 +1,121 @@
+"""Circuit breaker för förfrågningar mot melcloudhome.com.
+
+Efter upprepade fel (timeout, anslutningsfel, 5xx) öppnas brytaren och
+förfrågningar avvisas direkt i stället för att vänta ut hela timeouten.
+När vilotiden gått släpps en provförfrågan igenom (halvöppen). Lyckas den
+stängs brytaren, annars öppnas den igen med dubbel vilotid.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any
+
+_LOGGER = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+# Antal fel i följd innan brytaren öppnas
+FAILURE_THRESHOLD = 3
+# Vilotid innan första provförfrågan, dubblas vid misslyckade prov upp till taket
+RESET_TIMEOUT = 30.0
+MAX_RESET_TIMEOUT = 600.0
+# En provförfrågan som inte rapporterat efter så här lång tid räknas som förlorad
+PROBE_TIMEOUT = 30.0
+
+
+class CircuitBreaker:
+    """Brytare med tillstånden stängd, öppen och halvöppen."""
+
+    def __init__(
+        self,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        reset_timeout: float = RESET_TIMEOUT,
+        max_reset_timeout: float = MAX_RESET_TIMEOUT,
+    ) -> None:
+        """Initiera brytaren, stängd."""
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._max_reset_timeout = max_reset_timeout
+        self._timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started: float | None = None
+        self.state = STATE_CLOSED
+        # Antal gånger brytaren öppnats och förfrågningar som avvisats
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def is_open(self) -> bool:
+        """Returnera om förfrågningar avvisas utan att någon provförfrågan släpps."""
+        return self.state == STATE_OPEN and self.retry_in > 0
+
+    @property
+    def retry_in(self) -> float:
+        """Returnera sekunder tills nästa provförfrågan släpps."""
+        if self.state != STATE_OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self._timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        """Returnera om en förfrågan får gå iväg.
+
+        I halvöppet läge släpps en provförfrågan i taget.
+        """
+        if self.state == STATE_CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == STATE_OPEN:
+            if now < self._opened_at + self._timeout:
+                self.rejected += 1
+                return False
+            self.state = STATE_HALF_OPEN
+            self._probe_started = None
+        if self._probe_started is not None and now - self._probe_started < PROBE_TIMEOUT:
+            self.rejected += 1
+            return False
+        self._probe_started = now
+        return True
+
+    def record_success(self) -> None:
+        """Registrera ett svar från servern."""
+        if self.state != STATE_CLOSED:
+            _LOGGER.info("MELCloud Home svarar igen, stänger brytaren")
+        self.state = STATE_CLOSED
+        self._failures = 0
+        self._timeout = self._reset_timeout
+        self._probe_started = None
+
+    def record_failure(self) -> None:
+        """Registrera ett fel och öppna brytaren vid behov."""
+        if self.state == STATE_HALF_OPEN:
+            self._timeout = min(self._timeout * 2, self._max_reset_timeout)
+            self._open()
+            return
+        self._failures += 1
+        if self.state == STATE_CLOSED and self._failures >= self._failure_threshold:
+            self._open()
+
+    def _open(self) -> None:
+        """Öppna brytaren."""
+        self.state = STATE_OPEN
+        self._opened_at = time.monotonic()
+        self._probe_started = None
+        self.trips += 1
+        _LOGGER.warning(
+            "MELCloud Home svarar inte, pausar förfrågningar i %.0f s", self._timeout
+        )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returnera brytarens tillstånd."""
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "retry_in": round(self.retry_in, 1),
+            "reset_timeout": self._timeout,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,153 @@
+"""Inspelning av API-trafik till anonymiserade kassetter.
+
+En kassett innehåller inloggningens steg (status, storlek och tid),
+user context, läsningar per enhet och PUT:ar. Cookies och övriga headers
+sparas inte, och e-postadresser, namn, id:n och hårdvaruadresser byts mot
+påhittade värden som är konsekventa inom kassetten. Kassetter spelas upp
+offline med benchmarks/replay.py.
+"""
+from __future__ import annotations
+
+import json
+import re
+import time
+import uuid
+from typing import Any
+
+CASSETTE_VERSION = 1
+
+# Headers som behövs för uppspelning; allt annat, även cookies, kastas
+RECORDED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Retry-After")
+
+_UUID = re.compile(
+    r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
+)
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+# Nycklar vars värden ersätts med pseudonymer med givet prefix
+_NAME_KEYS = {"firstname": "First", "lastname": "Last", "givenDisplayName": "Unit"}
+# Nycklar vars värden identifierar hårdvara eller person och ersätts helt
+_REDACTED_KEYS = frozenset(
+    {"macAddress", "connectedInterfaceIdentifier", "serialNumber", "address", "phone"}
+)
+
+
+class Anonymizer:
+    """Byter personuppgifter mot påhittade värden, samma ersättning för samma värde."""
+
+    def __init__(self) -> None:
+        """Initiera tomma ersättningstabeller."""
+        self._ids: dict[str, str] = {}
+        self._emails: dict[str, str] = {}
+        self._names: dict[tuple[str, str], str] = {}
+
+    def path(self, path: str) -> str:
+        """Anonymisera id:n i en URL-sökväg och släpp query-strängen."""
+        return _UUID.sub(self._id, path.split("?", 1)[0])
+
+    def value(
+        self, value: Any, key: str | None = None, parent: dict[str, Any] | None = None
+    ) -> Any:
+        """Anonymisera ett JSON-värde rekursivt."""
+        if isinstance(value, dict):
+            return {k: self.value(v, k, value) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.value(item) for item in value]
+        if not isinstance(value, str):
+            return value
+        if key in _REDACTED_KEYS:
+            return "redacted"
+        if key in _NAME_KEYS:
+            return self._name(_NAME_KEYS[key], value)
+        if key == "name" and parent is not None and (
+            "airToWaterUnits" in parent or "airToAirUnits" in parent
+        ):
+            # Byggnadens namn; "name" i settings är setting-namnet och behålls
+            return self._name("Building", value)
+        return _EMAIL.sub(self._email, _UUID.sub(self._id, value))
+
+    def _id(self, match: re.Match[str]) -> str:
+        original = match.group(0).lower()
+        if original not in self._ids:
+            self._ids[original] = str(uuid.uuid4())
+        return self._ids[original]
+
+    def _email(self, match: re.Match[str]) -> str:
+        original = match.group(0).lower()
+        if original not in self._emails:
+            self._emails[original] = f"user{len(self._emails) + 1}@example.com"
+        return self._emails[original]
+
+    def _name(self, prefix: str, original: str) -> str:
+        if (prefix, original) not in self._names:
+            count = sum(1 for kind, _ in self._names if kind == prefix)
+            self._names[(prefix, original)] = f"{prefix} {count + 1}"
+        return self._names[(prefix, original)]
+
+
+class CassetteRecorder:
+    """Samlar anonymiserade utbyten i minnet tills kassetten skrivs."""
+
+    def __init__(self) -> None:
+        """Starta en tom inspelning."""
+        self._anonymizer = Anonymizer()
+        self._started = time.time()
+        self.interactions: list[dict[str, Any]] = []
+
+    def record(
+        self,
+        endpoint: str,
+        method: str,
+        path: str,
+        status: int,
+        elapsed: float,
+        headers: Any = None,
+        request: Any = None,
+        body: bytes | None = None,
+        size: int | None = None,
+    ) -> None:
+        """Spela in ett utbyte.
+
+        Args:
+            endpoint: Endpoint-namn enligt metrics
+            method: HTTP-metod
+            path: Sökväg, med eller utan query-sträng
+            status: Svarets status
+            elapsed: Tid för utbytet i sekunder
+            headers: Svarets headers; bara RECORDED_HEADERS sparas
+            request: JSON-kroppen i förfrågan
+            body: Svarets kropp; None sparar bara storleken
+            size: Svarets storlek om kroppen inte skickas med
+        """
+        interaction: dict[str, Any] = {
+            "endpoint": endpoint,
+            "method": method,
+            "path": self._anonymizer.path(path),
+            "status": status,
+            "elapsed": round(elapsed, 4),
+            "size": len(body) if body is not None else size or 0,
+        }
+        if headers:
+            interaction["headers"] = {
+                name: headers[name] for name in RECORDED_HEADERS if name in headers
+            }
+        if request is not None:
+            interaction["request"] = self._anonymizer.value(request)
+        if body:
+            try:
+                interaction["json"] = self._anonymizer.value(json.loads(body))
+            except ValueError:
+                interaction["text"] = "<inte JSON, utelämnad>"
+        self.interactions.append(interaction)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returnera kassetten."""
+        return {
+            "version": CASSETTE_VERSION,
+            "recorded_at": self._started,
+            "interactions": self.interactions,
+        }
+
+    def write(self, path: str) -> None:
+        """Skriv kassetten till en fil (blockerande)."""
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.as_dict(), file, ensure_ascii=False, indent=1)
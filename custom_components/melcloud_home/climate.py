@@ -13,9 +13,10 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import ATTR_TEMPERATURE, UnitOfTemperature
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import DOMAIN
+from .entity import MELCloudHomeEntity, async_setup_unit_entities
+from .snapshot import UNIT_TYPE_ATA, UNIT_TYPE_ATW, UnitSnapshot
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -26,25 +27,20 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Konfigurera climate-entiteter från en config entry."""
-    data = hass.data[DOMAIN][entry.entry_id]
-    coordinator = data["coordinator"]
-    api = data["api"]
-    
-    entities = []
-    devices = coordinator.data.get("devices", [])
-    
-    # Skapa climate-entiteter för både ATW och ATA enheter
-    for device in devices:
-        device_type = device.get("type")
-        if device_type == "air_to_water":
-            entities.append(MELCloudHomeATWClimate(coordinator, api, device))
-        elif device_type == "air_to_air":
-            entities.append(MELCloudHomeATAClimate(coordinator, api, device))
-    
-    async_add_entities(entities)
-
-
-class MELCloudHomeATWClimate(CoordinatorEntity, ClimateEntity):
+    # Skapa climate-entiteter för både ATW och ATA enheter, även enheter som tillkommer senare
+    async_setup_unit_entities(hass, entry, async_add_entities, _unit_climates)
+
+
+def _unit_climates(coordinator, unit: UnitSnapshot) -> list[ClimateEntity]:
+    """Skapa climate-entiteten för en enhet."""
+    if unit.type == UNIT_TYPE_ATW:
+        return [MELCloudHomeATWClimate(coordinator, unit)]
+    if unit.type == UNIT_TYPE_ATA:
+        return [MELCloudHomeATAClimate(coordinator, unit)]
+    return []
+
+
+class MELCloudHomeATWClimate(MELCloudHomeEntity, ClimateEntity):
     """Representation av en MELCloud Home ATW-värmepump."""
 
     _attr_has_entity_name = True
@@ -55,38 +51,30 @@ class MELCloudHomeATWClimate(CoordinatorEntity, ClimateEntity):
         | ClimateEntityFeature.TURN_OFF
     )
     _attr_hvac_modes = [HVACMode.HEAT, HVACMode.OFF]
+    _setting_keys = (
+        "RoomTemperatureZone1",
+        "SetTemperatureZone1",
+        "Power",
+        "OperationMode",
+        "OperationModeZone1",
+        "ForcedHotWaterMode",
+    )
 
-    def __init__(self, coordinator, api, device: dict[str, Any]) -> None:
+    def __init__(self, coordinator, unit: UnitSnapshot) -> None:
         """Initiera climate-entiteten."""
-        super().__init__(coordinator)
-        self._api = api
-        self._device = device
-        self._device_id = device["id"]
+        super().__init__(coordinator, unit.id)
         self._attr_unique_id = f"{self._device_id}_climate"
-        self._attr_name = device.get("givenDisplayName", "Värmepump")
+        self._attr_name = unit.name or "Värmepump"
         
         # Sätt temperaturlimiter från capabilities
-        capabilities = device.get("capabilities", {})
+        capabilities = unit.capabilities
         self._attr_min_temp = capabilities.get("minSetTemperature", 20)
         self._attr_max_temp = capabilities.get("maxSetTemperature", 50)
         self._attr_target_temperature_step = 1.0 if not capabilities.get("hasHalfDegrees") else 0.5
 
     def _get_setting(self, name: str) -> Any:
         """Hämta värde från settings."""
-        devices = self.coordinator.data.get("devices", [])
-        for device in devices:
-            if device["id"] == self._device_id:
-                for setting in device.get("settings", []):
-                    if setting.get("name") == name:
-                        value = setting.get("value")
-                        # Konvertera strängar till rätt typ
-                        if value in ("True", "False"):
-                            return value == "True"
-                        try:
-                            return float(value)
-                        except (ValueError, TypeError):
-                            return value
-        return None
+        return self.coordinator.get_setting(self._device_id, name)
 
     @property
     def device_info(self):
@@ -101,11 +89,8 @@ class MELCloudHomeATWClimate(CoordinatorEntity, ClimateEntity):
     @property
     def available(self) -> bool:
         """Return if entity is available."""
-        devices = self.coordinator.data.get("devices", [])
-        for device in devices:
-            if device["id"] == self._device_id:
-                return device.get("isConnected", False)
-        return False
+        unit = self.coordinator.get_unit(self._device_id)
+        return unit is not None and unit.is_connected
 
     @property
     def current_temperature(self) -> float | None:
@@ -137,21 +122,22 @@ class MELCloudHomeATWClimate(CoordinatorEntity, ClimateEntity):
         return {
             "operation_mode_zone1": self._get_setting("OperationModeZone1"),
             "forced_hot_water": self._get_setting("ForcedHotWaterMode"),
-            "building": self._device.get("building_name"),
+            "building": self._building_name,
+            **self._stale_attributes(),
         }
 
+    @property
+    def _building_name(self) -> str | None:
+        """Returnera byggnadens namn från snapshotet."""
+        unit = self.coordinator.get_unit(self._device_id)
+        return unit.building_name if unit else None
+
     async def async_set_temperature(self, **kwargs: Any) -> None:
         """Sätt ny måltemperatur."""
         if (temperature := kwargs.get(ATTR_TEMPERATURE)) is None:
             return
 
-        await self._api.set_atw_state(
-            self._device_id,
-            {"setTemperatureZone1": int(temperature)}
-        )
-        
-        # Uppdatera coordinator
-        await self.coordinator.async_request_refresh()
+        await self._async_write({"setTemperatureZone1": int(temperature)})
 
     async def async_set_hvac_mode(self, hvac_mode: HVACMode) -> None:
         """Sätt nytt HVAC-läge."""
@@ -165,23 +151,18 @@ class MELCloudHomeATWClimate(CoordinatorEntity, ClimateEntity):
             # Standard vid påslag: HeatRoomTemperature
             state["operationModeZone1"] = "HeatRoomTemperature"
         
-        await self._api.set_atw_state(self._device_id, state)
-        
-        # Uppdatera coordinator
-        await self.coordinator.async_request_refresh()
+        await self._async_write(state)
 
     async def async_turn_on(self) -> None:
         """Slå på värmepumpen."""
-        await self._api.set_atw_state(self._device_id, {"power": True})
-        await self.coordinator.async_request_refresh()
+        await self._async_write({"power": True})
 
     async def async_turn_off(self) -> None:
         """Stäng av värmepumpen."""
-        await self._api.set_atw_state(self._device_id, {"power": False})
-        await self.coordinator.async_request_refresh()
+        await self._async_write({"power": False})
 
 
-class MELCloudHomeATAClimate(CoordinatorEntity, ClimateEntity):
+class MELCloudHomeATAClimate(MELCloudHomeEntity, ClimateEntity):
     """Representation av en MELCloud Home ATA-luftvärmepump."""
 
     _attr_has_entity_name = True
@@ -192,17 +173,24 @@ class MELCloudHomeATAClimate(CoordinatorEntity, ClimateEntity):
         | ClimateEntityFeature.TURN_OFF
     )
     _attr_hvac_modes = [HVACMode.OFF, HVACMode.HEAT, HVACMode.COOL, HVACMode.AUTO]
+    _setting_keys = (
+        "RoomTemperature",
+        "SetTemperature",
+        "Power",
+        "OperationMode",
+        "FanSpeed",
+        "VaneHorizontal",
+        "VaneVertical",
+    )
 
-    def __init__(self, coordinator, api, device: dict[str, Any]) -> None:
+    def __init__(self, coordinator, unit: UnitSnapshot) -> None:
         """Initiera ATA climate-entiteten."""
-        super().__init__(coordinator)
-        self._api = api
-        self._device = device
-        self._device_id = device["id"]
+        super().__init__(coordinator, unit.id)
+        self._device_name = unit.name or "ATA Heat Pump"
         self._attr_unique_id = f"{self._device_id}_climate"
         
         # Hämta capabilities
-        caps = device.get("capabilities", {})
+        caps = unit.capabilities
         self._attr_min_temp = caps.get("minSetTemperature", 16)
         self._attr_max_temp = caps.get("maxSetTemperature", 31)
         self._attr_target_temperature_step = max(0.5, float(caps.get("temperatureIncrement", 0.5) or 0.5))
@@ -212,47 +200,36 @@ class MELCloudHomeATAClimate(CoordinatorEntity, ClimateEntity):
         """Returnera enhetsinformation."""
         return {
             "identifiers": {(DOMAIN, self._device_id)},
-            "name": self._device.get("givenDisplayName", "ATA Heat Pump"),
+            "name": self._device_name,
             "manufacturer": "Mitsubishi Electric",
             "model": "ATA Heat Pump",
         }
 
     def _get_setting(self, key: str) -> Any:
         """Hämta ett setting-värde från enheten."""
-        for d in self.coordinator.data.get("devices", []):
-            if d["id"] == self._device_id:
-                for s in d.get("settings", []):
-                    if s.get("name") == key:
-                        return s.get("value")
+        return self.coordinator.get_setting(self._device_id, key)
+
+    def _get_float(self, key: str) -> float | None:
+        """Hämta ett numeriskt setting-värde."""
+        value = self._get_setting(key)
+        if isinstance(value, float):
+            return value
         return None
 
     @property
     def current_temperature(self) -> float | None:
         """Returnera nuvarande rumstemperatur."""
-        temp = self._get_setting("RoomTemperature")
-        if temp is not None:
-            try:
-                return float(temp)
-            except (ValueError, TypeError):
-                return None
-        return None
+        return self._get_float("RoomTemperature")
 
     @property
     def target_temperature(self) -> float | None:
         """Returnera måltemperatur."""
-        temp = self._get_setting("SetTemperature")
-        if temp is not None:
-            try:
-                return float(temp)
-            except (ValueError, TypeError):
-                return None
-        return None
+        return self._get_float("SetTemperature")
 
     @property
     def hvac_mode(self) -> HVACMode:
         """Returnera nuvarande HVAC-läge."""
-        power = self._get_setting("Power")
-        if str(power) == "False":
+        if self._get_setting("Power") is False:
             return HVACMode.OFF
         
         op_mode = self._get_setting("OperationMode")
@@ -273,21 +250,27 @@ class MELCloudHomeATAClimate(CoordinatorEntity, ClimateEntity):
             "fan_speed": self._get_setting("FanSpeed"),
             "vane_horizontal": self._get_setting("VaneHorizontal"),
             "vane_vertical": self._get_setting("VaneVertical"),
-            "building": self._device.get("building_name"),
+            "building": self._building_name,
+            **self._stale_attributes(),
         }
 
+    @property
+    def _building_name(self) -> str | None:
+        """Returnera byggnadens namn från snapshotet."""
+        unit = self.coordinator.get_unit(self._device_id)
+        return unit.building_name if unit else None
+
     async def async_set_temperature(self, **kwargs: Any) -> None:
         """Sätt ny måltemperatur."""
         if (temperature := kwargs.get(ATTR_TEMPERATURE)) is None:
             return
         
-        await self._api.set_ata_state(self._device_id, {"setTemperature": float(temperature)})
-        await self.coordinator.async_request_refresh()
+        await self._async_write({"setTemperature": float(temperature)})
 
     async def async_set_hvac_mode(self, hvac_mode: HVACMode) -> None:
         """Sätt nytt HVAC-läge."""
         if hvac_mode == HVACMode.OFF:
-            await self._api.set_ata_state(self._device_id, {"power": False})
+            await self._async_write({"power": False})
         else:
             updates = {"power": True}
             if hvac_mode == HVACMode.HEAT:
@@ -297,16 +280,12 @@ class MELCloudHomeATAClimate(CoordinatorEntity, ClimateEntity):
             elif hvac_mode == HVACMode.AUTO:
                 updates["operationMode"] = "Auto"
             
-            await self._api.set_ata_state(self._device_id, updates)
-        
-        await self.coordinator.async_request_refresh()
+            await self._async_write(updates)
 
     async def async_turn_on(self) -> None:
         """Slå på luftvärmepumpen."""
-        await self._api.set_ata_state(self._device_id, {"power": True})
-        await self.coordinator.async_request_refresh()
+        await self._async_write({"power": True})
 
     async def async_turn_off(self) -> None:
         """Stäng av luftvärmepumpen."""
-        await self._api.set_ata_state(self._device_id, {"power": False})
-        await self.coordinator.async_request_refresh()
+        await self._async_write({"power": False})
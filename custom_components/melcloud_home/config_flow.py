@@ -2,6 +2,7 @@
 from __future__ import annotations
 
 import logging
+from collections.abc import Mapping
 from typing import Any
 
 import voluptuous as vol
@@ -10,10 +11,10 @@ from homeassistant import config_entries
 from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
 from homeassistant.core import callback
 from homeassistant.data_entry_flow import FlowResult
-from homeassistant.helpers import aiohttp_client
 
-from .api import MelCloudHomeCookieAPI
-from .const import DOMAIN
+from . import async_create_api_session
+from .api import BASE_URL, MelCloudHomeCookieAPI
+from .const import CONF_BASE_URL, CONF_PUSH, CONF_UNIT_POLLING, DOMAIN
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -29,6 +30,8 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     VERSION = 1
 
+    _reauth_entry: config_entries.ConfigEntry
+
     @staticmethod
     @callback
     def async_get_options_flow(
@@ -47,10 +50,12 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             username = user_input[CONF_USERNAME]
             password = user_input[CONF_PASSWORD]
 
+            api = MelCloudHomeCookieAPI()
             try:
                 # Testa inloggningen
-                api = MelCloudHomeCookieAPI()
-                await api.async_setup()
+                await api.async_setup(
+                    async_create_api_session(self.hass, api, auto_cleanup=False)
+                )
                 api.set_credentials(username, password)
                 
                 # Försök logga in
@@ -59,7 +64,6 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 else:
                     # Hämta användarkontext
                     user_context = await api.get_user_context()
-                    await api.async_close()
                     
                     if not user_context:
                         errors["base"] = "cannot_connect"
@@ -80,6 +84,8 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             except Exception as err:  # pylint: disable=broad-except
                 _LOGGER.exception("Oväntat fel vid inloggning")
                 errors["base"] = "unknown"
+            finally:
+                await api.async_close()
 
         return self.async_show_form(
             step_id="user",
@@ -88,6 +94,54 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         )
 
 
+    async def async_step_reauth(self, entry_data: Mapping[str, Any]) -> FlowResult:
+        """Starta omautentisering när MELCloud Home nekat inloggningen."""
+        self._reauth_entry = self.hass.config_entries.async_get_entry(self.context["entry_id"])
+        return await self.async_step_reauth_confirm()
+
+    async def async_step_reauth_confirm(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Fråga efter nya inloggningsuppgifter och ladda om entryn."""
+        entry = self._reauth_entry
+        errors: dict[str, str] = {}
+
+        if user_input is not None:
+            api = MelCloudHomeCookieAPI(base_url=entry.data.get(CONF_BASE_URL, BASE_URL))
+            try:
+                await api.async_setup(
+                    async_create_api_session(self.hass, api, auto_cleanup=False)
+                )
+                api.set_credentials(user_input[CONF_USERNAME], user_input[CONF_PASSWORD])
+                if not await api.async_login():
+                    errors["base"] = "invalid_auth"
+                elif not await api.get_user_context():
+                    errors["base"] = "cannot_connect"
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Oväntat fel vid inloggning")
+                errors["base"] = "unknown"
+            finally:
+                await api.async_close()
+
+            if not errors:
+                self.hass.config_entries.async_update_entry(
+                    entry, data={**entry.data, **user_input}
+                )
+                if entry.state is not config_entries.ConfigEntryState.LOADED:
+                    # Uppdateringslyssnaren laddar bara om entryn när den är laddad
+                    await self.hass.config_entries.async_reload(entry.entry_id)
+                return self.async_abort(reason="reauth_successful")
+
+        return self.async_show_form(
+            step_id="reauth_confirm",
+            data_schema=vol.Schema({
+                vol.Required(CONF_USERNAME, default=entry.data.get(CONF_USERNAME)): str,
+                vol.Required(CONF_PASSWORD): str,
+            }),
+            errors=errors,
+        )
+
+
 class OptionsFlowHandler(config_entries.OptionsFlow):
     """Handle options flow for MELCloud Home."""
 
@@ -97,6 +151,34 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
 
     async def async_step_init(
         self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Välj mellan inställningar och inloggningsuppgifter."""
+        return self.async_show_menu(step_id="init", menu_options=["settings", "credentials"])
+
+    async def async_step_settings(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Hantera inställningar för pollningen och live-kanalen."""
+        if user_input is not None:
+            return self.async_create_entry(
+                title="", data={**self.config_entry.options, **user_input}
+            )
+
+        options = self.config_entry.options
+        return self.async_show_form(
+            step_id="settings",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(
+                        CONF_UNIT_POLLING, default=options.get(CONF_UNIT_POLLING, False)
+                    ): bool,
+                    vol.Optional(CONF_PUSH, default=options.get(CONF_PUSH, False)): bool,
+                }
+            ),
+        )
+
+    async def async_step_credentials(
+        self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
         """Manage the options - allow updating credentials."""
         errors = {}
@@ -107,13 +189,16 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
             
             # Validate new credentials
             api = MelCloudHomeCookieAPI()
-            await api.async_setup()
+            await api.async_setup(async_create_api_session(self.hass, api, auto_cleanup=False))
             api.set_credentials(username, password)
             
-            if await api.async_login():
-                user_context = await api.get_user_context()
+            try:
+                logged_in = await api.async_login()
+                user_context = await api.get_user_context() if logged_in else None
+            finally:
                 await api.async_close()
-                
+            
+            if logged_in:
                 if user_context:
                     # Update config entry with new credentials
                     self.hass.config_entries.async_update_entry(
@@ -131,14 +216,17 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                         {"notification_id": f"{DOMAIN}_session_expired"},
                     )
                     
-                    return self.async_create_entry(title="", data={})
+                    # Inställningarna lämnas orörda
+                    return self.async_create_entry(
+                        title="", data=dict(self.config_entry.options)
+                    )
                 else:
                     errors["base"] = "cannot_connect"
             else:
                 errors["base"] = "invalid_auth"
 
         return self.async_show_form(
-            step_id="init",
+            step_id="credentials",
             data_schema=DATA_SCHEMA_LOGIN,
             errors=errors,
         )
@@ -1,3 +1,23 @@
 """Konstanter för MELCloud Home-integrationen."""
 
 DOMAIN = "melcloud_home"
+
+# Nyckel i hass.data för registret som delas av alla konton
+DATA_HUB = f"{DOMAIN}_hub"
+
+# Version för data som sparas i Home Assistants lagring
+STORAGE_VERSION = 1
+
+# Dispatcher-signal (formateras med entry_id) när enheter tillkommit, ändrats eller tagits bort
+SIGNAL_UNITS_CHANGED = f"{DOMAIN}_units_changed_{{}}"
+
+# Valfri serveradress i config entryn, för uppspelning av kassetter mot en lokal server
+CONF_BASE_URL = "base_url"
+
+# Option: läs enheter var för sig mellan fullständiga hämtningar av user context
+CONF_UNIT_POLLING = "unit_polling"
+# Option: anslut live-kanalen; avstängd tills protokollet är bekräftat mot molnet
+CONF_PUSH = "push"
+
+# Attribut på enheternas entiteter när senast kända värden visas under ett avbrott
+ATTR_STALE_SINCE = "stale_since"
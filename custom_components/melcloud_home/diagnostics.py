@@ -0,0 +1,50 @@
+"""Diagnostik för MELCloud Home."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+# title innehåller kontoinnehavarens namn eller e-postadress, och unique_id kan göra det
+TO_REDACT = {CONF_USERNAME, CONF_PASSWORD, "title", "unique_id"}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Returnera diagnostik för en config entry."""
+    data = hass.data[DOMAIN][entry.entry_id]
+    api = data["api"]
+    coordinator = data["coordinator"]
+    connection_stats = api.connection_stats.as_dict()
+
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "api": api.diagnostics(),
+        "connections": {
+            **connection_stats,
+            # Varje återanvänd anslutning är ett sparat TCP/TLS-handslag
+            "handshakes_saved": connection_stats["connections_reused"],
+        },
+        "coordinator": {
+            "units": len(coordinator.units),
+            "poll_interval": coordinator.poll_interval.total_seconds(),
+            "last_update_success": coordinator.last_update_success,
+            "stale_units": sum(
+                coordinator.unit_stale_since(unit_id) is not None for unit_id in coordinator.units
+            ),
+            "suppressed_writes": coordinator.total_suppressed_writes,
+            "refresh": coordinator.refresh_metrics.as_dict(),
+            "writes": coordinator.write_metrics.as_dict(),
+            "conditional_fetch": coordinator.conditional_metrics.as_dict(),
+        },
+        "push": coordinator.push.as_dict(),
+        "history": coordinator.history.as_dict(),
+        "trends": coordinator.trends.as_dict(),
+        "profiling": coordinator.profiler.as_dict(),
+    }
@@ -0,0 +1,99 @@
+"""Basentitet för MELCloud Home."""
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .const import ATTR_STALE_SINCE, DOMAIN, SIGNAL_UNITS_CHANGED
+from .scheduler import PRIORITY_AUTOMATION, PRIORITY_INTERACTIVE
+
+
+class MELCloudHomeEntity(CoordinatorEntity):
+    """Gemensam bas för entiteter kopplade till en enhet.
+
+    Skriver bara state när någon av entitetens setting-nycklar ändrats.
+    """
+
+    # Setting-namn som entiteten läser; tom tuple betyder alla
+    _setting_keys: tuple[str, ...] = ()
+
+    def __init__(self, coordinator, unit_id: str) -> None:
+        """Initiera entiteten."""
+        super().__init__(coordinator)
+        self._device_id = unit_id
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Skriv state endast om enhetens relevanta värden ändrats."""
+        if not self.coordinator.unit_changed(self._device_id, self._setting_keys):
+            self.coordinator.suppressed_writes += 1
+            return
+        super()._handle_coordinator_update()
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Returnera när enhetens data senast var aktuell, under ett avbrott."""
+        return self._stale_attributes() or None
+
+    def _stale_attributes(self) -> dict[str, Any]:
+        """Returnera stale_since om enheten visar senast kända värden."""
+        if (since := self.coordinator.unit_stale_since(self._device_id)) is None:
+            return {}
+        return {ATTR_STALE_SINCE: since.isoformat()}
+
+    async def _async_write(self, state: dict[str, Any]) -> None:
+        """Köa en ändring för enheten.
+
+        Anrop från en inloggad användare går före automationer i kön.
+        """
+        if self._context is not None and self._context.user_id is None:
+            priority = PRIORITY_AUTOMATION
+        else:
+            priority = PRIORITY_INTERACTIVE
+        await self.coordinator.async_queue_write(self._device_id, state, priority)
+
+
+@callback
+def async_setup_unit_entities(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+    entities_for_unit: Callable[..., Iterable[Entity]],
+) -> None:
+    """Lägg till entiteter för alla enheter, även sådana som dyker upp senare.
+
+    `entities_for_unit` anropas för varje ny eller ändrad enhet; entiteter
+    vars unique_id redan lagts till hoppas över.
+    """
+    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+    added: dict[str, set[str]] = {}
+
+    @callback
+    def _async_units_changed(new_units: Iterable[str], removed_units: Iterable[str]) -> None:
+        for unit_id in removed_units:
+            added.pop(unit_id, None)
+        entities = []
+        for unit_id in new_units:
+            if (unit := coordinator.get_unit(unit_id)) is None:
+                continue
+            known = added.setdefault(unit_id, set())
+            for entity in entities_for_unit(coordinator, unit):
+                if entity.unique_id not in known:
+                    known.add(entity.unique_id)
+                    entities.append(entity)
+        if entities:
+            async_add_entities(entities)
+
+    _async_units_changed(list(coordinator.units), ())
+    entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, SIGNAL_UNITS_CHANGED.format(entry.entry_id), _async_units_changed
+        )
+    )
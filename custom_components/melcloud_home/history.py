@@ -0,0 +1,303 @@
+"""Import av enheternas historik till Home Assistants långtidsstatistik.
+
+Entiteternas tillstånd ger bara ett värde per poll, och när Home Assistant
+ligger nere blir det ett permanent hål. Molnet har samma historik som
+appens grafer: energi per timme och uppmätta temperaturer. Den hämtas per
+enhet och mätvärde från en markör och importeras som extern statistik, en
+rad per avslutad timme. Enheterna laddar upp med fördröjning, så de senaste
+HISTORY_LATE_WINDOW hämtas om vid varje körning och markören stannar före
+dem. Markörerna och energins löpande summa vid markören sparas per konto.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import (
+    async_add_external_statistics,
+    get_last_statistics,
+)
+from homeassistant.const import UnitOfEnergy, UnitOfTemperature
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .api import TELEMETRY_ACTUAL, TELEMETRY_ENERGY, TELEMETRY_TIME_FORMAT
+from .const import DOMAIN, STORAGE_VERSION
+from .snapshot import UNIT_TYPE_ATW, UnitSnapshot
+
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+
+    from .api import MelCloudHomeCookieAPI
+
+_LOGGER = logging.getLogger(__name__)
+
+# Hur ofta ny historik hämtas
+HISTORY_IMPORT_INTERVAL = timedelta(hours=1)
+# Hur långt bakåt en enhet utan markör hämtas, och längsta fönster per förfrågan
+HISTORY_MAX_AGE = timedelta(days=7)
+# Senaste timmarna, som kan få sena uppladdningar och därför hämtas om varje gång
+HISTORY_LATE_WINDOW = timedelta(hours=3)
+
+
+@dataclass(frozen=True, slots=True)
+class HistoryMeasure:
+    """Ett mätvärde som importeras som statistik."""
+
+    key: str
+    telemetry: str
+    measure: str
+    name: str
+    unit: str
+
+    @property
+    def has_sum(self) -> bool:
+        """Energi importeras som löpande summa, övrigt som medel/min/max."""
+        return self.telemetry == TELEMETRY_ENERGY
+
+
+ENERGY_CONSUMED = HistoryMeasure(
+    "energy_consumed",
+    TELEMETRY_ENERGY,
+    "cumulative_energy_consumed_since_last_upload",
+    "Energy consumed",
+    UnitOfEnergy.WATT_HOUR,
+)
+ATW_MEASURES = (
+    ENERGY_CONSUMED,
+    HistoryMeasure(
+        "energy_produced",
+        TELEMETRY_ENERGY,
+        "cumulative_energy_produced_since_last_upload",
+        "Energy produced",
+        UnitOfEnergy.WATT_HOUR,
+    ),
+    HistoryMeasure(
+        "room_temperature_zone1",
+        TELEMETRY_ACTUAL,
+        "room_temperature",
+        "Room temperature zone 1",
+        UnitOfTemperature.CELSIUS,
+    ),
+    HistoryMeasure(
+        "tank_water_temperature",
+        TELEMETRY_ACTUAL,
+        "tank_water_temperature",
+        "Tank water temperature",
+        UnitOfTemperature.CELSIUS,
+    ),
+)
+ATA_MEASURES = (
+    ENERGY_CONSUMED,
+    HistoryMeasure(
+        "room_temperature",
+        TELEMETRY_ACTUAL,
+        "room_temperature",
+        "Room temperature",
+        UnitOfTemperature.CELSIUS,
+    ),
+)
+
+
+def statistic_id(unit_id: str, measure: HistoryMeasure) -> str:
+    """Returnera id för en enhets statistik, t.ex. ``melcloud_home:<id>_energy_consumed``."""
+    return f"{DOMAIN}:{unit_id.lower().replace('-', '_')}_{measure.key}"
+
+
+def parse_samples(data: dict[str, Any]) -> list[tuple[datetime, float]]:
+    """Plocka ut (tid, värde) ur ett telemetrisvar, sorterat på tid.
+
+    Värden som inte går att tolka hoppas över.
+    """
+    samples = []
+    for series in data.get("measureData") or ():
+        for point in series.get("values") or ():
+            try:
+                when = datetime.strptime(point["time"][:16], TELEMETRY_TIME_FORMAT)
+                value = float(point["value"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            samples.append((when.replace(tzinfo=dt_util.UTC), value))
+    samples.sort(key=lambda sample: sample[0])
+    return samples
+
+
+def hourly_statistics(
+    samples: Iterable[tuple[datetime, float]],
+    measure: HistoryMeasure,
+    before: datetime,
+    total: float = 0.0,
+) -> tuple[list[StatisticData], float]:
+    """Slå ihop mätpunkter till en rad per timme.
+
+    Args:
+        samples: Mätpunkter sorterade på tid
+        measure: Mätvärdet; energi summeras, övrigt ger medel/min/max
+        before: Bara timmar som börjar före denna tid tas med (avslutade timmar)
+        total: Energins löpande summa före första timmen
+
+    Returns:
+        Raderna och energins löpande summa efter sista timmen
+    """
+    buckets: dict[datetime, list[float]] = {}
+    for when, value in samples:
+        hour = when.replace(minute=0, second=0, microsecond=0)
+        if hour < before:
+            buckets.setdefault(hour, []).append(value)
+    rows: list[StatisticData] = []
+    for hour, values in sorted(buckets.items()):
+        if measure.has_sum:
+            total += sum(values)
+            rows.append(StatisticData(start=hour, state=total, sum=total))
+        else:
+            rows.append(
+                StatisticData(
+                    start=hour, mean=sum(values) / len(values), min=min(values), max=max(values)
+                )
+            )
+    return rows, total
+
+
+class HistoryImporter:
+    """Hämtar ny historik för ett kontos enheter och importerar den."""
+
+    def __init__(
+        self, hass: HomeAssistant, api: MelCloudHomeCookieAPI, entry: ConfigEntry
+    ) -> None:
+        """Initiera importen."""
+        self.hass = hass
+        self._api = api
+        self._store: Store = Store(hass, STORAGE_VERSION, history_storage_key(entry))
+        # statistic_id -> {"end": ISO-tid för nästa timme att hämta, "sum": löpande summa
+        # före den timmen}; "end" ligger aldrig inom HISTORY_LATE_WINDOW
+        self._cursors: dict[str, dict[str, Any]] | None = None
+        self._lock = asyncio.Lock()
+        self.runs = 0
+        self.rows_imported = 0
+        self.failures = 0
+        self.last_run: datetime | None = None
+        self.last_duration: float | None = None
+
+    async def async_import(self, units: Iterable[UnitSnapshot]) -> None:
+        """Importera avslutade timmar sedan respektive markör.
+
+        Körs inte om en import redan pågår eller om servern saknar historik.
+        """
+        if self._lock.locked() or self._api.telemetry_supported is False:
+            return
+        async with self._lock:
+            started = time.monotonic()
+            if self._cursors is None:
+                self._cursors = await self._store.async_load() or {}
+            now = dt_util.utcnow()
+            before = now.replace(minute=0, second=0, microsecond=0)
+            imported, failures = self.rows_imported, self.failures
+            for unit in list(units):
+                for measure in ATW_MEASURES if unit.type == UNIT_TYPE_ATW else ATA_MEASURES:
+                    if not await self._async_import_measure(unit, measure, before):
+                        break
+                if self._api.telemetry_supported is False:
+                    break
+            await self._store.async_save(self._cursors)
+            self.runs += 1
+            self.last_run = now
+            self.last_duration = time.monotonic() - started
+            _LOGGER.debug(
+                "Importerade %d timmar historik på %.1f s, %d misslyckade hämtningar",
+                self.rows_imported - imported,
+                self.last_duration,
+                self.failures - failures,
+            )
+
+    async def _async_import_measure(
+        self, unit: UnitSnapshot, measure: HistoryMeasure, before: datetime
+    ) -> bool:
+        """Hämta och importera ett mätvärde. Returnera False om hämtningen misslyckades."""
+        assert self._cursors is not None
+        stat_id = statistic_id(unit.id, measure)
+        cursor = self._cursors.get(stat_id)
+        if cursor is None and (
+            cursor := await self._async_cursor_from_recorder(stat_id, measure)
+        ):
+            self._cursors[stat_id] = cursor
+        start = before - HISTORY_MAX_AGE
+        if cursor and (end := dt_util.parse_datetime(cursor["end"])) is not None:
+            start = max(start, end)
+        if start >= before:
+            return True
+        data = await self._api.get_telemetry(
+            unit.id, measure.telemetry, measure.measure, start, before
+        )
+        if data is None:
+            self.failures += 1
+            return False
+        total = cursor.get("sum", 0.0) if cursor else 0.0
+        rows, _ = hourly_statistics(
+            (s for s in parse_samples(data) if s[0] >= start), measure, before, total
+        )
+        settled = before - HISTORY_LATE_WINDOW
+        if settled > start:
+            # Timmar före fönstret räknas som slutgiltiga, även de utan data;
+            # summan vid markören tas från sista raden före fönstret
+            for row in rows:
+                if row["start"] >= settled:
+                    break
+                total = row.get("sum", 0.0)
+            self._cursors[stat_id] = {"end": settled.isoformat(), "sum": total}
+        if not rows:
+            return True
+        metadata = StatisticMetaData(
+            has_mean=not measure.has_sum,
+            has_sum=measure.has_sum,
+            name=f"{unit.name or unit.id} {measure.name}",
+            source=DOMAIN,
+            statistic_id=stat_id,
+            unit_of_measurement=measure.unit,
+        )
+        # Timmar i fönstret som importerats förut skrivs över med de nya summorna
+        async_add_external_statistics(self.hass, metadata, rows)
+        self.rows_imported += len(rows)
+        return True
+
+    async def _async_cursor_from_recorder(
+        self, stat_id: str, measure: HistoryMeasure
+    ) -> dict[str, Any] | None:
+        """Återskapa en markör från senast importerade rad, om lagringen gått förlorad.
+
+        Behövs för energi så att den löpande summan fortsätter i stället för att börja om.
+        """
+        last = await get_instance(self.hass).async_add_executor_job(
+            get_last_statistics, self.hass, 1, stat_id, False, {"sum"}
+        )
+        if not (rows := last.get(stat_id)):
+            return None
+        start = dt_util.utc_from_timestamp(rows[0]["start"])
+        return {
+            "end": (start + timedelta(hours=1)).isoformat(),
+            "sum": (rows[0].get("sum") or 0.0) if measure.has_sum else 0.0,
+        }
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returnera importens tillstånd."""
+        return {
+            "supported": self._api.telemetry_supported,
+            "runs": self.runs,
+            "rows_imported": self.rows_imported,
+            "failures": self.failures,
+            "statistics": len(self._cursors or {}),
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_duration": round(self.last_duration, 3) if self.last_duration else None,
+        }
+
+
+def history_storage_key(entry: ConfigEntry) -> str:
+    """Returnera lagringsnyckeln för en entrys historikmarkörer."""
+    return f"{DOMAIN}.{entry.entry_id}.history"
@@ -0,0 +1,136 @@
+"""Gemensamt register för alla MELCloud Home-konton."""
+from __future__ import annotations
+
+import logging
+from collections.abc import Iterable
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+from homeassistant.core import HomeAssistant
+
+from .const import DATA_HUB
+from .scheduler import PrioritySemaphore
+from .snapshot import UnitSnapshot
+
+if TYPE_CHECKING:
+    from . import MELCloudHomeCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+# Max antal samtidiga förfrågningar mot melcloudhome.com över alla konton
+GLOBAL_REQUEST_CONCURRENCY = 4
+# Förskjutning av pollschemat mellan konton
+ACCOUNT_STAGGER = timedelta(seconds=45)
+
+
+class MELCloudHomeHub:
+    """Delas av alla config entries.
+
+    Håller reda på vilket konto som äger varje enhet (enheter delade med
+    flera användare exponeras bara en gång), förskjuter kontonas
+    pollscheman och begränsar den totala samtidigheten mot molnet.
+    Indexet enhet -> konto används även för att routa tjänsteanrop.
+    """
+
+    def __init__(self) -> None:
+        """Initiera registret."""
+        self.request_semaphore = PrioritySemaphore(GLOBAL_REQUEST_CONCURRENCY)
+        self._entries: list[str] = []
+        self._unit_owners: dict[str, str] = {}
+        self._coordinators: dict[str, MELCloudHomeCoordinator] = {}
+
+    @property
+    def entry_count(self) -> int:
+        """Returnera antalet registrerade konton."""
+        return len(self._entries)
+
+    @property
+    def coordinators(self) -> list[MELCloudHomeCoordinator]:
+        """Returnera coordinatorerna för alla laddade konton."""
+        return list(self._coordinators.values())
+
+    def register_entry(self, entry_id: str) -> timedelta:
+        """Registrera ett konto och returnera dess förskjutning av pollschemat."""
+        if entry_id not in self._entries:
+            self._entries.append(entry_id)
+        return ACCOUNT_STAGGER * self._entries.index(entry_id)
+
+    def unregister_entry(self, entry_id: str) -> None:
+        """Avregistrera ett konto och släpp dess enheter till andra konton."""
+        if entry_id in self._entries:
+            self._entries.remove(entry_id)
+        self._coordinators.pop(entry_id, None)
+        released = [u for u, owner in self._unit_owners.items() if owner == entry_id]
+        for unit_id in released:
+            del self._unit_owners[unit_id]
+        if released:
+            # Övriga konton ska kunna ta över enheterna även om deras user context är oförändrad
+            for coordinator in self._coordinators.values():
+                coordinator.api.invalidate_user_context()
+
+    def attach_coordinator(self, entry_id: str, coordinator: MELCloudHomeCoordinator) -> None:
+        """Koppla ett registrerat kontos coordinator till registret."""
+        self._coordinators[entry_id] = coordinator
+
+    def resolve_units(
+        self,
+        unit_ids: Iterable[str] = (),
+        building_id: str | None = None,
+        unit_types: Iterable[str] | None = None,
+    ) -> tuple[dict[MELCloudHomeCoordinator, list[UnitSnapshot]], list[str]]:
+        """Slå upp enheter och gruppera dem per ägande coordinator.
+
+        Args:
+            unit_ids: Enheter som anges explicit
+            building_id: Ta även med alla enheter i byggnaden
+            unit_types: Begränsa till dessa enhetstyper
+
+        Returns:
+            Enheter per coordinator, och id:n som inte kunde routas
+        """
+        types = frozenset(unit_types) if unit_types is not None else None
+        routed: dict[MELCloudHomeCoordinator, dict[str, UnitSnapshot]] = {}
+        unknown = []
+        for unit_id in unit_ids:
+            owner = self._unit_owners.get(unit_id)
+            coordinator = self._coordinators.get(owner) if owner else None
+            unit = coordinator.get_unit(unit_id) if coordinator else None
+            if unit is None or (types is not None and unit.type not in types):
+                unknown.append(unit_id)
+                continue
+            routed.setdefault(coordinator, {})[unit_id] = unit
+        if building_id is not None:
+            for coordinator in self._coordinators.values():
+                for unit in coordinator.units.values():
+                    if unit.building_id == building_id and (types is None or unit.type in types):
+                        routed.setdefault(coordinator, {})[unit.id] = unit
+        return {coordinator: list(units.values()) for coordinator, units in routed.items()}, unknown
+
+    def claim_units(
+        self, entry_id: str, units: dict[str, UnitSnapshot]
+    ) -> dict[str, UnitSnapshot]:
+        """Gör anspråk på enheter och returnera dem som kontot äger.
+
+        Enheter som redan ägs av ett annat konto filtreras bort. Enheter
+        som kontot ägde men inte längre ser släpps.
+        """
+        for unit_id in [
+            u for u, owner in self._unit_owners.items() if owner == entry_id and u not in units
+        ]:
+            del self._unit_owners[unit_id]
+
+        owned = {}
+        for unit_id, unit in units.items():
+            owner = self._unit_owners.setdefault(unit_id, entry_id)
+            if owner == entry_id:
+                owned[unit_id] = unit
+            else:
+                _LOGGER.debug("Enhet %s hanteras redan av ett annat konto", unit_id)
+        return owned
+
+
+def async_get_hub(hass: HomeAssistant) -> MELCloudHomeHub:
+    """Hämta eller skapa det gemensamma registret."""
+    if (hub := hass.data.get(DATA_HUB)) is None:
+        hub = hass.data[DATA_HUB] = MELCloudHomeHub()
+    return hub
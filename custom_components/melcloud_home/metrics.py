@@ -0,0 +1,283 @@
+"""Mätvärden för förfrågningar och uppdateringar i MELCloud Home."""
+from __future__ import annotations
+
+from bisect import bisect_left
+from datetime import date
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+# Övre gränser (sekunder) för latenshistogrammet; sista hinken tar resten
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Endpoints som mäts var för sig
+ENDPOINT_LOGIN_PAGE = "login_page"
+ENDPOINT_LOGIN_SUBMIT = "login_submit"
+ENDPOINT_USER_CONTEXT = "user_context"
+ENDPOINT_UNIT_GET = "unit_get"
+ENDPOINT_UNIT_PUT = "unit_put"
+ENDPOINT_TELEMETRY = "telemetry"
+
+# Antal dagar som besparingar från villkorliga hämtningar sparas per dag
+SAVINGS_DAYS = 7
+
+
+def _bucket_labels() -> list[str]:
+    """Returnera etiketter för histogrammets hinkar."""
+    return [f"<={bound}s" for bound in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]}s"]
+
+
+@dataclass(slots=True)
+class EndpointMetrics:
+    """Räknare och latenshistogram för en endpoint."""
+
+    requests: int = 0
+    exceptions: int = 0
+    bytes_received: int = 0
+    max_payload: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+    status: dict[int, int] = field(default_factory=dict)
+    latency: list[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+
+    def record(self, status: int | None, elapsed: float, received: int = 0) -> None:
+        """Registrera en förfrågan. status None betyder att den avbröts av ett fel."""
+        self.requests += 1
+        if status is None:
+            self.exceptions += 1
+        else:
+            self.status[status] = self.status.get(status, 0) + 1
+        self.bytes_received += received
+        self.max_payload = max(self.max_payload, received)
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        self.latency[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returnera mätvärdena som en dict."""
+        return {
+            "requests": self.requests,
+            "exceptions": self.exceptions,
+            "status": {str(status): count for status, count in sorted(self.status.items())},
+            "bytes_received": self.bytes_received,
+            "max_payload": self.max_payload,
+            "mean_time": round(self.total_time / self.requests, 4) if self.requests else None,
+            "max_time": round(self.max_time, 4),
+            "latency": dict(zip(_bucket_labels(), self.latency)),
+        }
+
+
+@dataclass(slots=True)
+class WaitMetrics:
+    """Kötid innan förfrågningar i en prioritetsklass fick gå iväg."""
+
+    requests: int = 0
+    delayed: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    def record(self, waited: float) -> None:
+        """Registrera kötiden för en förfrågan."""
+        self.requests += 1
+        if waited > 0.001:
+            self.delayed += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returnera mätvärdena som en dict."""
+        return {
+            "requests": self.requests,
+            "delayed": self.delayed,
+            "mean_wait": round(self.total_wait / self.requests, 4) if self.requests else None,
+            "max_wait": round(self.max_wait, 4),
+        }
+
+
+class RequestMetrics:
+    """Mätvärden för API-klientens förfrågningar och inloggningar."""
+
+    def __init__(self) -> None:
+        """Initiera räknarna."""
+        self.endpoints: dict[str, EndpointMetrics] = {}
+        self.unauthorized = 0
+        self.rate_limited = 0
+        self.server_errors = 0
+        self.logins = 0
+        self.login_failures = 0
+        # Inloggningar som utlösts av 401 på en vanlig förfrågan
+        self.relogins = 0
+        # Inloggningar som förnyade sessionen i bakgrunden före utgång
+        self.proactive_logins = 0
+        # Total tid för JSON-avkodning, så att coordinatorn kan skilja den från nätverkstid
+        self.decode_time = 0.0
+        # Kötid per prioritetsklass (rate limit och global samtidighet)
+        self.waits: dict[str, WaitMetrics] = {}
+
+    def record(
+        self, endpoint: str, status: int | None, elapsed: float, received: int = 0
+    ) -> None:
+        """Registrera en förfrågan mot en endpoint."""
+        if (metrics := self.endpoints.get(endpoint)) is None:
+            metrics = self.endpoints[endpoint] = EndpointMetrics()
+        metrics.record(status, elapsed, received)
+        if status == 401:
+            self.unauthorized += 1
+        elif status == 429:
+            self.rate_limited += 1
+        elif status is not None and status >= 500:
+            self.server_errors += 1
+
+    def record_wait(self, priority: str, waited: float) -> None:
+        """Registrera hur länge en förfrågan väntade i kön."""
+        if (metrics := self.waits.get(priority)) is None:
+            metrics = self.waits[priority] = WaitMetrics()
+        metrics.record(waited)
+
+    def record_login(self, success: bool) -> None:
+        """Registrera ett genomfört inloggningsförsök."""
+        if success:
+            self.logins += 1
+        else:
+            self.login_failures += 1
+
+    @property
+    def errors(self) -> int:
+        """Returnera antalet 401-, 429- och 5xx-svar samt avbrutna förfrågningar."""
+        return (
+            self.unauthorized
+            + self.rate_limited
+            + self.server_errors
+            + sum(metrics.exceptions for metrics in self.endpoints.values())
+        )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returnera mätvärdena som en dict."""
+        return {
+            "endpoints": {
+                name: metrics.as_dict() for name, metrics in sorted(self.endpoints.items())
+            },
+            "unauthorized": self.unauthorized,
+            "rate_limited": self.rate_limited,
+            "server_errors": self.server_errors,
+            "logins": self.logins,
+            "login_failures": self.login_failures,
+            "relogins": self.relogins,
+            "proactive_logins": self.proactive_logins,
+            "decode_time": round(self.decode_time, 4),
+            "waits": {name: metrics.as_dict() for name, metrics in sorted(self.waits.items())},
+        }
+
+
+@dataclass(slots=True)
+class RefreshMetrics:
+    """Tider för coordinatorns uppdateringar, uppdelade i nätverk, avkodning och fan-out."""
+
+    refreshes: int = 0
+    failures: int = 0
+    last_network: float = 0.0
+    last_decode: float = 0.0
+    last_fan_out: float = 0.0
+    total_network: float = 0.0
+    total_decode: float = 0.0
+    total_fan_out: float = 0.0
+    max_duration: float = 0.0
+
+    @property
+    def last_duration(self) -> float:
+        """Returnera total tid för senaste uppdateringen."""
+        return self.last_network + self.last_decode + self.last_fan_out
+
+    def record_fetch(self, network: float, decode: float) -> None:
+        """Registrera hämtning och avkodning för en lyckad uppdatering."""
+        self.refreshes += 1
+        self.last_network = network
+        self.last_decode = decode
+        self.last_fan_out = 0.0
+        self.total_network += network
+        self.total_decode += decode
+
+    def record_fan_out(self, elapsed: float) -> None:
+        """Registrera tiden det tog att meddela entiteterna."""
+        self.last_fan_out += elapsed
+        self.total_fan_out += elapsed
+        self.max_duration = max(self.max_duration, self.last_duration)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returnera mätvärdena som en dict."""
+        return {
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "last": {
+                "network": round(self.last_network, 4),
+                "decode": round(self.last_decode, 4),
+                "fan_out": round(self.last_fan_out, 4),
+                "total": round(self.last_duration, 4),
+            },
+            "total": {
+                "network": round(self.total_network, 4),
+                "decode": round(self.total_decode, 4),
+                "fan_out": round(self.total_fan_out, 4),
+            },
+            "max_duration": round(self.max_duration, 4),
+        }
+
+
+@dataclass(slots=True)
+class WriteMetrics:
+    """Räknare för skrivningar, inklusive de som inte behövde skickas."""
+
+    # Fält som begärts av entiteter och tjänster
+    requested_fields: int = 0
+    # Fält som redan hade begärt värde och släpptes
+    dropped_fields: int = 0
+    # Skrivningar som hoppades över helt eftersom inget återstod att skicka
+    skipped_writes: int = 0
+    sent_writes: int = 0
+    failed_writes: int = 0
+    # Optimistiska värden som återställts efter en misslyckad skrivning
+    reverted_fields: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        """Returnera räknarna som en dict."""
+        return asdict(self)
+
+
+@dataclass(slots=True)
+class ConditionalFetchMetrics:
+    """Hämtningar av user context som inte behövde behandlas, med besparingar per dag."""
+
+    # Svar 304 från servern; ingen body hämtades
+    not_modified: int = 0
+    # Body med samma hash som förra gången; hämtad men inte avkodad
+    unchanged: int = 0
+    bytes_saved: int = 0
+    cpu_saved: float = 0.0
+    # Datum (ISO) -> [byte, CPU-sekunder] sparade den dagen
+    days: dict[str, list[float]] = field(default_factory=dict)
+
+    def record(self, not_modified: bool, bytes_saved: int, cpu_saved: float) -> None:
+        """Registrera en hämtning som kunde hoppas över."""
+        if not_modified:
+            self.not_modified += 1
+        else:
+            self.unchanged += 1
+        self.bytes_saved += bytes_saved
+        self.cpu_saved += cpu_saved
+        totals = self.days.setdefault(date.today().isoformat(), [0, 0.0])
+        totals[0] += bytes_saved
+        totals[1] += cpu_saved
+        for day in sorted(self.days)[:-SAVINGS_DAYS]:
+            del self.days[day]
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returnera mätvärdena som en dict."""
+        return {
+            "not_modified": self.not_modified,
+            "unchanged": self.unchanged,
+            "bytes_saved": self.bytes_saved,
+            "cpu_saved": round(self.cpu_saved, 4),
+            "days": {
+                day: {"bytes_saved": int(saved), "cpu_saved": round(cpu, 4)}
+                for day, (saved, cpu) in sorted(self.days.items())
+            },
+        }
@@ -8,9 +8,10 @@ from homeassistant.components.number import NumberEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import DOMAIN
+from .entity import MELCloudHomeEntity, async_setup_unit_entities
+from .snapshot import UNIT_TYPE_ATW, UnitSnapshot
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -20,54 +21,44 @@ async def async_setup_entry(
     entry: ConfigEntry,
     async_add_entities: AddEntitiesCallback,
 ) -> None:
-    data = hass.data[DOMAIN][entry.entry_id]
-    coordinator = data["coordinator"]
-    api = data["api"]
+    async_setup_unit_entities(hass, entry, async_add_entities, _unit_entities)
 
-    entities: list[NumberEntity] = []
-    for device in coordinator.data.get("devices", []):
-        if device.get("type") == "air_to_water" and device.get("capabilities", {}).get("hasHotWater", False):
-            entities.append(MELCloudTankSetTemperatureNumber(coordinator, api, device))
 
-    async_add_entities(entities)
+def _unit_entities(coordinator, unit: UnitSnapshot) -> list[NumberEntity]:
+    if unit.type == UNIT_TYPE_ATW and unit.capabilities.get("hasHotWater", False):
+        return [MELCloudTankSetTemperatureNumber(coordinator, unit)]
+    return []
 
 
-class MELCloudTankSetTemperatureNumber(CoordinatorEntity, NumberEntity):
+class MELCloudTankSetTemperatureNumber(MELCloudHomeEntity, NumberEntity):
     _attr_has_entity_name = True
     _attr_translation_key = "tank_target"
+    _setting_keys = ("SetTankWaterTemperature",)
 
-    def __init__(self, coordinator, api, device: dict[str, Any]) -> None:
-        super().__init__(coordinator)
-        self._api = api
-        self._device = device
-        self._device_id = device["id"]
+    def __init__(self, coordinator, unit: UnitSnapshot) -> None:
+        super().__init__(coordinator, unit.id)
+        self._device_name = unit.name or "ATW Heat Pump"
         self._attr_unique_id = f"{self._device_id}_tank_set_temp"
-        caps = device.get("capabilities", {})
+        caps = unit.capabilities
         self._attr_min_value = caps.get("minSetTankTemperature", 30)
         self._attr_max_value = caps.get("maxSetTankTemperature", 60)
         self._attr_step = max(1.0, float(caps.get("temperatureIncrement", 1) or 1))
 
     @property
     def native_value(self) -> float | None:
-        for d in self.coordinator.data.get("devices", []):
-            if d["id"] == self._device_id:
-                for s in d.get("settings", []):
-                    if s.get("name") == "SetTankWaterTemperature":
-                        try:
-                            return float(s.get("value"))
-                        except (TypeError, ValueError):
-                            return None
+        value = self.coordinator.get_setting(self._device_id, "SetTankWaterTemperature")
+        if isinstance(value, float):
+            return value
         return None
 
     @property
     def device_info(self) -> dict[str, Any]:
         return {
             "identifiers": {(DOMAIN, self._device_id)},
-            "name": self._device.get("givenDisplayName", "ATW Heat Pump"),
+            "name": self._device_name,
             "manufacturer": "Mitsubishi Electric",
             "model": "ATW Heat Pump",
         }
 
     async def async_set_native_value(self, value: float) -> None:
-        await self._api.set_atw_state(self._device_id, {"setTankWaterTemperature": int(value)})
-        await self.coordinator.async_request_refresh()
+        await self._async_write({"setTankWaterTemperature": int(value)})
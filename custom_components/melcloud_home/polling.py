@@ -0,0 +1,78 @@
+"""Adaptivt pollintervall för MELCloud Home."""
+from __future__ import annotations
+
+import random
+import time
+from datetime import timedelta
+
+# Snabb pollning en kort stund efter en ändring
+FAST_INTERVAL = timedelta(seconds=30)
+FAST_WINDOW = timedelta(minutes=3)
+# Normalt intervall när enheterna styrs, och taket när inget styrs
+BASE_INTERVAL = timedelta(minutes=5)
+MAX_IDLE_INTERVAL = timedelta(minutes=30)
+# Tak för backoff vid 429/5xx
+MAX_BACKOFF_INTERVAL = timedelta(hours=1)
+BACKOFF_JITTER = 0.2
+
+
+class AdaptivePollInterval:
+    """Räknar ut nästa pollintervall utifrån skrivningar, ändringar och fel."""
+
+    def __init__(self) -> None:
+        """Initiera schemaläggaren."""
+        self.current = BASE_INTERVAL
+        self._fast_until = 0.0
+        self._idle_polls = 0
+        self._backoff_errors = 0
+
+    @property
+    def fast_polling(self) -> bool:
+        """Returnera om vi är i snabbpollningsfönstret efter en skrivning."""
+        return time.monotonic() < self._fast_until
+
+    def note_write(self) -> timedelta:
+        """Registrera en skrivning; pollar snabbt en stund framåt."""
+        self._fast_until = time.monotonic() + FAST_WINDOW.total_seconds()
+        self._idle_polls = 0
+        self.current = FAST_INTERVAL
+        return self.current
+
+    def note_success(self, changed: bool) -> timedelta:
+        """Registrera en lyckad uppdatering och returnera nästa intervall.
+
+        Args:
+            changed: Om börvärden, lägen eller på/av ändrats sedan förra
+                uppdateringen; ändrade mätvärden ska inte räknas
+        """
+        self._backoff_errors = 0
+        if changed:
+            self._idle_polls = 0
+        elif BASE_INTERVAL * 2 ** self._idle_polls < MAX_IDLE_INTERVAL:
+            # Räkna bara tills taket nåtts, annars växer exponenten obegränsat
+            self._idle_polls += 1
+
+        if self.fast_polling:
+            self.current = FAST_INTERVAL
+        else:
+            # Dubbla intervallet för varje oförändrad uppdatering upp till taket
+            self.current = min(BASE_INTERVAL * 2 ** self._idle_polls, MAX_IDLE_INTERVAL)
+        return self.current
+
+    def note_error(self, status: int | None, retry_after: float | None = None) -> timedelta:
+        """Registrera ett fel och returnera nästa intervall.
+
+        Vid 429/5xx backar vi av exponentiellt med jitter och respekterar
+        Retry-After. Andra fel behåller nuvarande intervall.
+        """
+        if status is None or (status != 429 and status < 500):
+            return self.current
+
+        self._backoff_errors += 1
+        backoff = min(
+            BASE_INTERVAL * 2 ** (self._backoff_errors - 1), MAX_BACKOFF_INTERVAL
+        ) * random.uniform(1 - BACKOFF_JITTER, 1 + BACKOFF_JITTER)
+        if retry_after is not None:
+            backoff = max(backoff, timedelta(seconds=retry_after))
+        self.current = backoff
+        return self.current
@@ -0,0 +1,141 @@
+"""Profilering av MELCloud Home på event-loopen, aktiveras vid behov.
+
+När profileringen är på mäts varje plattforms del av fan-out, callbacks
+som tar längre tid än en tröskel flaggas, och var N:e uppdatering körs
+under cProfile. Resultatet kan laddas ned via diagnostiken.
+"""
+from __future__ import annotations
+
+import cProfile
+import io
+import logging
+import pstats
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+_LOGGER = logging.getLogger(__name__)
+
+# Standardtröskel för en enskild callback på event-loopen
+SLOW_CALLBACK_THRESHOLD = 0.05
+# Var N:e uppdatering profileras med cProfile
+PROFILE_SAMPLE_INTERVAL = 10
+# Antal funktioner i profilens sammanställning
+PROFILE_TOP_FUNCTIONS = 40
+# Antal långsamma callbacks som sparas
+SLOW_CALLBACK_HISTORY = 25
+
+
+class RefreshProfiler:
+    """Tider per plattform, långsamma callbacks och stickprov med cProfile."""
+
+    def __init__(self) -> None:
+        """Initiera profileraren, avstängd."""
+        self.enabled = False
+        self.slow_callback_threshold = SLOW_CALLBACK_THRESHOLD
+        self.sample_interval = PROFILE_SAMPLE_INTERVAL
+        self._refreshes = 0
+        # Plattform -> [callbacks, senaste fan-out, total tid, max per callback]
+        self._platforms: dict[str, list[float]] = {}
+        self.slow_callbacks: deque[dict[str, Any]] = deque(maxlen=SLOW_CALLBACK_HISTORY)
+        self.last_profile: str | None = None
+        self.last_profile_at: float | None = None
+
+    def enable(
+        self,
+        slow_callback_threshold: float = SLOW_CALLBACK_THRESHOLD,
+        sample_interval: int = PROFILE_SAMPLE_INTERVAL,
+    ) -> None:
+        """Slå på profileringen; nästa uppdatering profileras direkt."""
+        self.enabled = True
+        self.slow_callback_threshold = slow_callback_threshold
+        self.sample_interval = sample_interval
+        self._refreshes = 0
+
+    def disable(self) -> None:
+        """Slå av profileringen och släpp insamlade data."""
+        self.enabled = False
+        self._platforms.clear()
+        self.slow_callbacks.clear()
+        self.last_profile = None
+        self.last_profile_at = None
+
+    @contextmanager
+    def profile_refresh(self) -> Iterator[None]:
+        """Kör with-blocket under cProfile om det är denna uppdaterings tur.
+
+        Allt som körs på event-loopen under tiden kommer med, även andra
+        integrationer, vilket är avsikten: det är loopen som ska frias.
+        """
+        sampled = self.enabled and self._refreshes % self.sample_interval == 0
+        self._refreshes += 1
+        if not sampled:
+            yield
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # En annan profilerare är redan aktiv i tråden
+            _LOGGER.debug("Kunde inte starta cProfile, en annan profilerare är aktiv")
+            yield
+            return
+        try:
+            yield
+        finally:
+            profiler.disable()
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats(
+                pstats.SortKey.CUMULATIVE
+            ).print_stats(PROFILE_TOP_FUNCTIONS)
+            self.last_profile = output.getvalue()
+            self.last_profile_at = time.time()
+
+    def run_listeners(self, listeners: list[Callable[[], None]]) -> None:
+        """Anropa lyssnarna och mät var och en."""
+        fan_out: dict[str, float] = {}
+        for update_callback in listeners:
+            started = time.perf_counter()
+            update_callback()
+            elapsed = time.perf_counter() - started
+            entity = getattr(update_callback, "__self__", None)
+            entity_id = getattr(entity, "entity_id", None) or repr(update_callback)
+            platform = entity_id.split(".", 1)[0] if "." in entity_id else "other"
+            stats = self._platforms.setdefault(platform, [0, 0.0, 0.0, 0.0])
+            stats[0] += 1
+            stats[2] += elapsed
+            stats[3] = max(stats[3], elapsed)
+            fan_out[platform] = fan_out.get(platform, 0.0) + elapsed
+            if elapsed > self.slow_callback_threshold:
+                _LOGGER.warning(
+                    "Långsam callback för %s: %.1f ms", entity_id, elapsed * 1000
+                )
+                self.slow_callbacks.append(
+                    {"entity_id": entity_id, "duration": round(elapsed, 4), "at": time.time()}
+                )
+        for platform, elapsed in fan_out.items():
+            self._platforms[platform][1] = elapsed
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returnera profileringens resultat."""
+        return {
+            "enabled": self.enabled,
+            "slow_callback_threshold": self.slow_callback_threshold,
+            "sample_interval": self.sample_interval,
+            "fan_out": {
+                platform: {
+                    "callbacks": int(callbacks),
+                    "last": round(last, 4),
+                    "total": round(total, 4),
+                    "max_callback": round(slowest, 4),
+                }
+                for platform, (callbacks, last, total, slowest) in sorted(
+                    self._platforms.items()
+                )
+            },
+            "slow_callbacks": list(self.slow_callbacks),
+            "last_profile_at": self.last_profile_at,
+            "last_profile": self.last_profile.splitlines() if self.last_profile else None,
+        }
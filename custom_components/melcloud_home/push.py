@@ -0,0 +1,161 @@
+"""Push-kanal för live-uppdateringar från MELCloud Home.
+
+Kanalen är en websocket som skickar enhetsdeltor i samma format som API:t:
+``{"unitId": "...", "settings": [{"name": "...", "value": "..."}]}``,
+eventuellt med ``isConnected``. Saknar servern kanalen fortsätter
+integrationen att polla som vanligt.
+
+Protokollet är inte bekräftat mot molnet, så kanalen startas bara när
+den slagits på under inställningarna, och meddelanden med fel form loggas
+och hoppas över i stället för att stoppa kanalen.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+import time
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any
+
+import aiohttp
+
+if TYPE_CHECKING:
+    from .api import MelCloudHomeCookieAPI
+
+_LOGGER = logging.getLogger(__name__)
+
+# Väntetid före återanslutning, dubblas upp till taket vid upprepade fel
+PUSH_BACKOFF_MIN = 1.0
+PUSH_BACKOFF_MAX = 300.0
+PUSH_BACKOFF_JITTER = 0.2
+# En anslutning som hållit så här länge räknas som stabil och nollställer backoff
+PUSH_STABLE_AFTER = 60.0
+
+
+class PushChannel:
+    """Håller push-kanalen uppe och lämnar deltor vidare till coordinatorn."""
+
+    def __init__(
+        self,
+        api: MelCloudHomeCookieAPI,
+        on_delta: Callable[[dict[str, Any]], None],
+        on_connection_change: Callable[[bool], None],
+    ) -> None:
+        """Initiera kanalen.
+
+        Args:
+            api: API-klienten som öppnar anslutningen
+            on_delta: Anropas med varje enhetsdelta
+            on_connection_change: Anropas med True vid anslutning och False när den bryts
+        """
+        self._api = api
+        self._on_delta = on_delta
+        self._on_connection_change = on_connection_change
+        self._backoff = PUSH_BACKOFF_MIN
+        self.connected = False
+        self.connects = 0
+        self.disconnects = 0
+        self.deltas = 0
+        self.invalid_messages = 0
+
+    async def async_run(self) -> None:
+        """Håll kanalen uppe tills uppgiften avbryts eller servern saknar push."""
+        while True:
+            try:
+                ws = await self._api.async_connect_push()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                _LOGGER.debug("Kunde inte ansluta push-kanalen: %s", err)
+                ws = None
+            if ws is not None:
+                await self._async_listen(ws)
+            elif self._api.push_supported is False:
+                _LOGGER.info("Servern saknar push-kanal, fortsätter med pollning")
+                return
+            await asyncio.sleep(self._next_backoff())
+
+    async def _async_listen(self, ws: aiohttp.ClientWebSocketResponse) -> None:
+        """Ta emot meddelanden tills anslutningen bryts."""
+        _LOGGER.debug("Push-kanalen ansluten")
+        started = time.monotonic()
+        self.connected = True
+        self.connects += 1
+        self._on_connection_change(True)
+        try:
+            async for message in ws:
+                if message.type is aiohttp.WSMsgType.TEXT:
+                    self._handle_message(message.data)
+                elif message.type is aiohttp.WSMsgType.ERROR:
+                    _LOGGER.debug("Fel på push-kanalen: %s", ws.exception())
+                    break
+        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+            _LOGGER.debug("Fel på push-kanalen: %s", err)
+        finally:
+            self.connected = False
+            await ws.close()
+        self.disconnects += 1
+        _LOGGER.debug("Push-kanalen bröts")
+        if time.monotonic() - started >= PUSH_STABLE_AFTER:
+            self._backoff = PUSH_BACKOFF_MIN
+        self._on_connection_change(False)
+
+    def _handle_message(self, data: str) -> None:
+        """Tolka ett meddelande med en eller flera deltor.
+
+        Meddelanden och deltor med fel form räknas och loggas men stoppar
+        aldrig kanalen.
+        """
+        try:
+            payload = json.loads(data)
+        except ValueError:
+            self._invalid("inte JSON", data)
+            return
+        for delta in payload if isinstance(payload, list) else [payload]:
+            if not _valid_delta(delta):
+                self._invalid("okänd form", delta)
+                continue
+            self.deltas += 1
+            try:
+                self._on_delta(delta)
+            except Exception:
+                _LOGGER.exception("Kunde inte applicera delta från push-kanalen: %.200s", delta)
+
+    def _invalid(self, reason: str, data: Any) -> None:
+        """Räkna och logga ett meddelande som hoppas över."""
+        self.invalid_messages += 1
+        _LOGGER.debug("Hoppar över meddelande på push-kanalen (%s): %.200s", reason, data)
+
+    def _next_backoff(self) -> float:
+        """Returnera väntetiden före nästa försök och dubbla den till nästa gång."""
+        delay = self._backoff * random.uniform(1 - PUSH_BACKOFF_JITTER, 1 + PUSH_BACKOFF_JITTER)
+        self._backoff = min(self._backoff * 2, PUSH_BACKOFF_MAX)
+        return delay
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returnera kanalens tillstånd."""
+        return {
+            "supported": self._api.push_supported,
+            "connected": self.connected,
+            "connects": self.connects,
+            "disconnects": self.disconnects,
+            "deltas": self.deltas,
+            "invalid_messages": self.invalid_messages,
+        }
+
+
+def _valid_delta(delta: Any) -> bool:
+    """Returnera om en delta har formen som coordinatorn förväntar sig.
+
+    unitId ska vara en sträng och settings, om den finns, en lista med
+    objekt vars namn är strängar.
+    """
+    if not isinstance(delta, dict) or not isinstance(delta.get("unitId"), str):
+        return False
+    settings = delta.get("settings")
+    if settings is None:
+        return True
+    return isinstance(settings, list) and all(
+        isinstance(setting, dict) and isinstance(setting.get("name"), str)
+        for setting in settings
+    )
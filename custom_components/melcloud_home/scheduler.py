@@ -0,0 +1,188 @@
+"""Prioriterad schemaläggning av utgående förfrågningar för MELCloud Home.
+
+Två byggstenar:
+
+* RequestScheduler: token bucket per konto. Förfrågningar som måste vänta
+  på en token släpps i prioritetsordning.
+* PrioritySemaphore: begränsar samtidiga förfrågningar över alla konton;
+  lediga platser går till den högst prioriterade väntande förfrågan.
+
+Lägre värde betyder högre prioritet, så att pollning alltid väntar in
+skrivningar och bakgrundsarbete, som historikimport, väntar in pollning.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import heapq
+import itertools
+import time
+from collections.abc import AsyncIterator
+from typing import Any
+
+# Prioritetsklasser
+PRIORITY_INTERACTIVE = 0
+PRIORITY_AUTOMATION = 1
+PRIORITY_POLL = 2
+PRIORITY_BACKGROUND = 3
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_AUTOMATION: "automation",
+    PRIORITY_POLL: "poll",
+    PRIORITY_BACKGROUND: "background",
+}
+
+# Standardgräns per konto: förfrågningar per sekund och största skur
+REQUEST_RATE = 2.0
+REQUEST_BURST = 10
+
+
+class _PriorityWaiters:
+    """Kö av futures ordnad efter prioritet och sedan ankomst."""
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return sum(1 for *_, future in self._heap if not future.done())
+
+    def push(self, priority: int) -> asyncio.Future[None]:
+        """Lägg till en väntande och returnera dess future."""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (priority, next(self._sequence), future))
+        return future
+
+    def peek(self) -> asyncio.Future[None] | None:
+        """Returnera den högst prioriterade väntande som inte avbrutits."""
+        while self._heap and self._heap[0][2].done():
+            heapq.heappop(self._heap)
+        return self._heap[0][2] if self._heap else None
+
+    def wake(self) -> bool:
+        """Väck den högst prioriterade väntande; returnera om någon fanns."""
+        if (future := self.peek()) is None:
+            return False
+        heapq.heappop(self._heap)
+        future.set_result(None)
+        return True
+
+
+class PrioritySemaphore:
+    """Semafor där lediga platser går till högst prioriterade väntande."""
+
+    def __init__(self, value: int) -> None:
+        """Initiera semaforen med `value` platser."""
+        self._value = value
+        self._waiters = _PriorityWaiters()
+
+    async def acquire(self, priority: int = PRIORITY_POLL) -> None:
+        """Vänta på en plats."""
+        if self._value > 0 and self._waiters.peek() is None:
+            self._value -= 1
+            return
+        future = self._waiters.push(priority)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Platsen hann tilldelas; lämna den vidare
+                self.release()
+            raise
+
+    def release(self) -> None:
+        """Lämna tillbaka en plats."""
+        if not self._waiters.wake():
+            self._value += 1
+
+    @contextlib.asynccontextmanager
+    async def hold(self, priority: int = PRIORITY_POLL) -> AsyncIterator[None]:
+        """Håll en plats under with-blocket."""
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class RequestScheduler:
+    """Token bucket per konto med prioriterad kö.
+
+    Utan väntande förfrågningar och med en token kvar släpps en förfrågan
+    direkt. Annars köas den och släpps i prioritetsordning när nya
+    tokens fylls på.
+    """
+
+    def __init__(self, rate: float | None = REQUEST_RATE, burst: int = REQUEST_BURST) -> None:
+        """Initiera schemaläggaren.
+
+        Args:
+            rate: Tokens per sekund, None stänger av begränsningen
+            burst: Största antal tokens, dvs. största skur
+        """
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._waiters = _PriorityWaiters()
+        self._wakeup: asyncio.TimerHandle | None = None
+        # Förfrågningar som fick vänta på en token, och största kölängd
+        self.throttled = 0
+        self.max_depth = 0
+
+    @property
+    def depth(self) -> int:
+        """Returnera antalet förfrågningar som väntar."""
+        return len(self._waiters)
+
+    async def acquire(self, priority: int = PRIORITY_POLL) -> None:
+        """Vänta tills förfrågan får gå iväg."""
+        if self._waiters.peek() is None and self._take_token():
+            return
+        self.throttled += 1
+        future = self._waiters.push(priority)
+        self.max_depth = max(self.max_depth, self.depth)
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Token hann tilldelas men används inte
+                self._tokens = min(self._burst, self._tokens + 1)
+            self._dispatch()
+            raise
+
+    def _take_token(self) -> bool:
+        """Ta en token om det finns någon."""
+        if self._rate is None:
+            return True
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def _dispatch(self) -> None:
+        """Släpp väntande så länge det finns tokens, och planera nästa väckning."""
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+        while self._waiters.peek() is not None:
+            if not self._take_token():
+                delay = (1 - self._tokens) / self._rate
+                self._wakeup = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            self._waiters.wake()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returnera schemaläggarens tillstånd."""
+        return {
+            "rate": self._rate,
+            "burst": self._burst,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "throttled": self.throttled,
+        }
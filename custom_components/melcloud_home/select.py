@@ -8,9 +8,10 @@ from homeassistant.components.select import SelectEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import DOMAIN
+from .entity import MELCloudHomeEntity, async_setup_unit_entities
+from .snapshot import UNIT_TYPE_ATW, UnitSnapshot
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -22,51 +23,44 @@ async def async_setup_entry(
     entry: ConfigEntry,
     async_add_entities: AddEntitiesCallback,
 ) -> None:
-    data = hass.data[DOMAIN][entry.entry_id]
-    coordinator = data["coordinator"]
-    api = data["api"]
+    async_setup_unit_entities(hass, entry, async_add_entities, _unit_entities)
 
-    entities: list[SelectEntity] = []
-    for device in coordinator.data.get("devices", []):
-        if device.get("type") == "air_to_water":
-            entities.append(MELCloudOperationModeZone1Select(coordinator, api, device))
 
-    async_add_entities(entities)
+def _unit_entities(coordinator, unit: UnitSnapshot) -> list[SelectEntity]:
+    if unit.type == UNIT_TYPE_ATW:
+        return [MELCloudOperationModeZone1Select(coordinator, unit)]
+    return []
 
 
-class MELCloudOperationModeZone1Select(CoordinatorEntity, SelectEntity):
+class MELCloudOperationModeZone1Select(MELCloudHomeEntity, SelectEntity):
     _attr_has_entity_name = True
     _attr_options = MODES
     _attr_translation_key = "zone1_mode"
+    _setting_keys = ("OperationModeZone1",)
 
-    def __init__(self, coordinator, api, device: dict[str, Any]) -> None:
-        super().__init__(coordinator)
-        self._api = api
-        self._device = device
-        self._device_id = device["id"]
+    def __init__(self, coordinator, unit: UnitSnapshot) -> None:
+        super().__init__(coordinator, unit.id)
+        self._device_name = unit.name or "ATW Heat Pump"
         self._attr_unique_id = f"{self._device_id}_zone1_mode"
 
     @property
     def current_option(self) -> str | None:
-        for d in self.coordinator.data.get("devices", []):
-            if d["id"] == self._device_id:
-                for s in d.get("settings", []):
-                    if s.get("name") == "OperationModeZone1":
-                        return str(s.get("value"))
-        return None
+        value = self.coordinator.get_setting(self._device_id, "OperationModeZone1")
+        if value is None:
+            return None
+        return str(value)
 
     async def async_select_option(self, option: str) -> None:
         if option not in MODES:
             _LOGGER.error("Invalid Zone1 mode: %s", option)
             return
-        await self._api.set_atw_state(self._device_id, {"operationModeZone1": option})
-        await self.coordinator.async_request_refresh()
+        await self._async_write({"operationModeZone1": option})
 
     @property
     def device_info(self) -> dict[str, Any]:
         return {
             "identifiers": {(DOMAIN, self._device_id)},
-            "name": self._device.get("givenDisplayName", "ATW Heat Pump"),
+            "name": self._device_name,
             "manufacturer": "Mitsubishi Electric",
             "model": "ATW Heat Pump",
         }
@@ -10,12 +10,14 @@ from homeassistant.components.sensor import (
     SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import UnitOfTemperature
+from homeassistant.const import EntityCategory, UnitOfTemperature, UnitOfTime
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import DOMAIN
+from .entity import MELCloudHomeEntity, async_setup_unit_entities
+from .snapshot import UNIT_TYPE_ATA, UNIT_TYPE_ATW, UnitSnapshot
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -29,50 +31,60 @@ async def async_setup_entry(
     data = hass.data[DOMAIN][entry.entry_id]
     coordinator = data["coordinator"]
     
-    entities = []
-    devices = coordinator.data.get("devices", [])
+    # Sensorer för både ATW och ATA enheter, även enheter som tillkommer senare
+    async_setup_unit_entities(hass, entry, async_add_entities, _unit_sensors)
     
-    # Skapa sensorer för både ATW och ATA enheter
-    for device in devices:
-        device_id = device["id"]
-        device_name = device.get("givenDisplayName", "Heat Pump")
-        device_type = device.get("type")
-        
-        # Kontrollera vilka sensorer som finns tillgängliga
-        settings_dict = {s["name"]: s["value"] for s in device.get("settings", [])}
-        
-        if device_type == "air_to_water":
-            # ATW sensorer
-            if "RoomTemperatureZone1" in settings_dict:
-                entities.append(
-                    MELCloudHomeTemperatureSensor(
-                        coordinator, device_id, device_name, "room_temperature",
-                        "RoomTemperatureZone1"
-                    )
-                )
-            
-            if "TankWaterTemperature" in settings_dict:
-                entities.append(
-                    MELCloudHomeTemperatureSensor(
-                        coordinator, device_id, device_name, "tank_water_temperature",
-                        "TankWaterTemperature"
-                    )
+    async_add_entities(
+        [
+            MELCloudHomePollIntervalSensor(coordinator, entry),
+            MELCloudHomeRefreshDurationSensor(coordinator, entry),
+            MELCloudHomeRequestErrorsSensor(coordinator, entry),
+        ]
+    )
+
+
+def _unit_sensors(coordinator, unit: UnitSnapshot) -> list[SensorEntity]:
+    """Skapa sensorer för en enhet."""
+    entities: list[SensorEntity] = []
+    device_id = unit.id
+    device_name = unit.name or "Heat Pump"
+    device_type = unit.type
+    
+    # Kontrollera vilka sensorer som finns tillgängliga
+    settings_dict = unit.settings
+    
+    if device_type == UNIT_TYPE_ATW:
+        # ATW sensorer
+        if "RoomTemperatureZone1" in settings_dict:
+            entities.append(
+                MELCloudHomeTemperatureSensor(
+                    coordinator, device_id, device_name, "room_temperature",
+                    "RoomTemperatureZone1"
                 )
+            )
         
-        elif device_type == "air_to_air":
-            # ATA sensorer
-            if "RoomTemperature" in settings_dict:
-                entities.append(
-                    MELCloudHomeTemperatureSensor(
-                        coordinator, device_id, device_name, "room_temperature",
-                        "RoomTemperature"
-                    )
+        if "TankWaterTemperature" in settings_dict:
+            entities.append(
+                MELCloudHomeTemperatureSensor(
+                    coordinator, device_id, device_name, "tank_water_temperature",
+                    "TankWaterTemperature"
+                )
+            )
+    
+    elif device_type == UNIT_TYPE_ATA:
+        # ATA sensorer
+        if "RoomTemperature" in settings_dict:
+            entities.append(
+                MELCloudHomeTemperatureSensor(
+                    coordinator, device_id, device_name, "room_temperature",
+                    "RoomTemperature"
                 )
+            )
     
-    async_add_entities(entities)
+    return entities
 
 
-class MELCloudHomeTemperatureSensor(CoordinatorEntity, SensorEntity):
+class MELCloudHomeTemperatureSensor(MELCloudHomeEntity, SensorEntity):
     """Temperatursensor för MELCloud Home."""
 
     _attr_device_class = SensorDeviceClass.TEMPERATURE
@@ -89,10 +101,10 @@ class MELCloudHomeTemperatureSensor(CoordinatorEntity, SensorEntity):
         data_key: str,
     ) -> None:
         """Initiera sensorn."""
-        super().__init__(coordinator)
-        self._unit_id = unit_id
+        super().__init__(coordinator, unit_id)
         self._sensor_type = sensor_type
         self._data_key = data_key
+        self._setting_keys = (data_key,)
         self._attr_unique_id = f"{unit_id}_{sensor_type}"
         self._attr_translation_key = sensor_type
 
@@ -100,20 +112,105 @@ class MELCloudHomeTemperatureSensor(CoordinatorEntity, SensorEntity):
     def device_info(self):
         """Returnera enhetsinformation."""
         return {
-            "identifiers": {(DOMAIN, self._unit_id)},
+            "identifiers": {(DOMAIN, self._device_id)},
         }
 
     @property
     def native_value(self) -> float | None:
         """Returnera sensorvärdet."""
-        devices = self.coordinator.data.get("devices", [])
-        for device in devices:
-            if device["id"] == self._unit_id:
-                for setting in device.get("settings", []):
-                    if setting.get("name") == self._data_key:
-                        value = setting.get("value")
-                        try:
-                            return float(value)
-                        except (ValueError, TypeError):
-                            return None
+        value = self.coordinator.get_setting(self._device_id, self._data_key)
+        if isinstance(value, float):
+            return value
         return None
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Returnera rullande medelvärde, lutning och tid till börvärdet."""
+        return {
+            **self.coordinator.unit_trend(self._device_id, self._data_key),
+            **self._stale_attributes(),
+        } or None
+
+
+class MELCloudHomePollIntervalSensor(CoordinatorEntity, SensorEntity):
+    """Diagnostiksensor som visar coordinatorns nuvarande pollintervall."""
+
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_native_unit_of_measurement = UnitOfTime.SECONDS
+    _attr_has_entity_name = True
+    _attr_translation_key = "poll_interval"
+
+    def __init__(self, coordinator, entry: ConfigEntry) -> None:
+        """Initiera sensorn."""
+        super().__init__(coordinator)
+        self._attr_unique_id = f"{entry.entry_id}_poll_interval"
+
+    @property
+    def native_value(self) -> float:
+        """Returnera pollintervallet i sekunder."""
+        return self.coordinator.poll_interval.total_seconds()
+
+
+class MELCloudHomeRefreshDurationSensor(CoordinatorEntity, SensorEntity):
+    """Diagnostiksensor som visar hur lång tid senaste uppdateringen tog."""
+
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_native_unit_of_measurement = UnitOfTime.SECONDS
+    _attr_suggested_display_precision = 3
+    _attr_has_entity_name = True
+    _attr_translation_key = "refresh_duration"
+
+    def __init__(self, coordinator, entry: ConfigEntry) -> None:
+        """Initiera sensorn."""
+        super().__init__(coordinator)
+        self._attr_unique_id = f"{entry.entry_id}_refresh_duration"
+
+    @property
+    def native_value(self) -> float:
+        """Returnera tiden för senaste uppdateringen i sekunder."""
+        return round(self.coordinator.refresh_metrics.last_duration, 4)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Returnera tiden uppdelad i nätverk, avkodning och fan-out."""
+        metrics = self.coordinator.refresh_metrics
+        return {
+            "network": round(metrics.last_network, 4),
+            "decode": round(metrics.last_decode, 4),
+            "fan_out": round(metrics.last_fan_out, 4),
+        }
+
+
+class MELCloudHomeRequestErrorsSensor(CoordinatorEntity, SensorEntity):
+    """Diagnostiksensor som räknar misslyckade förfrågningar mot API:t."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_has_entity_name = True
+    _attr_translation_key = "request_errors"
+
+    def __init__(self, coordinator, entry: ConfigEntry) -> None:
+        """Initiera sensorn."""
+        super().__init__(coordinator)
+        self._attr_unique_id = f"{entry.entry_id}_request_errors"
+
+    @property
+    def native_value(self) -> int:
+        """Returnera antalet fel sedan start."""
+        return self.coordinator.api.metrics.errors
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Returnera fel per typ och antal inloggningar."""
+        metrics = self.coordinator.api.metrics
+        return {
+            "unauthorized": metrics.unauthorized,
+            "rate_limited": metrics.rate_limited,
+            "server_errors": metrics.server_errors,
+            "relogins": metrics.relogins,
+            "login_failures": metrics.login_failures,
+        }
@@ -0,0 +1,216 @@
+"""Tjänster för MELCloud Home.
+
+Tjänsterna registreras en gång för alla konton och tar en eller flera
+enheter och/eller ett byggnads-id. Varje enhet routas via registrets index
+till kontot som äger den, och ändringarna skickas som parallella PUT:ar
+följda av en uppdatering per berört konto.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Callable
+from typing import Any
+
+import voluptuous as vol
+
+from homeassistant.const import ATTR_TEMPERATURE
+from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
+from homeassistant.helpers import config_validation as cv
+
+from .cassette import CassetteRecorder
+from .const import DOMAIN
+from .hub import async_get_hub
+from .profiling import PROFILE_SAMPLE_INTERVAL, SLOW_CALLBACK_THRESHOLD
+from .scheduler import PRIORITY_AUTOMATION, PRIORITY_INTERACTIVE
+from .snapshot import UNIT_TYPE_ATA, UNIT_TYPE_ATW, UnitSnapshot
+
+_LOGGER = logging.getLogger(__name__)
+
+ATTR_UNIT_ID = "unit_id"
+ATTR_BUILDING_ID = "building_id"
+ATTR_UNIT_TYPE = "unit_type"
+ATTR_ENABLED = "enabled"
+ATTR_MODE = "mode"
+ATTR_SLOW_CALLBACK_THRESHOLD = "slow_callback_threshold"
+ATTR_SAMPLE_INTERVAL = "sample_interval"
+
+SERVICE_SET_TEMPERATURE = "set_temperature"
+SERVICE_SET_TANK_WATER_TEMPERATURE = "set_tank_water_temperature"
+SERVICE_SET_FORCED_HOT_WATER = "set_forced_hot_water"
+SERVICE_SET_OPERATION_MODE_ZONE1 = "set_operation_mode_zone1"
+SERVICE_SET_PROFILING = "set_profiling"
+SERVICE_SET_RECORDING = "set_recording"
+
+ZONE1_MODES = ["HeatRoomTemperature", "HeatFlowTemperature", "HeatCurve"]
+
+# Gemensamma fält för att välja enheter
+TARGET_FIELDS = {
+    vol.Optional(ATTR_UNIT_ID): vol.All(cv.ensure_list, [cv.string]),
+    vol.Optional(ATTR_BUILDING_ID): cv.string,
+}
+
+
+def _target_schema(fields: dict[Any, Any]) -> vol.All:
+    """Bygg ett schema som kräver unit_id eller building_id."""
+    return vol.All(
+        vol.Schema({**TARGET_FIELDS, **fields}),
+        cv.has_at_least_one_key(ATTR_UNIT_ID, ATTR_BUILDING_ID),
+    )
+
+
+SET_TEMPERATURE_SCHEMA = _target_schema(
+    {
+        vol.Required(ATTR_TEMPERATURE): vol.Coerce(float),
+        vol.Optional(ATTR_UNIT_TYPE): vol.In([UNIT_TYPE_ATW, UNIT_TYPE_ATA]),
+    }
+)
+SET_TANK_WATER_TEMPERATURE_SCHEMA = _target_schema(
+    {vol.Required(ATTR_TEMPERATURE): vol.Coerce(int)}
+)
+SET_FORCED_HOT_WATER_SCHEMA = _target_schema({vol.Required(ATTR_ENABLED): cv.boolean})
+SET_OPERATION_MODE_ZONE1_SCHEMA = _target_schema({vol.Required(ATTR_MODE): vol.In(ZONE1_MODES)})
+SET_PROFILING_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ENABLED): cv.boolean,
+        # Millisekunder
+        vol.Optional(
+            ATTR_SLOW_CALLBACK_THRESHOLD, default=SLOW_CALLBACK_THRESHOLD * 1000
+        ): vol.All(vol.Coerce(float), vol.Range(min=1)),
+        vol.Optional(ATTR_SAMPLE_INTERVAL, default=PROFILE_SAMPLE_INTERVAL): vol.All(
+            vol.Coerce(int), vol.Range(min=1)
+        ),
+    }
+)
+
+SET_RECORDING_SCHEMA = vol.Schema({vol.Required(ATTR_ENABLED): cv.boolean})
+
+
+async def _async_write(
+    hass: HomeAssistant,
+    call: ServiceCall,
+    unit_types: tuple[str, ...],
+    build_state: Callable[[UnitSnapshot], dict[str, Any]],
+) -> None:
+    """Routa ett tjänsteanrop till ägande konton och skriv till alla enheter."""
+    hub = async_get_hub(hass)
+    routed, unknown = hub.resolve_units(
+        call.data.get(ATTR_UNIT_ID, ()), call.data.get(ATTR_BUILDING_ID), unit_types
+    )
+    if unknown:
+        _LOGGER.error(
+            "%s: okända enheter eller fel enhetstyp: %s", call.service, ", ".join(unknown)
+        )
+    if not routed:
+        raise ServiceValidationError(f"{call.service}: inga matchande enheter")
+
+    # Anrop från en inloggad användare går före automationer i kön
+    priority = PRIORITY_INTERACTIVE if call.context.user_id else PRIORITY_AUTOMATION
+    results = await asyncio.gather(
+        *(
+            coordinator.async_write_units(
+                {unit.id: build_state(unit) for unit in units}, priority
+            )
+            for coordinator, units in routed.items()
+        )
+    )
+    if failed := [unit_id for result in results for unit_id in result]:
+        raise HomeAssistantError(
+            f"{call.service}: kunde inte skriva till {', '.join(failed)}"
+        )
+
+
+async def _async_set_temperature(hass: HomeAssistant, call: ServiceCall) -> None:
+    """Sätt måltemperatur för ATW (zon 1) och/eller ATA-enheter."""
+    temperature = call.data[ATTR_TEMPERATURE]
+    unit_type = call.data.get(ATTR_UNIT_TYPE)
+
+    def _state(unit: UnitSnapshot) -> dict[str, Any]:
+        if unit.type == UNIT_TYPE_ATA:
+            return {"setTemperature": temperature}
+        return {"setTemperatureZone1": int(temperature)}
+
+    await _async_write(
+        hass, call, (unit_type,) if unit_type else (UNIT_TYPE_ATW, UNIT_TYPE_ATA), _state
+    )
+
+
+async def _async_set_tank_water_temperature(hass: HomeAssistant, call: ServiceCall) -> None:
+    """Sätt måltemperatur för varmvattentanken."""
+    state = {"setTankWaterTemperature": call.data[ATTR_TEMPERATURE]}
+    await _async_write(hass, call, (UNIT_TYPE_ATW,), lambda _: state)
+
+
+async def _async_set_forced_hot_water(hass: HomeAssistant, call: ServiceCall) -> None:
+    """Slå på eller av forcerat varmvatten."""
+    state = {"forcedHotWaterMode": call.data[ATTR_ENABLED]}
+    await _async_write(hass, call, (UNIT_TYPE_ATW,), lambda _: state)
+
+
+async def _async_set_operation_mode_zone1(hass: HomeAssistant, call: ServiceCall) -> None:
+    """Sätt driftläge för zon 1."""
+    state = {"operationModeZone1": call.data[ATTR_MODE]}
+    await _async_write(hass, call, (UNIT_TYPE_ATW,), lambda _: state)
+
+
+async def _async_set_profiling(hass: HomeAssistant, call: ServiceCall) -> None:
+    """Slå på eller av profilering för alla konton."""
+    for coordinator in async_get_hub(hass).coordinators:
+        if call.data[ATTR_ENABLED]:
+            coordinator.profiler.enable(
+                call.data[ATTR_SLOW_CALLBACK_THRESHOLD] / 1000, call.data[ATTR_SAMPLE_INTERVAL]
+            )
+        else:
+            coordinator.profiler.disable()
+    _LOGGER.info("Profilering %s", "på" if call.data[ATTR_ENABLED] else "av")
+
+
+async def _async_set_recording(hass: HomeAssistant, call: ServiceCall) -> None:
+    """Starta eller stoppa inspelning av API-trafiken till en kassett per konto."""
+    for coordinator in async_get_hub(hass).coordinators:
+        api = coordinator.api
+        if call.data[ATTR_ENABLED]:
+            if api.recorder is None:
+                api.recorder = CassetteRecorder()
+            continue
+        if (recorder := api.recorder) is None:
+            continue
+        api.recorder = None
+        path = hass.config.path(f"{DOMAIN}_{coordinator.entry.entry_id}.cassette.json")
+        await hass.async_add_executor_job(recorder.write, path)
+        _LOGGER.info("Kassett med %d utbyten sparad i %s", len(recorder.interactions), path)
+
+
+SERVICES = {
+    SERVICE_SET_TEMPERATURE: (_async_set_temperature, SET_TEMPERATURE_SCHEMA),
+    SERVICE_SET_TANK_WATER_TEMPERATURE: (
+        _async_set_tank_water_temperature,
+        SET_TANK_WATER_TEMPERATURE_SCHEMA,
+    ),
+    SERVICE_SET_FORCED_HOT_WATER: (_async_set_forced_hot_water, SET_FORCED_HOT_WATER_SCHEMA),
+    SERVICE_SET_OPERATION_MODE_ZONE1: (
+        _async_set_operation_mode_zone1,
+        SET_OPERATION_MODE_ZONE1_SCHEMA,
+    ),
+    SERVICE_SET_PROFILING: (_async_set_profiling, SET_PROFILING_SCHEMA),
+    SERVICE_SET_RECORDING: (_async_set_recording, SET_RECORDING_SCHEMA),
+}
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Registrera tjänsterna om de inte redan finns."""
+    for service, (handler, schema) in SERVICES.items():
+        if hass.services.has_service(DOMAIN, service):
+            continue
+
+        async def _async_handle(call: ServiceCall, handler=handler) -> None:
+            await handler(hass, call)
+
+        hass.services.async_register(DOMAIN, service, _async_handle, schema=schema)
+
+
+def async_unload_services(hass: HomeAssistant) -> None:
+    """Ta bort tjänsterna när sista kontot avlastas."""
+    for service in SERVICES:
+        hass.services.async_remove(DOMAIN, service)
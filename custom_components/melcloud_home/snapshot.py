@@ -0,0 +1,284 @@
+"""Indexerad ögonblicksbild av enheter och inställningar för MELCloud Home."""
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+UNIT_TYPE_ATW = "air_to_water"
+UNIT_TYPE_ATA = "air_to_air"
+
+# Nyckel i user context -> enhetstyp
+UNIT_COLLECTIONS = {
+    "airToWaterUnits": UNIT_TYPE_ATW,
+    "airToAirUnits": UNIT_TYPE_ATA,
+}
+
+# Projektion: de settings och capabilities som plattformarna faktiskt läser.
+# Allt annat i user context släpps direkt efter avkodning.
+USED_SETTINGS = frozenset(
+    {
+        # ATW
+        "RoomTemperatureZone1",
+        "SetTemperatureZone1",
+        "TankWaterTemperature",
+        "SetTankWaterTemperature",
+        "OperationModeZone1",
+        "ForcedHotWaterMode",
+        # ATA
+        "RoomTemperature",
+        "SetTemperature",
+        "FanSpeed",
+        "VaneHorizontal",
+        "VaneVertical",
+        # Gemensamma
+        "Power",
+        "OperationMode",
+    }
+)
+# Uppmätta värden; ändras hela tiden utan att någon styr enheten
+MEASURED_SETTINGS = frozenset(
+    {"RoomTemperatureZone1", "TankWaterTemperature", "RoomTemperature"}
+)
+# Börvärden, lägen och på/av; ändringar i dessa tyder på att någon styr enheten
+CONTROL_SETTINGS = USED_SETTINGS - MEASURED_SETTINGS
+# Temperaturer, som jämförs och visas som tal. Fläkt- och vinkellägen ("3",
+# "Auto", "Swing") är lägen och behålls som strängar.
+NUMERIC_SETTINGS = frozenset(
+    {
+        "RoomTemperatureZone1",
+        "SetTemperatureZone1",
+        "TankWaterTemperature",
+        "SetTankWaterTemperature",
+        "RoomTemperature",
+        "SetTemperature",
+    }
+)
+USED_CAPABILITIES = frozenset(
+    {
+        "minSetTemperature",
+        "maxSetTemperature",
+        "hasHalfDegrees",
+        "temperatureIncrement",
+        "hasHotWater",
+        "minSetTankTemperature",
+        "maxSetTankTemperature",
+    }
+)
+
+
+def coerce_setting_value(name: str, value: Any) -> Any:
+    """Konvertera ett setting-värde från API:t till rätt Python-typ.
+
+    API:t skickar allt som strängar ("True", "False", "21.5", "Heat").
+    Bara settings i NUMERIC_SETTINGS blir tal; övriga strängar behålls.
+    """
+    if isinstance(value, bool):
+        return value
+    if value == "True":
+        return True
+    if value == "False":
+        return False
+    if name not in NUMERIC_SETTINGS:
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    return value
+
+
+@dataclass(slots=True)
+class UnitSnapshot:
+    """Kompakt, typad post för en enhet."""
+
+    id: str
+    type: str
+    name: str | None
+    building_id: str | None
+    building_name: str | None
+    is_connected: bool
+    capabilities: dict[str, Any] = field(default_factory=dict)
+    settings: dict[str, Any] = field(default_factory=dict)
+
+
+def build_unit_index(user_context: dict[str, Any]) -> dict[str, UnitSnapshot]:
+    """Bygg ett index enhets-id -> UnitSnapshot från user context.
+
+    Körs en gång per uppdatering så att varje entitetsuppslag blir O(1).
+    """
+    units: dict[str, UnitSnapshot] = {}
+    for building in user_context.get("buildings", []):
+        building_id = building.get("id")
+        building_name = building.get("name")
+        for collection, unit_type in UNIT_COLLECTIONS.items():
+            for unit in building.get(collection, []):
+                units[unit["id"]] = build_unit_snapshot(
+                    unit, unit_type, building_id, building_name
+                )
+    return units
+
+
+def build_unit_snapshot(
+    unit: dict[str, Any],
+    unit_type: str,
+    building_id: str | None,
+    building_name: str | None,
+) -> UnitSnapshot:
+    """Bygg en UnitSnapshot från en enhet i API-format."""
+    return UnitSnapshot(
+        id=unit["id"],
+        type=unit_type,
+        name=unit.get("givenDisplayName"),
+        building_id=building_id,
+        building_name=building_name,
+        is_connected=bool(unit.get("isConnected", False)),
+        capabilities={
+            key: value
+            for key, value in (unit.get("capabilities") or {}).items()
+            if key in USED_CAPABILITIES
+        },
+        settings={
+            s["name"]: coerce_setting_value(s["name"], s.get("value"))
+            for s in unit.get("settings", [])
+            if s.get("name") in USED_SETTINGS
+        },
+    )
+
+
+def serialize_unit_index(units: dict[str, UnitSnapshot]) -> list[dict[str, Any]]:
+    """Serialisera ett index till JSON-kompatibla dicts för lagring."""
+    return [asdict(unit) for unit in units.values()]
+
+
+def restore_unit_index(data: list[dict[str, Any]]) -> dict[str, UnitSnapshot]:
+    """Återskapa ett index från serialize_unit_index.
+
+    Raises:
+        TypeError, KeyError: om datan inte har förväntat format
+    """
+    return {unit["id"]: UnitSnapshot(**unit) for unit in data}
+
+
+def merge_unit_state(previous: UnitSnapshot, unit: dict[str, Any]) -> UnitSnapshot:
+    """Bygg en ny UnitSnapshot från en enhetsläsning och föregående snapshot.
+
+    Byggnadsinformation och fält som saknas i svaret tas från föregående snapshot.
+    """
+    merged = build_unit_snapshot(
+        {"id": previous.id, **unit}, previous.type, previous.building_id, previous.building_name
+    )
+    if "givenDisplayName" not in unit:
+        merged.name = previous.name
+    if "isConnected" not in unit:
+        merged.is_connected = previous.is_connected
+    if not merged.capabilities:
+        merged.capabilities = previous.capabilities
+    if "settings" not in unit:
+        merged.settings = dict(previous.settings)
+    return merged
+
+
+# Markerar att allt för en enhet ska betraktas som ändrat (ny/borttagen enhet)
+ALL_KEYS = "*"
+# Ändringar i metadata (anslutning, namn, byggnad) påverkar alla entiteter
+META_KEY = "_meta"
+
+
+def diff_unit_indexes(
+    old: dict[str, UnitSnapshot], new: dict[str, UnitSnapshot]
+) -> dict[str, frozenset[str]]:
+    """Jämför två index och returnera ändrade nycklar per enhet.
+
+    Enheter utan ändringar finns inte med i resultatet.
+    """
+    changes: dict[str, frozenset[str]] = {}
+    for unit_id, unit in new.items():
+        previous = old.get(unit_id)
+        if previous is None:
+            changes[unit_id] = frozenset((ALL_KEYS,))
+            continue
+        changed = {
+            name
+            for name, value in unit.settings.items()
+            if previous.settings.get(name, ALL_KEYS) != value
+        }
+        changed.update(name for name in previous.settings if name not in unit.settings)
+        if (
+            unit.is_connected != previous.is_connected
+            or unit.name != previous.name
+            or unit.building_name != previous.building_name
+        ):
+            changed.add(META_KEY)
+        if changed:
+            changes[unit_id] = frozenset(changed)
+    for unit_id in old.keys() - new.keys():
+        changes[unit_id] = frozenset((ALL_KEYS,))
+    return changes
+
+
+def has_control_changes(changes: dict[str, frozenset[str]]) -> bool:
+    """Returnera om en diff ändrar börvärden, lägen eller på/av, eller enheter tillkom/försvann.
+
+    Uppmätta temperaturer och metadata räknas inte.
+    """
+    return any(
+        ALL_KEYS in keys or not keys.isdisjoint(CONTROL_SETTINGS) for keys in changes.values()
+    )
+
+
+def topology_signature(unit: UnitSnapshot) -> tuple[Any, ...]:
+    """Returnera det som avgör vilka entiteter en enhet får.
+
+    Typ, tillgängliga settings och capabilities; värden ingår inte.
+    """
+    return (
+        unit.type,
+        frozenset(unit.settings),
+        frozenset(unit.capabilities.items()),
+    )
+
+
+def setting_name(field_name: str) -> str:
+    """Översätt ett camelCase-fält i en PUT till PascalCase-settingen.
+
+    Ex: "setTemperatureZone1" -> "SetTemperatureZone1", "power" -> "Power".
+    """
+    return field_name[:1].upper() + field_name[1:]
+
+
+def apply_state(unit: UnitSnapshot, state: dict[str, Any]) -> frozenset[str]:
+    """Applicera en camelCase-payload optimistiskt på en enhet.
+
+    Returnerar de setting-namn som ändrades.
+    """
+    changed = set()
+    for field_name, value in state.items():
+        name = setting_name(field_name)
+        value = coerce_setting_value(name, value)
+        if unit.settings.get(name) != value:
+            unit.settings[name] = value
+            changed.add(name)
+    return frozenset(changed)
+
+
+def apply_unit_delta(unit: UnitSnapshot, delta: dict[str, Any]) -> frozenset[str]:
+    """Applicera en delta i API-format (settings-lista, isConnected) på en enhet.
+
+    Returnerar de setting-namn som ändrades, plus META_KEY om anslutningen ändrades.
+    """
+    changed = set()
+    for setting in delta.get("settings") or ():
+        name = setting.get("name")
+        if name not in USED_SETTINGS:
+            continue
+        value = coerce_setting_value(name, setting.get("value"))
+        if unit.settings.get(name) != value:
+            unit.settings[name] = value
+            changed.add(name)
+    if "isConnected" in delta and bool(delta["isConnected"]) != unit.is_connected:
+        unit.is_connected = bool(delta["isConnected"])
+        changed.add(META_KEY)
+    return frozenset(changed)
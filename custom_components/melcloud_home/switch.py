@@ -8,9 +8,10 @@ from homeassistant.components.switch import SwitchEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import DOMAIN
+from .entity import MELCloudHomeEntity, async_setup_unit_entities
+from .snapshot import UNIT_TYPE_ATW, UnitSnapshot
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -20,51 +21,40 @@ async def async_setup_entry(
     entry: ConfigEntry,
     async_add_entities: AddEntitiesCallback,
 ) -> None:
-    data = hass.data[DOMAIN][entry.entry_id]
-    coordinator = data["coordinator"]
-    api = data["api"]
+    async_setup_unit_entities(hass, entry, async_add_entities, _unit_entities)
 
-    entities: list[SwitchEntity] = []
-    for device in coordinator.data.get("devices", []):
-        if device.get("type") == "air_to_water":
-            entities.append(MELCloudForcedHotWaterSwitch(coordinator, api, device))
 
-    async_add_entities(entities)
+def _unit_entities(coordinator, unit: UnitSnapshot) -> list[SwitchEntity]:
+    if unit.type == UNIT_TYPE_ATW:
+        return [MELCloudForcedHotWaterSwitch(coordinator, unit)]
+    return []
 
 
-class MELCloudForcedHotWaterSwitch(CoordinatorEntity, SwitchEntity):
+class MELCloudForcedHotWaterSwitch(MELCloudHomeEntity, SwitchEntity):
     _attr_has_entity_name = True
     _attr_translation_key = "forced_hot_water"
+    _setting_keys = ("ForcedHotWaterMode",)
 
-    def __init__(self, coordinator, api, device: dict[str, Any]) -> None:
-        super().__init__(coordinator)
-        self._api = api
-        self._device = device
-        self._device_id = device["id"]
+    def __init__(self, coordinator, unit: UnitSnapshot) -> None:
+        super().__init__(coordinator, unit.id)
+        self._device_name = unit.name or "ATW Heat Pump"
         self._attr_unique_id = f"{self._device_id}_forced_hot_water"
 
     @property
     def is_on(self) -> bool:
-        for d in self.coordinator.data.get("devices", []):
-            if d["id"] == self._device_id:
-                for s in d.get("settings", []):
-                    if s.get("name") == "ForcedHotWaterMode":
-                        return str(s.get("value")) == "True"
-        return False
+        return self.coordinator.get_setting(self._device_id, "ForcedHotWaterMode") is True
 
     async def async_turn_on(self, **kwargs: Any) -> None:
-        await self._api.set_atw_state(self._device_id, {"forcedHotWaterMode": True})
-        await self.coordinator.async_request_refresh()
+        await self._async_write({"forcedHotWaterMode": True})
 
     async def async_turn_off(self, **kwargs: Any) -> None:
-        await self._api.set_atw_state(self._device_id, {"forcedHotWaterMode": False})
-        await self.coordinator.async_request_refresh()
+        await self._async_write({"forcedHotWaterMode": False})
 
     @property
     def device_info(self) -> dict[str, Any]:
         return {
             "identifiers": {(DOMAIN, self._device_id)},
-            "name": self._device.get("givenDisplayName", "ATW Heat Pump"),
+            "name": self._device_name,
             "manufacturer": "Mitsubishi Electric",
             "model": "ATW Heat Pump",
         }
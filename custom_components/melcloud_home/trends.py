@@ -0,0 +1,233 @@
+"""Rullande statistik för enheternas temperaturer.
+
+För varje enhet och följd temperatur hålls de senaste mätpunkterna i en
+ringbuffert med löpande summor, så att medelvärde, lutning (minsta
+kvadrat) och beräknad tid till börvärdet uppdateras i konstant tid per
+mätpunkt, utan att läsa recorderns databas.
+"""
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Iterable
+from typing import Any
+
+from .snapshot import UnitSnapshot
+
+# Max antal mätpunkter per serie, och äldsta mätpunkt som räknas (sekunder)
+TREND_WINDOW = 24
+TREND_MAX_AGE = 2 * 3600
+# Mätpunkter tätare än så här hoppas över, t.ex. push följt av poll
+TREND_MIN_SPACING = 60
+# Minsta antal mätpunkter och tidsspann (sekunder) för en lutning
+TREND_MIN_SAMPLES = 3
+TREND_MIN_SPAN = 10 * 60
+# Lutningar under detta (grader per timme) räknas som stillastående
+TREND_MIN_RATE = 0.05
+# Längsta tid till börvärdet som rapporteras (timmar)
+TREND_MAX_TIME_TO_TARGET = 24
+
+# Följda temperaturer och deras börvärden
+TRACKED_SETTINGS = {
+    "RoomTemperatureZone1": "SetTemperatureZone1",
+    "TankWaterTemperature": "SetTankWaterTemperature",
+    "RoomTemperature": "SetTemperature",
+}
+
+ATTR_TREND_MEAN = "trend_mean"
+ATTR_TREND_RATE = "trend_rate"
+ATTR_TIME_TO_TARGET = "time_to_target"
+
+
+def _number(value: Any) -> float | None:
+    """Returnera värdet som float, eller None om det inte är ett tal.
+
+    Optimistiska skrivningar kan lägga in heltal, t.ex. setTemperatureZone1.
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+class RollingSeries:
+    """Ringbuffert med löpande summor för medelvärde och lutning."""
+
+    __slots__ = ("_samples", "_origin", "_evictions", "_n", "_st", "_sv", "_stt", "_stv")
+
+    def __init__(self, size: int = TREND_WINDOW) -> None:
+        """Initiera en tom serie."""
+        # (timmar sedan origin, värde)
+        self._samples: deque[tuple[float, float]] = deque(maxlen=size)
+        self._origin: float | None = None
+        self._evictions = 0
+        self._n = 0
+        self._st = self._sv = self._stt = self._stv = 0.0
+
+    def __len__(self) -> int:
+        """Returnera antal mätpunkter."""
+        return self._n
+
+    def add(self, when: float, value: float) -> bool:
+        """Lägg till en mätpunkt (epoch-sekunder).
+
+        Returns:
+            False om mätpunkten hoppades över för att den låg för tätt
+        """
+        if self._origin is None:
+            self._origin = when
+        t = (when - self._origin) / 3600
+        if self._samples and (t - self._samples[-1][0]) * 3600 < TREND_MIN_SPACING:
+            return False
+        while self._samples and (
+            len(self._samples) == self._samples.maxlen
+            or (t - self._samples[0][0]) * 3600 > TREND_MAX_AGE
+        ):
+            self._remove(*self._samples.popleft())
+            self._evictions += 1
+        if self._evictions >= self._samples.maxlen:
+            t -= self._rebase()
+        self._samples.append((t, value))
+        self._n += 1
+        self._st += t
+        self._sv += value
+        self._stt += t * t
+        self._stv += t * value
+        return True
+
+    def _rebase(self) -> float:
+        """Flytta origin till äldsta mätpunkten och räkna om summorna.
+
+        Görs en gång per fönster (amorterat konstant tid) så att avrundningsfel
+        från borttagningar inte ackumuleras och tiderna hålls små.
+
+        Returns:
+            Förskjutningen i timmar
+        """
+        shift = self._samples[0][0] if self._samples else 0.0
+        self._origin += shift * 3600
+        self._samples = deque(
+            ((t - shift, value) for t, value in self._samples), maxlen=self._samples.maxlen
+        )
+        self._evictions = self._n = 0
+        self._st = self._sv = self._stt = self._stv = 0.0
+        for t, value in self._samples:
+            self._n += 1
+            self._st += t
+            self._sv += value
+            self._stt += t * t
+            self._stv += t * value
+        return shift
+
+    def _remove(self, t: float, value: float) -> None:
+        self._n -= 1
+        self._st -= t
+        self._sv -= value
+        self._stt -= t * t
+        self._stv -= t * value
+
+    @property
+    def latest(self) -> float | None:
+        """Returnera senaste värdet."""
+        return self._samples[-1][1] if self._samples else None
+
+    @property
+    def mean(self) -> float | None:
+        """Returnera medelvärdet i fönstret."""
+        return self._sv / self._n if self._n else None
+
+    @property
+    def rate(self) -> float | None:
+        """Returnera lutningen i grader per timme, eller None med för få mätpunkter."""
+        if self._n < TREND_MIN_SAMPLES:
+            return None
+        if (self._samples[-1][0] - self._samples[0][0]) * 3600 < TREND_MIN_SPAN:
+            return None
+        denominator = self._n * self._stt - self._st * self._st
+        if denominator <= 0:
+            return None
+        return (self._n * self._stv - self._st * self._sv) / denominator
+
+    def hours_to(self, target: float) -> float | None:
+        """Returnera beräknad tid i timmar tills värdet når target.
+
+        0 om värdet redan nått target, None om det står still eller rör sig bort.
+        """
+        if (rate := self.rate) is None or (latest := self.latest) is None:
+            return None
+        remaining = target - latest
+        if remaining == 0:
+            return 0.0
+        if abs(rate) < TREND_MIN_RATE or (remaining > 0) != (rate > 0):
+            return None
+        hours = remaining / rate
+        return hours if hours <= TREND_MAX_TIME_TO_TARGET else None
+
+
+class UnitTrends:
+    """Rullande serier per enhet och följd temperatur."""
+
+    def __init__(self) -> None:
+        """Initiera utan serier."""
+        self._series: dict[str, dict[str, RollingSeries]] = {}
+        # Senast rapporterade avrundade attribut per serie, för att begränsa state-skrivningar
+        self._reported: dict[tuple[str, str], tuple[Any, ...]] = {}
+        self.samples = 0
+
+    def sample(self, units: Iterable[UnitSnapshot], when: float) -> dict[str, frozenset[str]]:
+        """Lägg till en mätpunkt per följd temperatur.
+
+        Returns:
+            Settings per enhet vars avrundade attribut ändrats
+        """
+        changed: dict[str, frozenset[str]] = {}
+        for unit in units:
+            keys = []
+            for name in TRACKED_SETTINGS:
+                value = _number(unit.settings.get(name))
+                if value is None:
+                    continue
+                series = self._series.setdefault(unit.id, {}).get(name)
+                if series is None:
+                    series = self._series[unit.id][name] = RollingSeries()
+                if not series.add(when, value):
+                    continue
+                self.samples += 1
+                attributes = self.attributes(unit, name)
+                reported = tuple(attributes.values())
+                if self._reported.get((unit.id, name), ()) != reported:
+                    self._reported[(unit.id, name)] = reported
+                    keys.append(name)
+            if keys:
+                changed[unit.id] = frozenset(keys)
+        return changed
+
+    def attributes(self, unit: UnitSnapshot, name: str) -> dict[str, Any]:
+        """Returnera medelvärde, lutning och tid till börvärdet för en temperatur."""
+        series = self._series.get(unit.id, {}).get(name)
+        if series is None or (rate := series.rate) is None:
+            return {}
+        attributes: dict[str, Any] = {
+            ATTR_TREND_MEAN: round(series.mean, 1),
+            ATTR_TREND_RATE: round(rate, 1),
+        }
+        target = _number(unit.settings.get(TRACKED_SETTINGS[name]))
+        if target is not None:
+            hours = series.hours_to(target)
+            # Minuter, avrundat till 5 så att attributet inte ändras vid varje poll
+            attributes[ATTR_TIME_TO_TARGET] = (
+                None if hours is None else int(round(hours * 12) * 5)
+            )
+        return attributes
+
+    def discard(self, unit_id: str) -> None:
+        """Glöm en borttagen enhets serier."""
+        self._series.pop(unit_id, None)
+        for name in TRACKED_SETTINGS:
+            self._reported.pop((unit_id, name), None)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returnera storlek för diagnostik."""
+        return {
+            "units": len(self._series),
+            "series": sum(len(series) for series in self._series.values()),
+            "samples": self.samples,
+        }
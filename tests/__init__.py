@@ -0,0 +1 @@
+"""Tester för MELCloud Home-integrationen."""
@@ -0,0 +1,17 @@
+"""Hjälpfunktioner för testerna."""
+from __future__ import annotations
+
+import asyncio
+
+from homeassistant.core import HomeAssistant
+
+USERNAME = "test@example.com"
+PASSWORD = "secret"
+# Kortare debounce för skrivkön så att testerna inte väntar i 1,5 s per skrivning
+WRITE_DEBOUNCE = 0.05
+
+
+async def flush_writes(hass: HomeAssistant) -> None:
+    """Vänta tills skrivköns debounce löpt ut och PUT:arna är klara."""
+    await asyncio.sleep(WRITE_DEBOUNCE * 3)
+    await hass.async_block_till_done()
@@ -0,0 +1,84 @@
+"""Gemensamma fixtures: stand-in-servern och en uppsatt config entry mot den."""
+from __future__ import annotations
+
+from collections.abc import AsyncIterator
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+
+from benchmarks.standin_server import StandInServer, generate_account
+from custom_components.melcloud_home import MELCloudHomeCoordinator
+from custom_components.melcloud_home.const import CONF_BASE_URL, DOMAIN
+
+from .common import PASSWORD, USERNAME, WRITE_DEBOUNCE
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations: None) -> None:
+    """Låt Home Assistant ladda integrationen från custom_components."""
+
+
+@pytest.fixture(autouse=True)
+def short_write_debounce() -> None:
+    """Slå ihop skrivningar inom WRITE_DEBOUNCE i stället för 1,5 s."""
+    with patch("custom_components.melcloud_home.WRITE_DEBOUNCE_SECONDS", WRITE_DEBOUNCE):
+        yield
+
+
+@pytest.fixture
+def account() -> dict[str, Any]:
+    """Ett syntetiskt konto med två ATW- och två ATA-enheter i två byggnader."""
+    return generate_account(buildings=2, atw_units=2, ata_units=2, seed=1)
+
+
+@pytest.fixture
+async def server(
+    account: dict[str, Any], socket_enabled: None
+) -> AsyncIterator[StandInServer]:
+    """Stand-in-servern med kontot, på 127.0.0.1."""
+    async with StandInServer(account, USERNAME, PASSWORD) as server:
+        yield server
+
+
+@pytest.fixture
+def entry_options() -> dict[str, Any]:
+    """Config entryns options."""
+    return {}
+
+
+@pytest.fixture
+def config_entry(
+    hass: HomeAssistant, server: StandInServer, entry_options: dict[str, Any]
+) -> MockConfigEntry:
+    """En config entry som pekar mot stand-in-servern."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="MELCloud Home (Test User)",
+        data={
+            CONF_USERNAME: USERNAME,
+            CONF_PASSWORD: PASSWORD,
+            CONF_BASE_URL: server.base_url,
+        },
+        options=entry_options,
+    )
+    entry.add_to_hass(hass)
+    return entry
+
+
+@pytest.fixture
+async def coordinator(
+    hass: HomeAssistant, config_entry: MockConfigEntry
+) -> AsyncIterator[MELCloudHomeCoordinator]:
+    """Sätt upp config entryn och returnera dess coordinator."""
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    yield hass.data[DOMAIN][config_entry.entry_id]["coordinator"]
+    if config_entry.entry_id in hass.data.get(DOMAIN, {}):
+        await hass.config_entries.async_unload(config_entry.entry_id)
+        await hass.async_block_till_done()
+
@@ -0,0 +1,97 @@
+"""Tester för circuit breakern."""
+from __future__ import annotations
+
+import pytest
+
+from custom_components.melcloud_home import breaker
+from custom_components.melcloud_home.breaker import (
+    PROBE_TIMEOUT,
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitBreaker,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> list[float]:
+    """Styr time.monotonic i breaker; ändra clock[0] för att flytta tiden."""
+    now = [1000.0]
+    monkeypatch.setattr(breaker.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _tripped(clock: list[float]) -> CircuitBreaker:
+    cb = CircuitBreaker(failure_threshold=3, reset_timeout=30, max_reset_timeout=100)
+    for _ in range(3):
+        assert cb.allow()
+        cb.record_failure()
+    return cb
+
+
+def test_opens_after_threshold(clock: list[float]) -> None:
+    """Brytaren öppnas först efter tröskelns antal fel i följd."""
+    cb = CircuitBreaker(failure_threshold=3)
+    cb.record_failure()
+    cb.record_failure()
+    assert cb.state == STATE_CLOSED
+    cb.record_failure()
+    assert cb.state == STATE_OPEN
+    assert cb.is_open
+    assert cb.trips == 1
+
+
+def test_success_resets_failure_count(clock: list[float]) -> None:
+    """Ett svar nollställer räkningen, så fel måste komma i följd."""
+    cb = CircuitBreaker(failure_threshold=3)
+    cb.record_failure()
+    cb.record_failure()
+    cb.record_success()
+    cb.record_failure()
+    cb.record_failure()
+    assert cb.state == STATE_CLOSED
+
+
+def test_open_rejects_until_reset_timeout(clock: list[float]) -> None:
+    """Öppen brytare avvisar förfrågningar tills vilotiden gått."""
+    cb = _tripped(clock)
+    assert not cb.allow()
+    assert cb.rejected == 1
+    clock[0] += 29
+    assert not cb.allow()
+    assert cb.retry_in == pytest.approx(1)
+
+
+def test_half_open_lets_one_probe_through(clock: list[float]) -> None:
+    """Efter vilotiden släpps en provförfrågan i taget."""
+    cb = _tripped(clock)
+    clock[0] += 30
+    assert cb.allow()
+    assert cb.state == STATE_HALF_OPEN
+    assert not cb.allow()
+    # En förlorad provförfrågan ersätts efter PROBE_TIMEOUT
+    clock[0] += PROBE_TIMEOUT
+    assert cb.allow()
+
+
+def test_successful_probe_closes(clock: list[float]) -> None:
+    """Lyckas provförfrågan stängs brytaren och vilotiden återställs."""
+    cb = _tripped(clock)
+    clock[0] += 30
+    assert cb.allow()
+    cb.record_success()
+    assert cb.state == STATE_CLOSED
+    assert cb.as_dict()["reset_timeout"] == 30
+
+
+def test_failed_probe_doubles_timeout_up_to_cap(clock: list[float]) -> None:
+    """Misslyckade prov öppnar igen med dubbel vilotid, upp till taket."""
+    cb = _tripped(clock)
+    timeouts = []
+    for _ in range(4):
+        clock[0] += cb.retry_in
+        assert cb.allow()
+        cb.record_failure()
+        assert cb.state == STATE_OPEN
+        timeouts.append(cb.as_dict()["reset_timeout"])
+    assert timeouts == [60, 100, 100, 100]
@@ -0,0 +1,108 @@
+"""Tester för anonymiseringen av kassetter."""
+from __future__ import annotations
+
+import json
+
+from custom_components.melcloud_home.cassette import (
+    CASSETTE_VERSION,
+    Anonymizer,
+    CassetteRecorder,
+)
+
+UNIT_ID = "0a1b2c3d-0000-4000-8000-000000000001"
+BUILDING_ID = "0a1b2c3d-0000-4000-8000-000000000002"
+USER_CONTEXT = {
+    "id": "0a1b2c3d-0000-4000-8000-000000000003",
+    "firstname": "Kristina",
+    "lastname": "Svensson",
+    "email": "kristina.svensson@example.se",
+    "buildings": [
+        {
+            "id": BUILDING_ID,
+            "name": "Sommarstugan",
+            "airToAirUnits": [
+                {
+                    "id": UNIT_ID,
+                    "givenDisplayName": "Vardagsrum",
+                    "macAddress": "00:11:22:33:44:55",
+                    "serialNumber": "1234567",
+                    "settings": [{"name": "SetTemperature", "value": "21"}],
+                    "note": f"delad av kristina.svensson@example.se, enhet {UNIT_ID.upper()}",
+                }
+            ],
+        }
+    ],
+}
+
+
+def _flatten(value: object) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+def test_personal_data_is_replaced() -> None:
+    """Id:n, e-post, namn och hårdvaruadresser finns inte kvar."""
+    anonymized = Anonymizer().value(USER_CONTEXT)
+    text = _flatten(anonymized)
+    for secret in (
+        "Kristina",
+        "Svensson",
+        "kristina.svensson",
+        "Sommarstugan",
+        "Vardagsrum",
+        "00:11:22:33:44:55",
+        "1234567",
+        UNIT_ID,
+        UNIT_ID.upper(),
+        BUILDING_ID,
+    ):
+        assert secret not in text
+    unit = anonymized["buildings"][0]["airToAirUnits"][0]
+    assert unit["macAddress"] == "redacted"
+    assert anonymized["firstname"] == "First 1"
+    assert anonymized["buildings"][0]["name"] == "Building 1"
+    assert unit["givenDisplayName"] == "Unit 1"
+    assert anonymized["email"] == "user1@example.com"
+
+
+def test_structure_and_setting_names_are_kept() -> None:
+    """Settings behåller namn och värden så att uppspelningen blir realistisk."""
+    anonymized = Anonymizer().value(USER_CONTEXT)
+    unit = anonymized["buildings"][0]["airToAirUnits"][0]
+    assert unit["settings"] == [{"name": "SetTemperature", "value": "21"}]
+
+
+def test_replacements_are_consistent() -> None:
+    """Samma id ger samma ersättning i sökvägar, nycklar och fritext, oavsett skiftläge."""
+    anonymizer = Anonymizer()
+    anonymized = anonymizer.value(USER_CONTEXT)
+    unit = anonymized["buildings"][0]["airToAirUnits"][0]
+    path = anonymizer.path(f"/api/ataunit/{UNIT_ID}?from=2024-01-01")
+    assert path == f"/api/ataunit/{unit['id']}"
+    assert unit["id"] in unit["note"]
+    assert "user1@example.com" in unit["note"]
+    assert anonymized["buildings"][0]["id"] != unit["id"]
+
+
+def test_recorder_keeps_only_replay_headers() -> None:
+    """Cookies och andra headers sparas inte, och kroppen anonymiseras."""
+    recorder = CassetteRecorder()
+    recorder.record(
+        "user_context",
+        "GET",
+        "/api/user/context",
+        200,
+        0.12345,
+        headers={"Set-Cookie": "session=hemlig", "ETag": '"abc"', "Server": "x"},
+        body=json.dumps(USER_CONTEXT).encode(),
+    )
+    recorder.record("login_submit", "POST", "/login?code=hemlig", 302, 0.5, size=10)
+    cassette = recorder.as_dict()
+    assert cassette["version"] == CASSETTE_VERSION
+    first, second = cassette["interactions"]
+    assert first["headers"] == {"ETag": '"abc"'}
+    assert first["elapsed"] == 0.1235
+    assert "hemlig" not in _flatten(cassette)
+    assert "Kristina" not in _flatten(cassette)
+    assert second["path"] == "/login"
+    assert second["size"] == 10
+    assert "json" not in second
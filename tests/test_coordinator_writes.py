@@ -0,0 +1,204 @@
+"""Tester för coordinatorns skrivkö: ihopslagning, baslinjer och återställning."""
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+
+from benchmarks.standin_server import StandInServer
+from custom_components.melcloud_home import MELCloudHomeCoordinator
+from custom_components.melcloud_home.snapshot import UNIT_TYPE_ATW
+
+from .common import flush_writes
+
+PUT = "PUT /api/{kind}/{unit_id}"
+
+
+def _atw_unit_id(coordinator: MELCloudHomeCoordinator) -> str:
+    return next(unit.id for unit in coordinator.units.values() if unit.type == UNIT_TYPE_ATW)
+
+
+class GatedPut:
+    """Ersätter set_atw_state; varje PUT väntar på att testet släpper den."""
+
+    def __init__(self, coordinator: MELCloudHomeCoordinator) -> None:
+        self._original = coordinator.api.set_atw_state
+        self.calls: list[dict[str, Any]] = []
+        self.results: list[bool] = []
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+        coordinator.api.set_atw_state = self
+
+    async def __call__(self, unit_id: str, state: dict[str, Any], priority: int) -> Any:
+        self.calls.append(dict(state))
+        self.started.set()
+        await self.release.wait()
+        self.release.clear()
+        self.started.clear()
+        if self.results and not self.results.pop(0):
+            return None
+        return await self._original(unit_id, state, priority)
+
+
+async def test_writes_within_debounce_are_coalesced(
+    hass: HomeAssistant, coordinator: MELCloudHomeCoordinator, server: StandInServer
+) -> None:
+    """Två ändringar inom debounce-fönstret blir en PUT med båda fälten."""
+    unit_id = _atw_unit_id(coordinator)
+    server.stats.reset()
+
+    await coordinator.async_queue_write(unit_id, {"setTemperatureZone1": 24})
+    await coordinator.async_queue_write(unit_id, {"forcedHotWaterMode": True})
+    # Optimistiskt applicerat innan PUT:en gått iväg
+    assert coordinator.get_setting(unit_id, "SetTemperatureZone1") == 24.0
+    await flush_writes(hass)
+
+    assert server.stats.requests[PUT] == 1
+    settings = {s["name"]: s["value"] for s in server._units[unit_id]["settings"]}
+    assert settings["SetTemperatureZone1"] == "24"
+    assert settings["ForcedHotWaterMode"] == "True"
+    assert coordinator.write_metrics.sent_writes == 1
+
+
+async def test_unchanged_write_is_dropped(
+    hass: HomeAssistant, coordinator: MELCloudHomeCoordinator, server: StandInServer
+) -> None:
+    """En ändring till det värde enheten redan har skickas inte."""
+    unit_id = _atw_unit_id(coordinator)
+    current = coordinator.get_setting(unit_id, "SetTemperatureZone1")
+    server.stats.reset()
+
+    await coordinator.async_queue_write(unit_id, {"setTemperatureZone1": current})
+    await flush_writes(hass)
+
+    assert server.stats.requests[PUT] == 0
+    assert coordinator.write_metrics.skipped_writes == 1
+
+
+async def test_change_and_revert_within_debounce_sends_nothing(
+    hass: HomeAssistant, coordinator: MELCloudHomeCoordinator, server: StandInServer
+) -> None:
+    """Av och på igen inom debounce-fönstret tar ut varandra."""
+    unit_id = _atw_unit_id(coordinator)
+    current = coordinator.get_setting(unit_id, "SetTemperatureZone1")
+    server.stats.reset()
+
+    await coordinator.async_queue_write(unit_id, {"setTemperatureZone1": current + 2})
+    await coordinator.async_queue_write(unit_id, {"setTemperatureZone1": current})
+    await flush_writes(hass)
+
+    assert server.stats.requests[PUT] == 0
+
+
+async def test_failed_write_is_reverted(
+    hass: HomeAssistant, coordinator: MELCloudHomeCoordinator, server: StandInServer
+) -> None:
+    """En misslyckad PUT återställer det optimistiska värdet."""
+    unit_id = _atw_unit_id(coordinator)
+    current = coordinator.get_setting(unit_id, "SetTemperatureZone1")
+    server.fail_with = [500]
+
+    await coordinator.async_queue_write(unit_id, {"setTemperatureZone1": current + 2})
+    assert coordinator.get_setting(unit_id, "SetTemperatureZone1") == current + 2
+    await flush_writes(hass)
+
+    assert coordinator.get_setting(unit_id, "SetTemperatureZone1") == current
+    assert coordinator.write_metrics.failed_writes == 1
+    assert coordinator.write_metrics.reverted_fields == 1
+
+
+async def test_same_value_during_failed_put_is_retried(
+    hass: HomeAssistant, coordinator: MELCloudHomeCoordinator, server: StandInServer
+) -> None:
+    """Samma värde igen medan PUT:en pågår går inte förlorat om PUT:en misslyckas."""
+    unit_id = _atw_unit_id(coordinator)
+    current = coordinator.get_setting(unit_id, "SetTemperatureZone1")
+    put = GatedPut(coordinator)
+    put.results = [False, True]
+
+    await coordinator.async_queue_write(unit_id, {"setTemperatureZone1": current + 2})
+    await asyncio.wait_for(put.started.wait(), 1)
+    # PUT:en pågår; snapshotet visar redan det optimistiska värdet
+    await coordinator.async_queue_write(unit_id, {"setTemperatureZone1": current + 2})
+    put.release.set()
+    await asyncio.wait_for(put.started.wait(), 1)
+    put.release.set()
+    await flush_writes(hass)
+
+    assert put.calls == [{"setTemperatureZone1": current + 2}] * 2
+    assert coordinator.get_setting(unit_id, "SetTemperatureZone1") == current + 2
+    settings = {s["name"]: s["value"] for s in server._units[unit_id]["settings"]}
+    assert float(settings["SetTemperatureZone1"]) == current + 2
+
+
+async def test_same_value_during_successful_put_is_not_resent(
+    hass: HomeAssistant, coordinator: MELCloudHomeCoordinator
+) -> None:
+    """Lyckas PUT:en blir samma värde igen en no-op i stället för en andra PUT."""
+    unit_id = _atw_unit_id(coordinator)
+    current = coordinator.get_setting(unit_id, "SetTemperatureZone1")
+    put = GatedPut(coordinator)
+
+    await coordinator.async_queue_write(unit_id, {"setTemperatureZone1": current + 2})
+    await asyncio.wait_for(put.started.wait(), 1)
+    await coordinator.async_queue_write(unit_id, {"setTemperatureZone1": current + 2})
+    put.release.set()
+    await flush_writes(hass)
+
+    assert len(put.calls) == 1
+    assert coordinator.write_metrics.skipped_writes == 1
+    assert coordinator.get_setting(unit_id, "SetTemperatureZone1") == current + 2
+
+
+async def test_bulk_write_includes_queued_changes(
+    hass: HomeAssistant, coordinator: MELCloudHomeCoordinator, server: StandInServer
+) -> None:
+    """async_write_units tar med ändringar som väntar i skrivkön i samma PUT."""
+    unit_id = _atw_unit_id(coordinator)
+    server.stats.reset()
+
+    await coordinator.async_queue_write(unit_id, {"forcedHotWaterMode": True})
+    failed = await coordinator.async_write_units({unit_id: {"setTemperatureZone1": 25}})
+    await flush_writes(hass)
+
+    assert failed == []
+    assert server.stats.requests[PUT] == 1
+    settings = {s["name"]: s["value"] for s in server._units[unit_id]["settings"]}
+    assert settings["ForcedHotWaterMode"] == "True"
+    assert settings["SetTemperatureZone1"] == "25"
+
+
+async def test_bulk_write_waits_for_queued_put(
+    hass: HomeAssistant, coordinator: MELCloudHomeCoordinator, server: StandInServer
+) -> None:
+    """En tjänsteskrivning väntar på skrivköns PUT och återställs inte av att den misslyckas."""
+    unit_id = _atw_unit_id(coordinator)
+    current = coordinator.get_setting(unit_id, "SetTemperatureZone1")
+    put = GatedPut(coordinator)
+    put.results = [False, True]
+
+    await coordinator.async_queue_write(unit_id, {"setTemperatureZone1": current + 2})
+    await asyncio.wait_for(put.started.wait(), 1)
+    bulk = hass.async_create_task(
+        coordinator.async_write_units({unit_id: {"setTemperatureZone1": current + 3}})
+    )
+    await asyncio.sleep(0.05)
+    # Ingen andra PUT medan den första pågår, och dess fält finns kvar
+    assert len(put.calls) == 1
+    assert coordinator._inflight_writes[unit_id] == {"setTemperatureZone1": current + 2}
+
+    put.release.set()
+    await asyncio.wait_for(put.started.wait(), 1)
+    assert coordinator.get_setting(unit_id, "SetTemperatureZone1") == current + 3
+    put.release.set()
+    assert await bulk == []
+    await flush_writes(hass)
+
+    assert put.calls == [
+        {"setTemperatureZone1": current + 2},
+        {"setTemperatureZone1": current + 3},
+    ]
+    assert coordinator.get_setting(unit_id, "SetTemperatureZone1") == current + 3
+    settings = {s["name"]: s["value"] for s in server._units[unit_id]["settings"]}
+    assert float(settings["SetTemperatureZone1"]) == current + 3
@@ -0,0 +1,198 @@
+"""Tester för historikimporten: tolkning och timstatistik."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Any
+from unittest.mock import AsyncMock
+
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from custom_components.melcloud_home import history
+from custom_components.melcloud_home.const import DOMAIN
+from custom_components.melcloud_home.history import (
+    ATA_MEASURES,
+    ATW_MEASURES,
+    ENERGY_CONSUMED,
+    HISTORY_LATE_WINDOW,
+    HistoryImporter,
+    hourly_statistics,
+    parse_samples,
+    statistic_id,
+)
+from custom_components.melcloud_home.snapshot import UNIT_TYPE_ATA, UnitSnapshot
+
+HOUR = datetime(2024, 3, 1, 10, tzinfo=dt_util.UTC)
+ROOM_TEMPERATURE = next(m for m in ATA_MEASURES if m.key == "room_temperature")
+
+
+def _samples(*points: tuple[int, float]) -> list[tuple[datetime, float]]:
+    """(minuter efter HOUR, värde) -> mätpunkter."""
+    return [(HOUR + timedelta(minutes=minutes), value) for minutes, value in points]
+
+
+def test_parse_samples_sorts_and_skips_invalid() -> None:
+    """Tider tolkas som UTC, sorteras och ogiltiga punkter hoppas över."""
+    data = {
+        "measureData": [
+            {
+                "values": [
+                    {"time": "2024-03-01 11:00:00.000000000", "value": "2"},
+                    {"time": "2024-03-01 10:00:00.000000000", "value": "1.5"},
+                    {"time": "igår", "value": "3"},
+                    {"time": "2024-03-01 12:00:00.000000000", "value": None},
+                    {"value": "4"},
+                ]
+            },
+            {"values": None},
+        ]
+    }
+    assert parse_samples(data) == [(HOUR, 1.5), (HOUR + timedelta(hours=1), 2.0)]
+    assert parse_samples({}) == []
+
+
+def test_energy_is_summed_per_hour_from_running_total() -> None:
+    """Energi summeras per timme och fortsätter från föregående summa."""
+    rows, total = hourly_statistics(
+        _samples((0, 100), (30, 50), (60, 200), (130, 25)),
+        ENERGY_CONSUMED,
+        before=HOUR + timedelta(hours=3),
+        total=1000,
+    )
+    assert [(row["start"], row["sum"]) for row in rows] == [
+        (HOUR, 1150),
+        (HOUR + timedelta(hours=1), 1350),
+        (HOUR + timedelta(hours=2), 1375),
+    ]
+    assert all(row["state"] == row["sum"] for row in rows)
+    assert total == 1375
+
+
+def test_temperature_gives_mean_min_max() -> None:
+    """Temperaturer ger medel, min och max per timme."""
+    rows, total = hourly_statistics(
+        _samples((0, 20), (20, 21), (40, 22.5)), ROOM_TEMPERATURE, HOUR + timedelta(hours=1)
+    )
+    assert len(rows) == 1
+    assert rows[0]["mean"] == pytest.approx(21.1666, abs=1e-3)
+    assert rows[0]["min"] == 20
+    assert rows[0]["max"] == 22.5
+    assert "sum" not in rows[0]
+    assert total == 0
+
+
+def test_unfinished_hour_is_left_out() -> None:
+    """Timmar som inte är avslutade före before tas inte med."""
+    rows, total = hourly_statistics(
+        _samples((0, 100), (70, 100)), ENERGY_CONSUMED, before=HOUR + timedelta(hours=1)
+    )
+    assert [row["start"] for row in rows] == [HOUR]
+    assert total == 100
+
+
+def test_statistic_ids_are_unique_per_unit_and_measure() -> None:
+    """Varje enhet och mätvärde får ett eget, giltigt statistik-id."""
+    unit_id = "0A1B2C3D-0000-4000-8000-000000000001"
+    ids = {statistic_id(unit_id, measure) for measure in ATW_MEASURES}
+    assert len(ids) == len(ATW_MEASURES)
+    assert all(i.startswith("melcloud_home:0a1b2c3d_0000_") for i in ids)
+    assert all(i == i.lower() and "-" not in i for i in ids)
+
+
+class FakeTelemetryAPI:
+    """Serverar mätpunkter per mätvärde, som telemetri-API:t gör."""
+
+    telemetry_supported = True
+
+    def __init__(self) -> None:
+        self.samples: dict[str, list[tuple[datetime, float]]] = {}
+        self.requests: list[tuple[str, datetime, datetime]] = []
+
+    async def get_telemetry(
+        self, unit_id: str, telemetry: str, measure: str, start: datetime, end: datetime
+    ) -> dict[str, Any]:
+        self.requests.append((measure, start, end))
+        values = [
+            {"time": when.strftime("%Y-%m-%d %H:%M:%S.000000000"), "value": str(value)}
+            for when, value in self.samples.get(measure, [])
+            if start <= when < end
+        ]
+        return {"measureData": [{"values": values}]}
+
+
+@pytest.fixture
+def now(monkeypatch: pytest.MonkeyPatch) -> list[datetime]:
+    """Styr utcnow i historikimporten; ändra now[0] för att flytta tiden."""
+    now = [HOUR]
+    monkeypatch.setattr(history.dt_util, "utcnow", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def imported(monkeypatch: pytest.MonkeyPatch) -> dict[datetime, Any]:
+    """Energirader som importerats, per timme; senaste importen vinner som i recordern."""
+    rows: dict[datetime, Any] = {}
+
+    def _add(hass: HomeAssistant, metadata: Any, statistics: list[Any]) -> None:
+        if metadata["statistic_id"] == statistic_id("u1", ENERGY_CONSUMED):
+            rows.update((row["start"], row) for row in statistics)
+
+    monkeypatch.setattr(history, "async_add_external_statistics", _add)
+    monkeypatch.setattr(
+        HistoryImporter, "_async_cursor_from_recorder", AsyncMock(return_value=None)
+    )
+    return rows
+
+
+async def test_late_uploads_are_imported(
+    hass: HomeAssistant, now: list[datetime], imported: dict[datetime, Any]
+) -> None:
+    """Sena uppladdningar inom fönstret tas med och summorna räknas om."""
+    api = FakeTelemetryAPI()
+    importer = HistoryImporter(hass, api, MockConfigEntry(domain=DOMAIN))
+    unit = UnitSnapshot("u1", UNIT_TYPE_ATA, "AC", None, None, True)
+    api.samples[ENERGY_CONSUMED.measure] = [
+        (HOUR + timedelta(hours=h, minutes=10), 100) for h in range(3)
+    ]
+    now[0] = HOUR + timedelta(hours=3, minutes=5)
+    await importer.async_import([unit])
+    assert [imported[HOUR + timedelta(hours=h)]["sum"] for h in range(3)] == [100, 200, 300]
+
+    # Timme 11 får en sen uppladdning och timme 13 blir klar
+    api.samples[ENERGY_CONSUMED.measure] += [
+        (HOUR + timedelta(hours=1, minutes=40), 50),
+        (HOUR + timedelta(hours=3, minutes=10), 100),
+    ]
+    now[0] += timedelta(hours=1)
+    await importer.async_import([unit])
+
+    assert [imported[HOUR + timedelta(hours=h)]["sum"] for h in range(4)] == [100, 250, 350, 450]
+    # Andra körningen hämtar om fönstret plus den nya timmen
+    _, start, end = [r for r in api.requests if r[0] == ENERGY_CONSUMED.measure][-1]
+    assert end - start == HISTORY_LATE_WINDOW + timedelta(hours=1)
+
+
+async def test_cursor_stays_before_late_window(
+    hass: HomeAssistant, now: list[datetime], imported: dict[datetime, Any]
+) -> None:
+    """Utan data flyttas markören bara fram till fönstret, inte hela vägen."""
+    api = FakeTelemetryAPI()
+    importer = HistoryImporter(hass, api, MockConfigEntry(domain=DOMAIN))
+    unit = UnitSnapshot("u1", UNIT_TYPE_ATA, "AC", None, None, True)
+    now[0] = HOUR + timedelta(minutes=5)
+    await importer.async_import([unit])
+    assert not imported
+
+    # Sena uppladdningar: timmen före fönstret räknas som slutgiltig, den inom fönstret tas med
+    api.samples[ENERGY_CONSUMED.measure] = [
+        (HOUR - HISTORY_LATE_WINDOW - timedelta(minutes=50), 10),
+        (HOUR - timedelta(minutes=50), 100),
+    ]
+    now[0] += timedelta(hours=1)
+    await importer.async_import([unit])
+
+    assert list(imported) == [HOUR - timedelta(hours=1)]
+    assert imported[HOUR - timedelta(hours=1)]["sum"] == 100
@@ -0,0 +1,120 @@
+"""Tester för det adaptiva pollintervallet."""
+from __future__ import annotations
+
+from datetime import timedelta
+
+import pytest
+
+from benchmarks.standin_server import StandInServer
+from custom_components.melcloud_home import MELCloudHomeCoordinator, polling
+from custom_components.melcloud_home.polling import (
+    BACKOFF_JITTER,
+    BASE_INTERVAL,
+    FAST_INTERVAL,
+    FAST_WINDOW,
+    MAX_BACKOFF_INTERVAL,
+    MAX_IDLE_INTERVAL,
+    AdaptivePollInterval,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> list[float]:
+    """Styr time.monotonic i polling; ändra clock[0] för att flytta tiden."""
+    now = [1000.0]
+    monkeypatch.setattr(polling.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_starts_at_base_interval() -> None:
+    """Första intervallet är grundintervallet."""
+    assert AdaptivePollInterval().current == BASE_INTERVAL
+
+
+def test_idle_polls_back_off_to_cap(clock: list[float]) -> None:
+    """Oförändrade uppdateringar dubblar intervallet upp till taket."""
+    poll = AdaptivePollInterval()
+    intervals = [poll.note_success(changed=False) for _ in range(10)]
+    assert intervals[0] == BASE_INTERVAL * 2
+    assert intervals == sorted(intervals)
+    assert intervals[-1] == MAX_IDLE_INTERVAL
+
+
+def test_change_resets_idle_back_off(clock: list[float]) -> None:
+    """En ändring återgår till grundintervallet."""
+    poll = AdaptivePollInterval()
+    for _ in range(5):
+        poll.note_success(changed=False)
+    assert poll.note_success(changed=True) == BASE_INTERVAL
+
+
+def test_long_idle_stays_at_cap(clock: list[float]) -> None:
+    """Ett dygn utan ändringar stannar vid taket utan att räknaren växer förbi det."""
+    poll = AdaptivePollInterval()
+    for _ in range(200):
+        assert poll.note_success(changed=False) <= MAX_IDLE_INTERVAL
+    assert poll.current == MAX_IDLE_INTERVAL
+
+
+async def test_measured_changes_do_not_reset_back_off(
+    coordinator: MELCloudHomeCoordinator, server: StandInServer
+) -> None:
+    """Ändrade temperaturer glesar ut pollningen; ett ändrat börvärde återställer den."""
+    unit_id = next(
+        unit.id for unit in coordinator.units.values() if "RoomTemperatureZone1" in unit.settings
+    )
+    await coordinator.async_refresh()
+    assert coordinator.update_interval == BASE_INTERVAL * 2
+
+    server.set_setting(unit_id, "RoomTemperatureZone1", 19.5)
+    await coordinator.async_refresh()
+    assert coordinator.get_setting(unit_id, "RoomTemperatureZone1") == 19.5
+    assert coordinator.update_interval == BASE_INTERVAL * 4
+
+    server.set_setting(unit_id, "SetTemperatureZone1", 24)
+    await coordinator.async_refresh()
+    assert coordinator.update_interval == BASE_INTERVAL
+
+
+def test_write_polls_fast_for_a_while(clock: list[float]) -> None:
+    """Efter en skrivning pollas snabbt tills fönstret löpt ut."""
+    poll = AdaptivePollInterval()
+    assert poll.note_write() == FAST_INTERVAL
+    assert poll.fast_polling
+    assert poll.note_success(changed=False) == FAST_INTERVAL
+    clock[0] += FAST_WINDOW.total_seconds() + 1
+    assert not poll.fast_polling
+    assert poll.note_success(changed=False) >= BASE_INTERVAL
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_error_backs_off_exponentially_with_jitter(status: int) -> None:
+    """429/5xx dubblar intervallet med jitter upp till taket."""
+    poll = AdaptivePollInterval()
+    for errors in range(1, 12):
+        expected = min(BASE_INTERVAL * 2 ** (errors - 1), MAX_BACKOFF_INTERVAL)
+        interval = poll.note_error(status)
+        assert expected * (1 - BACKOFF_JITTER) <= interval <= expected * (1 + BACKOFF_JITTER)
+
+
+def test_error_respects_retry_after() -> None:
+    """Retry-After längre än backoffen vinner."""
+    poll = AdaptivePollInterval()
+    assert poll.note_error(429, retry_after=7200) == timedelta(seconds=7200)
+
+
+@pytest.mark.parametrize("status", [None, 400, 401, 404])
+def test_other_errors_keep_interval(status: int | None) -> None:
+    """Fel som inte beror på överlast ändrar inte intervallet."""
+    poll = AdaptivePollInterval()
+    assert poll.note_error(status) == BASE_INTERVAL
+
+
+def test_success_resets_error_back_off(clock: list[float]) -> None:
+    """En lyckad uppdatering efter fel börjar om backoffen."""
+    poll = AdaptivePollInterval()
+    for _ in range(4):
+        poll.note_error(503)
+    poll.note_success(changed=True)
+    interval = poll.note_error(503)
+    assert interval <= BASE_INTERVAL * (1 + BACKOFF_JITTER)
@@ -0,0 +1,96 @@
+"""Tester för push-kanalen: opt-in och tålighet mot meddelanden med fel form."""
+from __future__ import annotations
+
+import asyncio
+import json
+from collections.abc import AsyncIterator
+from typing import Any
+from unittest.mock import Mock
+
+import pytest
+
+from homeassistant.core import HomeAssistant
+
+from benchmarks.standin_server import PUSH_PATH, StandInServer
+from custom_components.melcloud_home import MELCloudHomeCoordinator
+from custom_components.melcloud_home.const import CONF_PUSH
+from custom_components.melcloud_home.push import PushChannel
+
+from .common import PASSWORD, USERNAME
+
+PUSH_REQUEST = f"GET {PUSH_PATH}"
+
+
+@pytest.fixture
+async def server(
+    account: dict[str, Any], socket_enabled: None
+) -> AsyncIterator[StandInServer]:
+    """Stand-in-servern med push-kanalen påslagen."""
+    async with StandInServer(account, USERNAME, PASSWORD, push=True) as server:
+        yield server
+
+
+async def _wait_for(condition) -> None:
+    """Vänta tills villkoret uppfylls, högst en sekund."""
+    for _ in range(100):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("villkoret uppfylldes inte")
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "inte json",
+        json.dumps({"settings": []}),
+        json.dumps({"unitId": ["u1"], "settings": []}),
+        json.dumps({"unitId": "u1", "settings": {"name": "Power"}}),
+        json.dumps({"unitId": "u1", "settings": ["Power"]}),
+        json.dumps({"unitId": "u1", "settings": [{"name": ["Power"], "value": "True"}]}),
+        json.dumps([None, 3]),
+    ],
+)
+def test_malformed_messages_are_skipped(message: str) -> None:
+    """Meddelanden med fel form räknas och lämnas inte vidare."""
+    on_delta = Mock()
+    channel = PushChannel(Mock(), on_delta, Mock())
+    channel._handle_message(message)
+    on_delta.assert_not_called()
+    assert channel.invalid_messages >= 1
+
+
+def test_failing_delta_does_not_raise() -> None:
+    """Ett fel när en delta appliceras loggas, och nästa delta i meddelandet behandlas."""
+    on_delta = Mock(side_effect=[KeyError("unitId"), None])
+    channel = PushChannel(Mock(), on_delta, Mock())
+    channel._handle_message(json.dumps([{"unitId": "u1"}, {"unitId": "u2", "isConnected": False}]))
+    assert on_delta.call_count == 2
+    assert channel.deltas == 2
+
+
+async def test_push_is_off_by_default(
+    hass: HomeAssistant, coordinator: MELCloudHomeCoordinator, server: StandInServer
+) -> None:
+    """Utan option ansluts kanalen aldrig, även om servern erbjuder den."""
+    await hass.async_block_till_done()
+    assert server.stats.requests[PUSH_REQUEST] == 0
+    assert not coordinator.push.connected
+
+
+@pytest.mark.parametrize("entry_options", [{CONF_PUSH: True}])
+async def test_push_survives_malformed_frames(
+    hass: HomeAssistant, coordinator: MELCloudHomeCoordinator, server: StandInServer
+) -> None:
+    """Med option ansluts kanalen, och fel form på ett meddelande stoppar den inte."""
+    await _wait_for(lambda: coordinator.push.connected)
+    unit_id = next(iter(coordinator.units))
+
+    for ws in list(server._push_clients):
+        await ws.send_str(json.dumps({"unitId": unit_id, "settings": "Power=False"}))
+        await ws.send_str(json.dumps({"unitId": [unit_id]}))
+    server.set_setting(unit_id, "Power", False)
+
+    await _wait_for(lambda: coordinator.get_setting(unit_id, "Power") is False)
+    assert coordinator.push.connected
+    assert coordinator.push.invalid_messages == 2
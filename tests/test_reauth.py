@@ -0,0 +1,90 @@
+"""Tester för omautentisering när start sker från ett sparat snapshot."""
+from __future__ import annotations
+
+import time
+from typing import Any
+
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.config_entries import SOURCE_REAUTH, ConfigEntryState
+from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+from homeassistant.data_entry_flow import FlowResultType
+
+from benchmarks.standin_server import StandInServer
+from custom_components.melcloud_home.const import DOMAIN, STORAGE_VERSION
+from custom_components.melcloud_home.snapshot import build_unit_index, serialize_unit_index
+
+from .common import USERNAME
+
+
+@pytest.fixture
+def stored_snapshot(
+    hass_storage: dict[str, Any], config_entry: MockConfigEntry, account: dict[str, Any]
+) -> None:
+    """Ett sparat snapshot, så att setup lyckas utan inloggning."""
+    hass_storage[f"{DOMAIN}.{config_entry.entry_id}.snapshot"] = {
+        "version": STORAGE_VERSION,
+        "key": f"{DOMAIN}.{config_entry.entry_id}.snapshot",
+        "data": {
+            "units": serialize_unit_index(build_unit_index(account)),
+            "synced_at": time.time(),
+        },
+    }
+
+
+def _reauth_flows(hass: HomeAssistant) -> list[dict[str, Any]]:
+    return [
+        flow
+        for flow in hass.config_entries.flow.async_progress()
+        if flow["handler"] == DOMAIN and flow["context"]["source"] == SOURCE_REAUTH
+    ]
+
+
+async def test_rejected_login_after_snapshot_starts_reauth(
+    hass: HomeAssistant,
+    config_entry: MockConfigEntry,
+    server: StandInServer,
+    stored_snapshot: None,
+) -> None:
+    """Nekas inloggningen i bakgrunden efter start från snapshot startas omautentisering."""
+    server.password = "bytt"
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    assert config_entry.state is ConfigEntryState.LOADED
+
+    (flow,) = _reauth_flows(hass)
+    result = await hass.config_entries.flow.async_configure(
+        flow["flow_id"], {CONF_USERNAME: USERNAME, CONF_PASSWORD: "fel"}
+    )
+    assert result["type"] == FlowResultType.FORM
+    assert result["errors"] == {"base": "invalid_auth"}
+
+    result = await hass.config_entries.flow.async_configure(
+        flow["flow_id"], {CONF_USERNAME: USERNAME, CONF_PASSWORD: "bytt"}
+    )
+    assert result["type"] == FlowResultType.ABORT
+    assert result["reason"] == "reauth_successful"
+    await hass.async_block_till_done()
+
+    assert config_entry.data[CONF_PASSWORD] == "bytt"
+    coordinator = hass.data[DOMAIN][config_entry.entry_id]["coordinator"]
+    assert coordinator.last_update_success
+    assert not coordinator.api.credentials_rejected
+    await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+async def test_unreachable_cloud_after_snapshot_does_not_start_reauth(
+    hass: HomeAssistant,
+    config_entry: MockConfigEntry,
+    server: StandInServer,
+    stored_snapshot: None,
+) -> None:
+    """Ett avbrott är inte nekade uppgifter; senast kända värden visas i stället."""
+    server.fail_with = [503] * 10
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    assert not _reauth_flows(hass)
+    await hass.config_entries.async_unload(config_entry.entry_id)
@@ -0,0 +1,76 @@
+"""Coordinator och plattformar mot en uppspelad kassett.
+
+fixtures/account.cassette.json är inspelad med CassetteRecorder mot
+stand-in-servern: en inloggning och två user context, där börvärdet och
+rumstemperaturen för värmepumpen ändrats mellan hämtningarna. En kassett
+från ett riktigt konto (python -m benchmarks.replay record) kan läggas
+bredvid och köras på samma sätt.
+"""
+from __future__ import annotations
+
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+import pytest
+
+from homeassistant.components.climate import ATTR_CURRENT_TEMPERATURE, ATTR_TEMPERATURE
+from homeassistant.core import HomeAssistant, State
+from homeassistant.helpers import entity_registry as er
+
+from benchmarks.replay import ReplayServer, load_cassette
+from custom_components.melcloud_home import MELCloudHomeCoordinator
+from custom_components.melcloud_home.const import DOMAIN
+from custom_components.melcloud_home.metrics import ENDPOINT_USER_CONTEXT
+from custom_components.melcloud_home.snapshot import UNIT_TYPE_ATA, UNIT_TYPE_ATW
+
+CASSETTE = Path(__file__).parent / "fixtures" / "account.cassette.json"
+
+
+@pytest.fixture
+async def server(socket_enabled: None) -> AsyncIterator[ReplayServer]:
+    """Uppspelningsservern med kassetten, på 127.0.0.1."""
+    async with ReplayServer(load_cassette(str(CASSETTE))) as server:
+        yield server
+
+
+def _climate_state(
+    hass: HomeAssistant, coordinator: MELCloudHomeCoordinator, unit_type: str
+) -> State:
+    """Returnera climate-entitetens state för kontots enhet av given typ."""
+    unit = next(unit for unit in coordinator.units.values() if unit.type == unit_type)
+    entity_id = er.async_get(hass).async_get_entity_id("climate", DOMAIN, f"{unit.id}_climate")
+    assert entity_id is not None
+    return hass.states.get(entity_id)
+
+
+async def test_entities_follow_recorded_contexts(
+    hass: HomeAssistant, coordinator: MELCloudHomeCoordinator, server: ReplayServer
+) -> None:
+    """Entiteterna visar den första inspelade user context och sedan ändringen."""
+    assert len(coordinator.units) == 2
+    atw = _climate_state(hass, coordinator, UNIT_TYPE_ATW)
+    assert atw.attributes[ATTR_TEMPERATURE] == 22
+    assert atw.attributes[ATTR_CURRENT_TEMPERATURE] == 21.5
+    ata = _climate_state(hass, coordinator, UNIT_TYPE_ATA)
+    assert ata.attributes[ATTR_TEMPERATURE] == 21
+
+    await coordinator.async_refresh()
+    await hass.async_block_till_done()
+
+    assert server.replayed[ENDPOINT_USER_CONTEXT] == 2
+    atw = _climate_state(hass, coordinator, UNIT_TYPE_ATW)
+    assert atw.attributes[ATTR_TEMPERATURE] == 23
+    assert atw.attributes[ATTR_CURRENT_TEMPERATURE] == 22
+    assert _climate_state(hass, coordinator, UNIT_TYPE_ATA).attributes[ATTR_TEMPERATURE] == 21
+
+
+async def test_last_recorded_context_is_repeated(
+    hass: HomeAssistant, coordinator: MELCloudHomeCoordinator, server: ReplayServer
+) -> None:
+    """När kassetten tagit slut upprepas sista svaret och inget ändras."""
+    for _ in range(3):
+        await coordinator.async_refresh()
+    await hass.async_block_till_done()
+
+    assert coordinator.last_update_success
+    assert _climate_state(hass, coordinator, UNIT_TYPE_ATW).attributes[ATTR_TEMPERATURE] == 23
@@ -0,0 +1,127 @@
+"""Tester för token bucket-schemaläggaren och prioritetssemaforen."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from custom_components.melcloud_home.scheduler import (
+    PRIORITY_AUTOMATION,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_POLL,
+    PrioritySemaphore,
+    RequestScheduler,
+)
+
+
+async def _acquire_in_order(
+    acquire, priorities: list[int], order: list[int]
+) -> list[asyncio.Task[None]]:
+    """Starta en väntande per prioritet, i listans ordning."""
+
+    async def _one(priority: int) -> None:
+        await acquire(priority)
+        order.append(priority)
+
+    tasks = []
+    for priority in priorities:
+        tasks.append(asyncio.create_task(_one(priority)))
+        # Låt uppgiften hamna i kön innan nästa startas
+        await asyncio.sleep(0)
+    return tasks
+
+
+async def test_scheduler_passes_burst_immediately() -> None:
+    """Så länge det finns tokens släpps förfrågningar direkt."""
+    scheduler = RequestScheduler(rate=1, burst=3)
+    for _ in range(3):
+        await asyncio.wait_for(scheduler.acquire(), 0.01)
+    assert scheduler.throttled == 0
+
+
+async def test_scheduler_releases_waiters_by_priority() -> None:
+    """Väntande släpps i prioritetsordning, inte ankomstordning."""
+    scheduler = RequestScheduler(rate=50, burst=1)
+    await scheduler.acquire()
+    order: list[int] = []
+    tasks = await _acquire_in_order(
+        scheduler.acquire, [PRIORITY_POLL, PRIORITY_AUTOMATION, PRIORITY_INTERACTIVE], order
+    )
+    await asyncio.wait_for(asyncio.gather(*tasks), 1)
+    assert order == [PRIORITY_INTERACTIVE, PRIORITY_AUTOMATION, PRIORITY_POLL]
+    assert scheduler.throttled == 3
+    assert scheduler.max_depth == 3
+    assert scheduler.depth == 0
+
+
+async def test_scheduler_respects_rate() -> None:
+    """Utan tokens kvar släpps förfrågningar i takt med påfyllningen."""
+    scheduler = RequestScheduler(rate=20, burst=1)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    for _ in range(4):
+        await scheduler.acquire()
+    # Första gick direkt, resten väntade 50 ms var
+    assert loop.time() - started >= 0.14
+
+
+async def test_scheduler_without_rate_never_waits() -> None:
+    """rate=None stänger av begränsningen."""
+    scheduler = RequestScheduler(rate=None, burst=1)
+    for _ in range(100):
+        await asyncio.wait_for(scheduler.acquire(), 0.01)
+    assert scheduler.throttled == 0
+
+
+async def test_scheduler_cancelled_waiter_is_skipped() -> None:
+    """En avbruten väntande tar ingen token från de andra."""
+    scheduler = RequestScheduler(rate=50, burst=1)
+    await scheduler.acquire()
+    cancelled = asyncio.create_task(scheduler.acquire(PRIORITY_INTERACTIVE))
+    await asyncio.sleep(0)
+    waiting = asyncio.create_task(scheduler.acquire(PRIORITY_POLL))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    await asyncio.wait_for(waiting, 1)
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+
+
+async def test_semaphore_limits_and_prioritises() -> None:
+    """Lediga platser går till högst prioriterade väntande."""
+    semaphore = PrioritySemaphore(1)
+    await semaphore.acquire()
+    order: list[int] = []
+    tasks = await _acquire_in_order(
+        semaphore.acquire, [PRIORITY_POLL, PRIORITY_INTERACTIVE, PRIORITY_AUTOMATION], order
+    )
+    assert order == []
+    for _ in tasks:
+        semaphore.release()
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    assert order == [PRIORITY_INTERACTIVE, PRIORITY_AUTOMATION, PRIORITY_POLL]
+
+
+async def test_semaphore_cancelled_waiter_does_not_leak_slot() -> None:
+    """En avbruten väntande som redan fått en plats lämnar den vidare."""
+    semaphore = PrioritySemaphore(1)
+    await semaphore.acquire()
+    first = asyncio.create_task(semaphore.acquire(PRIORITY_INTERACTIVE))
+    second = asyncio.create_task(semaphore.acquire(PRIORITY_POLL))
+    await asyncio.sleep(0)
+    # Platsen tilldelas first, som avbryts innan den hunnit köra
+    semaphore.release()
+    first.cancel()
+    await asyncio.wait_for(second, 1)
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+
+async def test_semaphore_hold_releases_on_error() -> None:
+    """hold() lämnar tillbaka platsen även vid undantag."""
+    semaphore = PrioritySemaphore(1)
+    with pytest.raises(RuntimeError):
+        async with semaphore.hold():
+            raise RuntimeError
+    await asyncio.wait_for(semaphore.acquire(), 0.01)
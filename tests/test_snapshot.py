@@ -0,0 +1,177 @@
+"""Tester för snapshotet: indexbygge, diff och optimistiska ändringar."""
+from __future__ import annotations
+
+from dataclasses import replace
+
+from custom_components.melcloud_home.snapshot import (
+    ALL_KEYS,
+    META_KEY,
+    UNIT_TYPE_ATA,
+    UNIT_TYPE_ATW,
+    UnitSnapshot,
+    apply_state,
+    apply_unit_delta,
+    build_unit_index,
+    diff_unit_indexes,
+    has_control_changes,
+    merge_unit_state,
+    restore_unit_index,
+    serialize_unit_index,
+)
+
+
+def _unit(unit_id: str = "u1", **settings: object) -> UnitSnapshot:
+    return UnitSnapshot(
+        id=unit_id,
+        type=UNIT_TYPE_ATW,
+        name="Värmepump",
+        building_id="b1",
+        building_name="Hus",
+        is_connected=True,
+        settings={"Power": True, "SetTemperatureZone1": 21.0, **settings},
+    )
+
+
+def test_diff_identical_indexes_is_empty() -> None:
+    """Oförändrade enheter finns inte med i diffen."""
+    assert diff_unit_indexes({"u1": _unit()}, {"u1": _unit()}) == {}
+
+
+def test_diff_changed_setting() -> None:
+    """Bara den ändrade settingen rapporteras."""
+    changes = diff_unit_indexes({"u1": _unit()}, {"u1": _unit(SetTemperatureZone1=22.0)})
+    assert changes == {"u1": frozenset({"SetTemperatureZone1"})}
+
+
+def test_diff_added_and_removed_setting() -> None:
+    """Settings som tillkommer eller försvinner räknas som ändrade."""
+    old = _unit(RoomTemperatureZone1=20.5)
+    new = _unit(TankWaterTemperature=48.0)
+    new.settings.pop("Power")
+    assert diff_unit_indexes({"u1": old}, {"u1": new}) == {
+        "u1": frozenset({"RoomTemperatureZone1", "TankWaterTemperature", "Power"})
+    }
+
+
+def test_diff_metadata_change() -> None:
+    """Anslutning, namn och byggnad ger META_KEY."""
+    old = _unit()
+    for changed in (
+        replace(old, is_connected=False),
+        replace(old, name="Nytt namn"),
+        replace(old, building_name="Stuga"),
+    ):
+        assert diff_unit_indexes({"u1": old}, {"u1": changed}) == {"u1": frozenset({META_KEY})}
+
+
+def test_diff_added_and_removed_units() -> None:
+    """Nya och borttagna enheter markeras med ALL_KEYS."""
+    changes = diff_unit_indexes({"u1": _unit("u1")}, {"u2": _unit("u2")})
+    assert changes == {"u1": frozenset({ALL_KEYS}), "u2": frozenset({ALL_KEYS})}
+
+
+def test_control_changes_ignore_measured_values() -> None:
+    """Ändrade mätvärden och metadata räknas inte som att enheten styrs."""
+    assert not has_control_changes({})
+    assert not has_control_changes(
+        {
+            "u1": frozenset({"RoomTemperatureZone1", "TankWaterTemperature"}),
+            "u2": frozenset({META_KEY}),
+        }
+    )
+    assert has_control_changes({"u1": frozenset({"RoomTemperature", "SetTemperature"})})
+    assert has_control_changes({"u1": frozenset({"OperationModeZone1"})})
+    assert has_control_changes({"u2": frozenset({ALL_KEYS})})
+
+
+def test_build_unit_index_projects_and_coerces() -> None:
+    """Bara använda settings tas med, och värdena får rätt typ."""
+    context = {
+        "buildings": [
+            {
+                "id": "b1",
+                "name": "Hus",
+                "airToAirUnits": [
+                    {
+                        "id": "u1",
+                        "givenDisplayName": "Vardagsrum",
+                        "isConnected": True,
+                        "capabilities": {"minSetTemperature": 10, "okänd": 1},
+                        "settings": [
+                            {"name": "Power", "value": "True"},
+                            {"name": "SetTemperature", "value": "21.5"},
+                            {"name": "OperationMode", "value": "Heat"},
+                            {"name": "FanSpeed", "value": "3"},
+                            {"name": "VaneVertical", "value": "2"},
+                            {"name": "VaneHorizontal", "value": "Swing"},
+                            {"name": "ErrorCode", "value": "8000"},
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+    unit = build_unit_index(context)["u1"]
+    assert unit.type == UNIT_TYPE_ATA
+    assert unit.building_name == "Hus"
+    assert unit.capabilities == {"minSetTemperature": 10}
+    # Fläkt- och vinkellägen är lägen, inte tal, och behålls som strängar
+    assert unit.settings == {
+        "Power": True,
+        "SetTemperature": 21.5,
+        "OperationMode": "Heat",
+        "FanSpeed": "3",
+        "VaneVertical": "2",
+        "VaneHorizontal": "Swing",
+    }
+
+
+def test_serialize_round_trip() -> None:
+    """Ett serialiserat index återskapas oförändrat."""
+    units = {"u1": _unit()}
+    assert restore_unit_index(serialize_unit_index(units)) == units
+
+
+def test_apply_state_reports_changed_settings() -> None:
+    """Optimistiska ändringar skrivs i PascalCase och bara ändringar rapporteras."""
+    unit = _unit()
+    assert apply_state(unit, {"power": True, "setTemperatureZone1": 23}) == frozenset(
+        {"SetTemperatureZone1"}
+    )
+    assert unit.settings["SetTemperatureZone1"] == 23.0
+
+
+def test_mode_settings_stay_strings() -> None:
+    """Lägen som ser ut som tal jämförs som strängar i deltor och optimistiska ändringar."""
+    unit = _unit(FanSpeed="3")
+    assert apply_unit_delta(unit, {"settings": [{"name": "FanSpeed", "value": "3"}]}) == frozenset()
+    assert apply_state(unit, {"fanSpeed": "4"}) == frozenset({"FanSpeed"})
+    assert unit.settings["FanSpeed"] == "4"
+
+
+def test_apply_unit_delta() -> None:
+    """En push-delta ändrar använda settings och anslutningen."""
+    unit = _unit()
+    delta = {
+        "unitId": "u1",
+        "isConnected": False,
+        "settings": [
+            {"name": "SetTemperatureZone1", "value": "21"},
+            {"name": "Power", "value": "False"},
+            {"name": "ErrorCode", "value": "1"},
+        ],
+    }
+    assert apply_unit_delta(unit, delta) == frozenset({"Power", META_KEY})
+    assert unit.settings["Power"] is False
+    assert not unit.is_connected
+
+
+def test_merge_unit_state_keeps_missing_fields() -> None:
+    """Fält som saknas i en enhetsläsning tas från föregående snapshot."""
+    previous = _unit()
+    previous.capabilities = {"hasHotWater": True}
+    merged = merge_unit_state(previous, {"settings": [{"name": "Power", "value": "False"}]})
+    assert merged.name == previous.name
+    assert merged.building_id == "b1"
+    assert merged.capabilities == {"hasHotWater": True}
+    assert merged.settings == {"Power": False}
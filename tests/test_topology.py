@@ -0,0 +1,84 @@
+"""Tester för enheter som tillkommer och försvinner ur user context."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import device_registry as dr
+
+from benchmarks.standin_server import StandInServer
+from custom_components.melcloud_home import UNIT_RETIRE_AFTER, MELCloudHomeCoordinator
+from custom_components.melcloud_home.const import DOMAIN
+
+
+def _remove_units(server: StandInServer, keep: int | None = None) -> list[dict[str, Any]]:
+    """Ta bort enheter ur serverns user context; behåll de första keep."""
+    units = [
+        (building, key, unit)
+        for building in server.user_context["buildings"]
+        for key in ("airToWaterUnits", "airToAirUnits")
+        for unit in building[key]
+    ]
+    removed = []
+    for building, key, unit in units[keep:]:
+        building[key].remove(unit)
+        removed.append(unit)
+    server._units = server._index_units()
+    return removed
+
+
+def _has_device(hass: HomeAssistant, unit_id: str) -> bool:
+    return dr.async_get(hass).async_get_device(identifiers={(DOMAIN, unit_id)}) is not None
+
+
+async def test_unit_is_retired_after_consecutive_absences(
+    hass: HomeAssistant, coordinator: MELCloudHomeCoordinator, server: StandInServer
+) -> None:
+    """En enhet tas bort först när den saknats i flera hämtningar i rad."""
+    count = len(coordinator.units)
+    (removed,) = _remove_units(server, keep=count - 1)
+
+    for _ in range(UNIT_RETIRE_AFTER - 1):
+        await coordinator.async_refresh()
+        await hass.async_block_till_done()
+        assert removed["id"] in coordinator.units
+        assert _has_device(hass, removed["id"])
+
+    await coordinator.async_refresh()
+    await hass.async_block_till_done()
+    assert removed["id"] not in coordinator.units
+    assert not _has_device(hass, removed["id"])
+    assert len(coordinator.units) == count - 1
+
+
+async def test_reappearing_unit_resets_count(
+    hass: HomeAssistant, coordinator: MELCloudHomeCoordinator, server: StandInServer
+) -> None:
+    """Saknas enheten bara ibland börjar räkningen om."""
+    building = server.user_context["buildings"][0]
+    unit = building["airToWaterUnits"][0]
+    for _ in range(UNIT_RETIRE_AFTER):
+        building["airToWaterUnits"].remove(unit)
+        for _ in range(UNIT_RETIRE_AFTER - 1):
+            await coordinator.async_refresh()
+        building["airToWaterUnits"].append(unit)
+        await coordinator.async_refresh()
+    await hass.async_block_till_done()
+
+    assert unit["id"] in coordinator.units
+    assert _has_device(hass, unit["id"])
+
+
+async def test_all_units_missing_retires_nothing(
+    hass: HomeAssistant, coordinator: MELCloudHomeCoordinator, server: StandInServer
+) -> None:
+    """Ett svar utan någon av kontots enheter tar aldrig bort dem."""
+    unit_ids = set(coordinator.units)
+    _remove_units(server, keep=0)
+
+    for _ in range(UNIT_RETIRE_AFTER * 2):
+        await coordinator.async_refresh()
+    await hass.async_block_till_done()
+
+    assert set(coordinator.units) == unit_ids
+    assert all(_has_device(hass, unit_id) for unit_id in unit_ids)
@@ -0,0 +1,136 @@
+"""Tester för rullande temperaturtrender."""
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from custom_components.melcloud_home.snapshot import UNIT_TYPE_ATW, UnitSnapshot
+from custom_components.melcloud_home.trends import (
+    ATTR_TIME_TO_TARGET,
+    ATTR_TREND_MEAN,
+    ATTR_TREND_RATE,
+    TREND_MAX_AGE,
+    TREND_MIN_SPACING,
+    TREND_WINDOW,
+    RollingSeries,
+    UnitTrends,
+)
+
+START = 1_700_000_000.0
+
+
+def _least_squares(samples: list[tuple[float, float]]) -> float:
+    """Lutning i grader per timme, beräknad från grunden."""
+    n = len(samples)
+    mean_t = sum(t for t, _ in samples) / n
+    mean_v = sum(v for _, v in samples) / n
+    covariance = sum((t - mean_t) * (v - mean_v) for t, v in samples)
+    variance = sum((t - mean_t) ** 2 for t, _ in samples)
+    return covariance / variance * 3600
+
+
+def test_empty_series() -> None:
+    """En tom serie har varken medelvärde, lutning eller senaste värde."""
+    series = RollingSeries()
+    assert len(series) == 0
+    assert series.mean is None
+    assert series.rate is None
+    assert series.latest is None
+
+
+def test_linear_rise() -> None:
+    """En jämn ökning ger rätt medelvärde, lutning och tid till målet."""
+    series = RollingSeries()
+    for minute in range(0, 60, 5):
+        series.add(START + minute * 60, 20 + minute / 60)
+    assert series.rate == pytest.approx(1.0)
+    assert series.mean == pytest.approx(20 + 27.5 / 60)
+    # Senaste värdet 20,9167; en grad per timme
+    assert series.hours_to(22) == pytest.approx(22 - series.latest)
+
+
+def test_rate_needs_samples_and_span() -> None:
+    """Lutningen kräver minst tre mätpunkter över minst tio minuter."""
+    series = RollingSeries()
+    series.add(START, 20)
+    series.add(START + 120, 20.1)
+    assert series.rate is None
+    series.add(START + 240, 20.2)
+    assert series.rate is None
+    series.add(START + 660, 20.3)
+    assert series.rate is not None
+
+
+def test_samples_too_close_are_skipped() -> None:
+    """Mätpunkter tätare än TREND_MIN_SPACING räknas inte."""
+    series = RollingSeries()
+    assert series.add(START, 20)
+    assert not series.add(START + TREND_MIN_SPACING - 1, 25)
+    assert len(series) == 1
+    assert series.latest == 20
+
+
+def test_window_and_age_limits() -> None:
+    """Fönstret håller högst TREND_WINDOW mätpunkter inom TREND_MAX_AGE."""
+    series = RollingSeries()
+    for n in range(TREND_WINDOW * 2):
+        series.add(START + n * 60, 20.0)
+    assert len(series) == TREND_WINDOW
+    series.add(START + TREND_WINDOW * 2 * 60 + TREND_MAX_AGE + 1, 21.0)
+    assert len(series) == 1
+    assert series.mean == 21.0
+
+
+def test_running_sums_match_recomputation() -> None:
+    """Löpande summor ger samma lutning som en ny beräkning efter många varv."""
+    rng = random.Random(0)
+    series = RollingSeries()
+    samples = []
+    when = START
+    for _ in range(TREND_WINDOW * 40):
+        when += rng.uniform(TREND_MIN_SPACING, 600)
+        value = 20 + rng.uniform(-2, 2) + (when - START) / 36000
+        series.add(when, value)
+        samples.append((when, value))
+    window = [s for s in samples[-TREND_WINDOW:] if when - s[0] <= TREND_MAX_AGE]
+    assert len(series) == len(window)
+    assert series.mean == pytest.approx(sum(v for _, v in window) / len(window))
+    assert series.rate == pytest.approx(_least_squares(window), rel=1e-6)
+
+
+def test_hours_to_target() -> None:
+    """Tid till målet bara när temperaturen rör sig mot det."""
+    series = RollingSeries()
+    for minute in range(0, 60, 10):
+        series.add(START + minute * 60, 20 - minute / 60)
+    assert series.hours_to(series.latest) == 0
+    assert series.hours_to(25) is None
+    assert series.hours_to(19) == pytest.approx(series.latest - 19)
+
+
+def test_unit_trends_report_rounded_changes() -> None:
+    """Enheter rapporteras bara när de avrundade attributen ändras."""
+    unit = UnitSnapshot(
+        id="u1",
+        type=UNIT_TYPE_ATW,
+        name=None,
+        building_id=None,
+        building_name=None,
+        is_connected=True,
+        settings={"RoomTemperatureZone1": 20.0, "SetTemperatureZone1": 21.0},
+    )
+    trends = UnitTrends()
+    reported = []
+    for minute in range(0, 60, 5):
+        unit.settings["RoomTemperatureZone1"] = 20 + minute / 60
+        reported.append(trends.sample([unit], START + minute * 60))
+    # Ingen lutning de första tio minuterna, och inga tomma rapporter
+    assert reported[0] == {}
+    assert {"u1": frozenset({"RoomTemperatureZone1"})} in reported
+    attributes = trends.attributes(unit, "RoomTemperatureZone1")
+    assert attributes[ATTR_TREND_RATE] == 1.0
+    assert attributes[ATTR_TREND_MEAN] == pytest.approx(20.5, abs=0.05)
+    assert attributes[ATTR_TIME_TO_TARGET] % 5 == 0
+    trends.discard("u1")
+    assert trends.attributes(unit, "RoomTemperatureZone1") == {}
@@ -0,0 +1,148 @@
+"""Tester för pollning per enhet mot stand-in-servern, inklusive nyttolastens storlek."""
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.core import HomeAssistant
+from homeassistant.data_entry_flow import FlowResultType
+
+from benchmarks.standin_server import StandInServer, generate_account
+from custom_components.melcloud_home import MELCloudHomeCoordinator
+from custom_components.melcloud_home.const import CONF_UNIT_POLLING, DOMAIN
+from custom_components.melcloud_home.hub import async_get_hub
+from custom_components.melcloud_home.polling import BACKOFF_JITTER, BASE_INTERVAL
+from custom_components.melcloud_home.snapshot import build_unit_index
+
+CONTEXT = "GET /api/user/context"
+UNIT_GET = "GET /api/{kind}/{unit_id}"
+
+
+@pytest.fixture
+def entry_options() -> dict[str, Any]:
+    """Pollning per enhet påslagen."""
+    return {CONF_UNIT_POLLING: True}
+
+
+async def test_polls_units_between_full_fetches(
+    coordinator: MELCloudHomeCoordinator, server: StandInServer
+) -> None:
+    """Efter en hel user context läses bara enheterna, med samma resultat."""
+    assert coordinator.unit_polling
+    before = {unit_id: unit.settings for unit_id, unit in coordinator.units.items()}
+    server.stats.reset()
+
+    await coordinator.async_refresh()
+
+    assert coordinator.last_update_success
+    assert server.stats.requests[CONTEXT] == 0
+    assert server.stats.requests[UNIT_GET] == len(before)
+    assert {unit_id: unit.settings for unit_id, unit in coordinator.units.items()} == before
+
+
+async def test_unit_read_picks_up_changes(
+    coordinator: MELCloudHomeCoordinator, server: StandInServer
+) -> None:
+    """Ändringar i molnet syns efter en läsning per enhet."""
+    unit_id = next(iter(coordinator.units))
+    server.set_setting(unit_id, "Power", False)
+
+    await coordinator.async_refresh()
+
+    assert coordinator.get_setting(unit_id, "Power") is False
+
+
+async def test_unsupported_unit_reads_fall_back_to_context(
+    coordinator: MELCloudHomeCoordinator, server: StandInServer
+) -> None:
+    """Svarar servern 404 på läsningarna används user context i samma uppdatering."""
+    server.stats.reset()
+    server.fail_with = [404] * len(coordinator.units)
+
+    await coordinator.async_refresh()
+
+    assert coordinator.last_update_success
+    assert coordinator.api.unit_state_supported is False
+    assert server.stats.requests[CONTEXT] == 1
+    # Nästa uppdatering försöker inte läsa enheterna igen
+    server.stats.reset()
+    await coordinator.async_refresh()
+    assert server.stats.requests[UNIT_GET] == 0
+
+
+async def test_missing_unit_falls_back_to_context(
+    coordinator: MELCloudHomeCoordinator, server: StandInServer
+) -> None:
+    """En enstaka 404 räcker för att hämta hela user context i samma uppdatering."""
+    server.stats.reset()
+    server.fail_with = [404]
+
+    await coordinator.async_refresh()
+
+    assert coordinator.last_update_success
+    assert server.stats.requests[CONTEXT] == 1
+
+
+async def test_throttled_unit_read_backs_off_without_full_fetch(
+    coordinator: MELCloudHomeCoordinator, server: StandInServer
+) -> None:
+    """429 på en läsning ger backoff, inte en hel user context ovanpå."""
+    server.stats.reset()
+    for _ in range(2):
+        server.fail_with = [429]
+        await coordinator.async_refresh()
+
+    assert server.stats.requests[CONTEXT] == 0
+    assert coordinator.update_interval >= BASE_INTERVAL * 2 * (1 - BACKOFF_JITTER)
+
+
+async def test_shared_account_reads_less_than_full_context(
+    hass: HomeAssistant, config_entry: MockConfigEntry, server: StandInServer
+) -> None:
+    """När andra konton hanterar de flesta enheterna är läsningarna mindre än user context."""
+    server.user_context = generate_account(buildings=2, atw_units=5, ata_units=5, seed=2)
+    server._units = server._index_units()
+    units = build_unit_index(server.user_context)
+    # Ett annat konto hanterar alla utom två enheter
+    async_get_hub(hass).claim_units("other", dict(list(units.items())[2:]))
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    coordinator = hass.data[DOMAIN][config_entry.entry_id]["coordinator"]
+    context_bytes = server.stats.bytes_sent[CONTEXT]
+    server.stats.reset()
+
+    await coordinator.async_refresh()
+
+    assert len(coordinator.units) == 2
+    assert server.stats.requests[UNIT_GET] == 2
+    assert server.stats.bytes_sent[UNIT_GET] < context_bytes / 3
+    await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+@pytest.mark.parametrize("entry_options", [{}])
+async def test_option_turns_unit_polling_on(
+    hass: HomeAssistant,
+    config_entry: MockConfigEntry,
+    coordinator: MELCloudHomeCoordinator,
+    server: StandInServer,
+) -> None:
+    """Inställningen sparas i options och gäller efter omladdningen."""
+    assert not coordinator.unit_polling
+
+    result = await hass.config_entries.options.async_init(config_entry.entry_id)
+    assert result["type"] == FlowResultType.MENU
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {"next_step_id": "settings"}
+    )
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {CONF_UNIT_POLLING: True}
+    )
+    assert result["type"] == FlowResultType.CREATE_ENTRY
+    await hass.async_block_till_done()
+
+    assert config_entry.options[CONF_UNIT_POLLING] is True
+    reloaded = hass.data[DOMAIN][config_entry.entry_id]["coordinator"]
+    assert reloaded is not coordinator
+    assert reloaded.unit_polling